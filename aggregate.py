@@ -0,0 +1,295 @@
+import numpy as np
+import pandas as pd
+
+# 전용면적 범위 (왼쪽 경계 포함)
+AREA_BINS = [0, 80, 100, 120, 140, float('inf')]
+AREA_LABELS = ['0~80', '80~100', '100~120', '120~140', '140 이상']
+
+
+# 분석 자료에 들어가는 요약표를 한 번에 담는 결과 객체
+class AnalysisResult:
+    def __init__(self, monthly_transactions, regional_counts, area_counts, transaction_types, top_apartments, cube=None):
+        self.monthly_transactions = monthly_transactions
+        self.regional_counts = regional_counts
+        self.area_counts = area_counts
+        self.transaction_types = transaction_types
+        self.top_apartments = top_apartments
+        # (월, 시군구, 면적 범위, 거래유형) 단위 거래량 배열과 각 축의 라벨
+        self.cube = cube
+
+    @property
+    def total_volume(self):
+        return int(self.monthly_transactions['거래량'].sum())
+
+    @property
+    def regional_summary(self):
+        regional_summary = self.regional_counts.reset_index()
+        regional_summary.columns = ['시군구', '거래량']
+        regional_summary['총계'] = regional_summary['거래량'].sum()  # 총계 열 추가
+        return regional_summary
+
+    @property
+    def area_summary(self):
+        area_summary = self.area_counts.reset_index()
+        area_summary.columns = ['면적 범위', '거래량']
+        area_summary['총계'] = area_summary['거래량'].sum()  # 총계 열 추가
+        return area_summary
+
+    @property
+    def transaction_type_summary(self):
+        return self.transaction_types.reset_index().rename(columns={'index': '거래유형', 'count': '거래량', 0: '거래량'})
+
+    # 리포트에 들어가는 표 (출력 순서 유지)
+    def report_tables(self, selected_data):
+        return {
+            "조회 결과": selected_data,
+            "매월 거래량": self.monthly_transactions,
+            "전용면적 범위별 거래량": self.area_summary,
+            "지역별 면적 대비 거래량": self.regional_summary,
+            "거래유형 분석": self.transaction_type_summary,
+            "법정동별 거래 빈도가 높은 아파트": self.top_apartments,
+        }
+
+
+# 월/시군구/면적 범위/거래유형을 정수 코드로 바꿔 한 번의 bincount로 모든 분포를 구한다
+# 법정동별 최다 거래 아파트는 (법정동, 아파트) 코드 쌍 하나로 센다
+def compute_analysis(selected_data):
+    return build_analysis(count_cube(selected_data), _top_apartments(*_apartment_pair_counts(selected_data)))
+
+
+# 시/도 단위로 나눠 계산한 뒤 합칠 수 있는 중간 집계
+# - cube: (월, 시군구, 면적 범위, 거래유형) 거래량과 각 축의 라벨 (count_cube 결과)
+# - pair_counts: (법정동, 아파트)별 거래량
+class PartialAnalysis:
+    def __init__(self, cube, pair_counts, rows):
+        self.cube = cube
+        self.pair_counts = pair_counts
+        self.rows = rows
+
+
+def compute_partial_analysis(selected_data):
+    pair_counts = _pair_frame(*_apartment_pair_counts(selected_data))
+    return PartialAnalysis(count_cube(selected_data), pair_counts, len(selected_data))
+
+
+def _pair_frame(dongs, apartments, counts, dong_names, apartment_names):
+    return pd.DataFrame({
+        '법정동': pd.Categorical.from_codes(dongs, categories=dong_names),
+        '아파트': pd.Categorical.from_codes(apartments, categories=apartment_names),
+        '거래량': np.asarray(counts).astype(np.int64),
+    })
+
+
+# 중간 집계를 합쳐 전체 데이터로 compute_analysis를 실행한 것과 같은 결과를 만든다
+def merge_partial_analyses(partials):
+    merged = merge_partials(partials)
+    pair_counts = merged.pair_counts
+    if not len(pair_counts):
+        return build_analysis(merged.cube, _top_apartments(*_EMPTY_PAIRS))
+    # merge_partials 결과는 (법정동, 아파트) 코드 순으로 정렬되어 있다
+    return build_analysis(merged.cube, _top_apartments(
+        pair_counts['법정동'].cat.codes.to_numpy().astype(np.int64),
+        pair_counts['아파트'].cat.codes.to_numpy().astype(np.int64),
+        pair_counts['거래량'].to_numpy(dtype=np.int64),
+        list(pair_counts['법정동'].cat.categories),
+        list(pair_counts['아파트'].cat.categories),
+    ))
+
+
+# 중간 집계 여러 개를 중간 집계 하나로 합친다 (배치 단위로 읽으면서 조금씩 합칠 때 사용)
+def merge_partials(partials):
+    partials = [partial for partial in partials if partial is not None]
+    cube = merge_cubes([partial.cube for partial in partials])
+    rows = sum(partial.rows for partial in partials)
+
+    pair_counts = [partial.pair_counts for partial in partials if len(partial.pair_counts)]
+    if not pair_counts:
+        dongs, apartments, counts, dong_names, apartment_names = _EMPTY_PAIRS
+    else:
+        dong_names = sorted(set().union(*(frame['법정동'].cat.categories for frame in pair_counts)))
+        apartment_names = sorted(set().union(*(frame['아파트'].cat.categories for frame in pair_counts)))
+        dongs = np.concatenate([_recode(frame['법정동'], dong_names) for frame in pair_counts])
+        apartments = np.concatenate([_recode(frame['아파트'], apartment_names) for frame in pair_counts])
+        weights = np.concatenate([frame['거래량'].to_numpy(dtype=np.int64) for frame in pair_counts])
+        width = max(len(apartment_names), 1)
+        unique_pairs, counts = _count_pairs(dongs * width + apartments, max(len(dong_names), 1) * width, weights)
+        dongs, apartments = np.divmod(unique_pairs, width)
+
+    return PartialAnalysis(cube, _pair_frame(dongs, apartments, counts, dong_names, apartment_names), rows)
+
+
+# (월, 시군구, 면적 범위, 거래유형) 거래량 배열
+# 결측값(-1)은 각 축의 마지막 칸에 모았다가 요약할 때 버린다
+def count_cube(selected_data):
+    month_codes, months = _month_codes(selected_data)
+    sigungu_codes, sigungu_names = _category_codes(selected_data['시군구'])
+    area_positions = area_codes(selected_data['전용면적'])
+    type_codes, type_names = _category_codes(selected_data['거래유형'])
+
+    shape = (len(months) + 1, len(sigungu_names) + 1, len(AREA_LABELS) + 1, len(type_names) + 1)
+    flat = np.ravel_multi_index(
+        (_missing_last(month_codes, shape[0]), _missing_last(sigungu_codes, shape[1]),
+         _missing_last(area_positions, shape[2]), _missing_last(type_codes, shape[3])),
+        shape
+    )
+    counts = np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape)
+    return {"counts": counts, "months": months, "sigungu": sigungu_names,
+            "area": AREA_LABELS, "types": type_names}
+
+
+# 축 라벨을 합집합(월은 연속 구간, 시군구/거래유형은 이름순)으로 맞춘 뒤 더한다
+def merge_cubes(cubes):
+    months = sorted(set().union(*(cube["months"] for cube in cubes)))
+    if months:
+        first, last = months[0][0] * 12 + months[0][1] - 1, months[-1][0] * 12 + months[-1][1] - 1
+        months = [(value // 12, value % 12 + 1) for value in range(first, last + 1)]
+    sigungu_names = sorted(set().union(*(cube["sigungu"] for cube in cubes)))
+    type_names = sorted(set().union(*(cube["types"] for cube in cubes)))
+
+    shape = (len(months) + 1, len(sigungu_names) + 1, len(AREA_LABELS) + 1, len(type_names) + 1)
+    counts = np.zeros(shape, dtype=np.int64)
+    for cube in cubes:
+        # 각 축의 위치를 합친 배열의 위치로 바꾼다 (마지막 결측 칸은 결측 칸으로)
+        axes = (
+            _axis_positions(cube["months"], months),
+            _axis_positions(cube["sigungu"], sigungu_names),
+            np.arange(len(AREA_LABELS) + 1),
+            _axis_positions(cube["types"], type_names),
+        )
+        counts[np.ix_(*axes)] += cube["counts"]
+    return {"counts": counts, "months": months, "sigungu": sigungu_names,
+            "area": AREA_LABELS, "types": type_names}
+
+
+def _axis_positions(labels, merged_labels):
+    position = {label: index for index, label in enumerate(merged_labels)}
+    return np.array([position[label] for label in labels] + [len(merged_labels)], dtype=np.int64)
+
+
+# categorical 코드를 합친 카테고리 기준 코드로 바꾼다 (카테고리 단위로 한 번만 찾는다)
+def _recode(series, categories):
+    positions = pd.Index(categories).get_indexer(series.cat.categories)
+    return positions[series.cat.codes.to_numpy()].astype(np.int64)
+
+
+# 거래량 배열로 요약표를 만든다
+def build_analysis(cube, top_apartments):
+    counts, months, sigungu_names, type_names = cube["counts"], cube["months"], cube["sigungu"], cube["types"]
+
+    # 매월 거래량
+    month_totals = counts[:-1].sum(axis=(1, 2, 3))
+    monthly_transactions = pd.DataFrame({
+        '거래년도': [year for year, _ in months],
+        '거래월': [month for _, month in months],
+        '거래량': month_totals.astype(np.int64),
+    })
+    monthly_transactions = monthly_transactions[monthly_transactions['거래량'] > 0].reset_index(drop=True)
+
+    # 지역별 거래량
+    sigungu_totals = counts[:, :-1].sum(axis=(0, 2, 3))
+    regional_counts = pd.Series(sigungu_totals, index=pd.Index(sigungu_names, name='시군구'), dtype=np.int64)
+    regional_counts = regional_counts[regional_counts > 0]
+
+    # 전용면적 범위별 거래량
+    area_totals = counts[:, :, :-1].sum(axis=(0, 1, 3))
+    area_counts = pd.Series(
+        area_totals,
+        index=pd.CategoricalIndex(AREA_LABELS, categories=AREA_LABELS, ordered=True, name='면적 범위'),
+        name='count', dtype=np.int64
+    )
+
+    # 거래유형 (많은 순)
+    type_totals = counts[:, :, :, :-1].sum(axis=(0, 1, 2))
+    transaction_types = pd.Series(type_totals, index=pd.Index(type_names, name='거래유형'), name='count', dtype=np.int64)
+    transaction_types = transaction_types[transaction_types > 0].sort_values(ascending=False, kind='stable')
+
+    return AnalysisResult(
+        monthly_transactions, regional_counts, area_counts, transaction_types, top_apartments, cube=cube
+    )
+
+
+def _missing_last(codes, size):
+    return np.where(codes < 0, size - 1, codes)
+
+
+def _category_codes(series):
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype('category')
+    return series.cat.codes.to_numpy(), list(series.cat.categories)
+
+
+def _month_codes(selected_data):
+    # 1970-01 기준 월 번호 (datetime64[M] 변환은 dt.year/dt.month보다 훨씬 빠르다)
+    dates = selected_data['거래일자'].to_numpy(dtype='datetime64[ns]')
+    valid = ~np.isnat(dates)
+    key = dates.astype('datetime64[M]').astype(np.int64)
+    if not valid.any():
+        return np.full(len(key), -1, dtype=np.int64), []
+    first, last = int(key[valid].min()), int(key[valid].max())
+    codes = np.where(valid, key - first, -1)
+    months = [divmod(value, 12) for value in range(first, last + 1)]
+    return codes, [(1970 + year, month + 1) for year, month in months]
+
+
+# 전용면적 → 면적 범위 위치 (AREA_LABELS 순서, 결측은 -1)
+def area_codes(area):
+    values = area.to_numpy(dtype='float64', na_value=np.nan)
+    # right=False 구간: bins[i] <= x < bins[i+1]
+    codes = np.searchsorted(np.asarray(AREA_BINS[1:-1], dtype='float64'), values, side='right')
+    codes[np.isnan(values) | (values < AREA_BINS[0])] = -1
+    return codes.astype(np.int64)
+
+
+# (법정동, 아파트) 쌍별 거래량 (법정동, 아파트 코드 순으로 정렬됨)
+def _apartment_pair_counts(selected_data):
+    dong_codes, dong_names = _category_codes(selected_data['법정동'])
+    apartment_codes, apartment_names = _category_codes(selected_data['아파트'])
+    valid = (dong_codes >= 0) & (apartment_codes >= 0)
+    width = max(len(apartment_names), 1)
+    pair = dong_codes[valid].astype(np.int64) * width + apartment_codes[valid]
+    unique_pairs, counts = _count_pairs(pair, max(len(dong_names), 1) * width)
+    dongs, apartments = np.divmod(unique_pairs, width)
+    return dongs, apartments, counts, dong_names, apartment_names
+
+
+# 쌍 번호별 합계 (가능한 쌍의 수가 행 수에 비해 작으면 bincount로 정렬 없이 세고,
+# 아니면 정렬한 뒤 구간별로 더한다)
+def _count_pairs(pair, pair_space, weights=None):
+    if len(pair) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    if pair_space <= max(4 * len(pair), 1 << 20):
+        dense = np.bincount(pair, weights=weights, minlength=pair_space)
+        unique_pairs = np.flatnonzero(dense)
+        return unique_pairs, dense[unique_pairs].astype(np.int64)
+    if weights is None:
+        pair = np.sort(pair)
+        starts = np.flatnonzero(np.r_[True, pair[1:] != pair[:-1]])
+        counts = np.diff(np.r_[starts, len(pair)])
+    else:
+        order = np.argsort(pair, kind='stable')
+        pair = pair[order]
+        starts = np.flatnonzero(np.r_[True, pair[1:] != pair[:-1]])
+        counts = np.add.reduceat(np.asarray(weights, dtype=np.int64)[order], starts)
+    return pair[starts], counts.astype(np.int64)
+
+
+_EMPTY_PAIRS = (np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([], dtype=np.int64), [], [])
+
+
+# 법정동마다 거래량이 가장 많은 아파트 (동률이면 이름순으로 앞선 아파트)
+# 입력은 (법정동, 아파트) 순으로 정렬된 쌍이므로 법정동 구간마다 최댓값을 가진 첫 아파트를 고른다
+def _top_apartments(dongs, apartments, counts, dong_names, apartment_names):
+    if len(counts) == 0:
+        return pd.DataFrame({'법정동': [], '아파트': [], '거래량': []})
+
+    dong_starts = np.flatnonzero(np.r_[True, dongs[1:] != dongs[:-1]])
+    best = np.maximum.reduceat(counts, dong_starts)
+    candidates = np.flatnonzero(counts == np.repeat(best, np.diff(np.r_[dong_starts, len(counts)])))
+    first = candidates[np.r_[True, dongs[candidates][1:] != dongs[candidates][:-1]]]
+    dongs, apartments, counts = dongs[first], apartments[first], counts[first]
+
+    return pd.DataFrame({
+        '법정동': pd.Categorical.from_codes(dongs, categories=dong_names),
+        '아파트': pd.Categorical.from_codes(apartments, categories=apartment_names),
+        '거래량': counts.astype(np.int64),
+    })
@@ -8,7 +8,7 @@ import matplotlib.font_manager as fm
 import os
 import base64
 from io import BytesIO
-from report import generate_html_report, get_download_link
+from report import generate_html_report
 
 # 페이지 설정을 코드 상단에 위치시킴
 st.set_page_config(layout="wide")  # 여기를 추가합니다.
@@ -0,0 +1,1140 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from collector import FrameCollector
+from fetcher import fetch_all, month_range
+
+json_file_path = "district.json"
+# 단계별 벤치마크 결과를 한 줄씩 쌓는 파일 (커밋 간 비교용)
+BENCHMARK_RESULTS = os.environ.get("BENCHMARK_RESULTS", "benchmarks.jsonl")
+SUITE_STAGES = ["fetch", "accumulate", "select", "normalize", "aggregate", "render", "report"]
+
+
+# 지연 시간을 주입할 수 있는 TransactionPrice 대체 객체
+class StubTransactionPrice:
+    def __init__(self, latency=0.05, rows_per_month=50, seed=0):
+        self.latency = latency
+        self.rows_per_month = rows_per_month
+        self.seed = seed
+        self.meta_dict = {
+            "아파트": {"매매": {"url": "http://stub.local/getRTMSDataSvcAptTradeDev"}}
+        }
+
+    def get_data(self, property_type, trade_type, sigungu_code, year_month=None,
+                 start_year_month=None, end_year_month=None, **kwargs):
+        if year_month:
+            start_year_month = end_year_month = year_month
+        months = month_range(start_year_month, end_year_month)
+        time.sleep(self.latency * len(months))
+        # 월별로 같은 시드를 쓰므로 기간을 나눠 조회해도 같은 데이터가 나온다
+        columns = {"umdNm": [], "aptNm": [], "excluUseAr": [], "dealAmount": [], "dealYear": [], "dealMonth": []}
+        for month in months:
+            rng = random.Random(f"{self.seed}-{sigungu_code}-{month}")
+            for _ in range(self.rows_per_month):
+                columns["umdNm"].append(f"동{rng.randint(1, 20)}")
+                columns["aptNm"].append(f"아파트{rng.randint(1, 200)}")
+                columns["excluUseAr"].append(f"{rng.uniform(20, 200):.2f}")
+                columns["dealAmount"].append(f"{rng.randint(10000, 300000):,}")
+                columns["dealYear"].append(month[:4])
+                columns["dealMonth"].append(str(int(month[4:])))
+        return pd.DataFrame(columns)
+
+    def translate_columns(self, df):
+        return df
+
+
+def load_json_districts():
+    with open(json_file_path, 'r') as f:
+        return json.loads(f.read())
+
+
+def load_tasks(limit=None):
+    districts = load_json_districts()
+    tasks = [
+        {
+            "si_do_name": district["si_do_name"],
+            "sigungu_code": sigungu["sigungu_code"],
+            "sigungu_name": sigungu["sigungu_name"],
+        }
+        for district in districts
+        for sigungu in district["sigungu"]
+    ]
+    return tasks[:limit] if limit else tasks
+
+
+# 순차 조회(기존 방식)와 동시 조회 엔진 비교
+def bench_fetch(args):
+    tasks = load_tasks(args.sigungu)
+    api = StubTransactionPrice(latency=args.latency)
+
+    started = time.perf_counter()
+    sequential = []
+    for task in tasks:
+        sequential.append(api.get_data("아파트", "매매", task["sigungu_code"],
+                                       start_year_month=args.start, end_year_month=args.end))
+    sequential_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    concurrent = fetch_all(api, tasks, args.start, args.end,
+                           max_workers=args.workers, rate_per_sec=args.rate)
+    concurrent_time = time.perf_counter() - started
+
+    same_order = all(a.equals(b) for a, b in zip(sequential, concurrent))
+    print(f"시군구 {len(tasks)}개, 지연 {args.latency}s/월, workers={args.workers}, rate={args.rate}/s")
+    print(f"순차 조회: {sequential_time:.2f}s")
+    print(f"동시 조회: {concurrent_time:.2f}s ({sequential_time / concurrent_time:.1f}x)")
+    print(f"결과 순서 일치: {same_order}")
+
+
+# 시군구 × 월 단위의 합성 프레임 생성
+def make_synthetic_frames(sigungu_count, months, rows_per_month, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(sigungu_count):
+        rows = months * rows_per_month
+        frames.append(pd.DataFrame({
+            "umdNm": rng.integers(1, 30, rows).astype(str),
+            "aptNm": rng.integers(1, 300, rows).astype(str),
+            "excluUseAr": rng.uniform(20, 200, rows).round(2),
+            "dealAmount": rng.integers(10000, 300000, rows),
+            "dealYear": np.full(rows, 2024),
+            "dealMonth": np.repeat(np.arange(1, months + 1), rows_per_month),
+            "floor": rng.integers(1, 30, rows),
+        }))
+    return frames
+
+
+def measure(func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+# 반복 pd.concat(기존 방식)과 FrameCollector 비교
+def bench_collect(args):
+    tasks = load_tasks(args.sigungu)
+    frames = make_synthetic_frames(len(tasks), args.months, args.rows_per_month)
+
+    def concat_loop():
+        all_data = pd.DataFrame()
+        for task, df in zip(tasks, frames):
+            df = df.copy()
+            df["sigungu_name"] = task["sigungu_name"]
+            df["si_do_name"] = task["si_do_name"]
+            all_data = pd.concat([all_data, df], ignore_index=True)
+        return all_data
+
+    def collect():
+        collector = FrameCollector()
+        for task, df in zip(tasks, frames):
+            collector.add(df, task["sigungu_name"], task["si_do_name"])
+        return collector.build()
+
+    old, old_time, old_peak = measure(concat_loop)
+    new, new_time, new_peak = measure(collect)
+
+    print(f"시군구 {len(tasks)}개 × {args.months}개월 × 월 {args.rows_per_month}건 = {len(new):,}행")
+    print(f"반복 concat:    {old_time:.2f}s, 최대 메모리 {old_peak / 2**20:.1f} MiB, 결과 {old.memory_usage(deep=True).sum() / 2**20:.1f} MiB")
+    print(f"FrameCollector: {new_time:.2f}s, 최대 메모리 {new_peak / 2**20:.1f} MiB, 결과 {new.memory_usage(deep=True).sum() / 2**20:.1f} MiB")
+    print(f"속도 향상: {old_time / new_time:.1f}x")
+
+
+# 기존 로드 방식(매번 json.loads + 선형 탐색)과 인덱스 로드 비교
+def bench_district(args):
+    import district
+
+    si_do_names = [d["si_do_name"] for d in load_json_districts()]
+
+    def old_load():
+        with open(json_file_path, 'r') as f:
+            districts = json.loads(f.read())
+        for si_do_name in si_do_names:
+            si_do_code = next(d["si_do_code"] for d in districts if d["si_do_name"] == si_do_name)
+            next(d["sigungu"] for d in districts if d["si_do_code"] == si_do_code)
+
+    def new_load():
+        converter = district.DistrictConverter()
+        for si_do_name in si_do_names:
+            converter.get_sigungu(converter.get_si_do_code(si_do_name))
+
+    def timed(func, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - started) / repeat
+
+    old_time = timed(old_load, args.repeat)
+
+    # 인덱스 파일 생성 / 인덱스 파일에서 로드 / 같은 프로세스에서 재사용
+    if os.path.exists(district.index_file_path):
+        os.remove(district.index_file_path)
+    district._index = None
+    build_time = timed(new_load, 1)
+    district._index = None
+    cold_time = timed(new_load, 1)
+    warm_time = timed(new_load, args.repeat)
+
+    print(f"기존 (json.loads + 선형 탐색): {old_time * 1000:.2f}ms")
+    print(f"인덱스 생성 (최초 1회):        {build_time * 1000:.2f}ms")
+    print(f"인덱스 파일 로드 (프로세스 시작): {cold_time * 1000:.2f}ms")
+    print(f"프로세스 내 재사용 (버튼 클릭):  {warm_time * 1000:.4f}ms")
+
+
+# 타입 정리가 끝난 조회 결과와 같은 형태의 합성 데이터
+def make_typed_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    sigungu_names = sorted({task["sigungu_name"] for task in load_tasks()})
+    sigungu = pd.Categorical.from_codes(rng.integers(0, len(sigungu_names), rows), categories=sigungu_names)
+    dates = pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 3650, rows), unit="D")
+    dong_names = [f"동{i}" for i in range(3000)]
+    apartment_names = [f"아파트{i}" for i in range(20000)]
+    return pd.DataFrame({
+        "시군구": sigungu,
+        "법정동": pd.Categorical.from_codes(rng.integers(0, len(dong_names), rows), categories=dong_names),
+        "아파트": pd.Categorical.from_codes(rng.integers(0, len(apartment_names), rows), categories=apartment_names),
+        "전용면적": rng.uniform(15, 250, rows).astype("float32"),
+        "거래일자": dates,
+        "거래금액": rng.integers(5000, 300000, rows).astype("int32"),
+        "거래유형": pd.Categorical.from_codes(rng.integers(0, 2, rows), categories=["중개거래", "직거래"]),
+    })
+
+
+# 기존 분석 코드의 groupby/cut/value_counts 순서
+def legacy_analysis(selected_data):
+    from aggregate import AREA_BINS, AREA_LABELS
+    from normalize import year_month_keys
+
+    monthly_transactions = selected_data.groupby(year_month_keys(selected_data)).size().reset_index(name='거래량')
+    regional_summary = selected_data.groupby('시군구', observed=True).size().reset_index(name='거래량')
+    area_range = pd.cut(selected_data['전용면적'], bins=AREA_BINS, labels=AREA_LABELS, right=False)
+    area_counts = area_range.value_counts().sort_index()
+    regional_area_counts = selected_data.groupby(['시군구'], observed=True).size()
+    transaction_types = selected_data['거래유형'].value_counts()
+    popular_apartments = selected_data.groupby(['법정동', '아파트'], observed=True).size().reset_index(name='거래량')
+    top_apartments = popular_apartments.loc[popular_apartments.groupby('법정동', observed=True)['거래량'].idxmax()]
+    return monthly_transactions, regional_area_counts, area_counts, transaction_types, top_apartments, regional_summary
+
+
+def bench_aggregate(args):
+    from aggregate import compute_analysis
+
+    for rows in args.rows:
+        selected_data = make_typed_frame(rows)
+        started = time.perf_counter()
+        monthly, regional, area, types, top, _ = legacy_analysis(selected_data)
+        legacy_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        result = compute_analysis(selected_data)
+        new_time = time.perf_counter() - started
+
+        same = (
+            np.array_equal(monthly['거래량'].to_numpy(), result.monthly_transactions['거래량'].to_numpy())
+            and regional.to_dict() == result.regional_counts.to_dict()
+            and area.to_numpy().tolist() == result.area_counts.to_numpy().tolist()
+            and types.to_dict() == result.transaction_types.to_dict()
+            and top['아파트'].astype(str).tolist() == result.top_apartments['아파트'].astype(str).tolist()
+        )
+        print(f"{rows:>12,}행: 기존 {legacy_time:.3f}s, 단일 집계 {new_time:.3f}s "
+              f"({legacy_time / new_time:.1f}x), 결과 일치: {same}")
+
+
+# pandas 엔진과 DuckDB 엔진의 결과 일치 확인과 시간 비교
+# 결측값(면적/날짜/시군구/법정동/거래유형), 문자열 컬럼, 빈 데이터, 동률인 아파트도 같이 확인한다
+def bench_engine(args):
+    from query_engine import DuckDBEngine, PandasEngine, compare_analyses, duckdb_available
+
+    if not duckdb_available():
+        print("duckdb가 설치되어 있지 않습니다 (pip install duckdb)")
+        return
+    pandas_engine, duckdb_engine = PandasEngine(), DuckDBEngine(threads=args.threads)
+
+    def parity_cases():
+        with_missing = make_typed_frame(50_000, seed=1)
+        for column, step in (("전용면적", 97), ("거래일자", 89), ("거래유형", 83), ("시군구", 79), ("법정동", 71)):
+            with_missing.loc[::step, column] = None
+        yield "결측값", with_missing
+        yield "문자열 컬럼", with_missing.astype({column: "object" for column in ("시군구", "법정동", "아파트", "거래유형")})
+        yield "빈 데이터", with_missing.iloc[:0]
+        # 같은 법정동에서 거래량이 같은 아파트가 여러 개 (카테고리 순서가 앞선 아파트)
+        ties = make_typed_frame(1_000, seed=2)
+        ties["법정동"] = pd.Categorical(["동1"] * len(ties))
+        ties["아파트"] = pd.Categorical.from_codes(np.arange(len(ties)) % 4, categories=["나", "가", "라", "다"])
+        yield "동률", ties
+
+    failed = 0
+    for name, frame in parity_cases():
+        mismatches = compare_analyses(pandas_engine.analyze(frame), duckdb_engine.analyze(frame))
+        failed += bool(mismatches)
+        print(f"{name:<12} 결과 일치: {not mismatches}{' ' + ', '.join(mismatches) if mismatches else ''}")
+
+    for rows in args.rows:
+        selected_data = make_typed_frame(rows)
+        duckdb_engine.analyze(selected_data.iloc[:1000])
+        started = time.perf_counter()
+        expected = pandas_engine.analyze(selected_data)
+        pandas_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        actual = duckdb_engine.analyze(selected_data)
+        duckdb_time = time.perf_counter() - started
+
+        mismatches = compare_analyses(expected, actual)
+        failed += bool(mismatches)
+        print(f"{rows:>12,}행: pandas {pandas_time:.3f}s, duckdb {duckdb_time:.3f}s "
+              f"(스레드 {args.threads}개), 결과 일치: {not mismatches}")
+    if failed:
+        raise SystemExit(1)
+
+
+# 가격 분석용 컬럼(일련번호/층/해제여부)을 더한 합성 데이터
+# 단지마다 주택형 3개, 층 20개로 같은 세대의 반복 거래가 생기게 한다
+def make_price_frame(rows, seed=0):
+    # make_typed_frame과 다른 난수열을 쓴다 (같은 seed면 층/면적이 시군구/거래일자 난수와 같은 수열이 된다)
+    rng = np.random.default_rng(seed + 1)
+    frame = make_typed_frame(rows, seed)
+    apartment_codes = frame["아파트"].cat.codes.to_numpy()
+    frame["일련번호"] = pd.Categorical.from_codes(
+        apartment_codes, categories=[f"11110-{code}" for code in range(len(frame["아파트"].cat.categories))]
+    ).astype("object")
+    frame["층"] = rng.integers(1, 21, rows).astype("int16")
+    frame["전용면적"] = np.array([59.97, 84.95, 114.82], dtype="float32")[(apartment_codes + rng.integers(0, 3, rows)) % 3]
+    frame["해제여부"] = np.where(rng.random(rows) < 0.02, "O", None)
+    return frame
+
+
+# pandas groupby로 계산한 이동 분위수와 반복 거래 (결과 확인용)
+def legacy_price_bands(selected_data, level, window, quantiles):
+    from price import unit_prices
+
+    prices = unit_prices(selected_data)["㎡당 가격"]
+    valid = prices.notna()
+    months = selected_data["거래일자"].dt.to_period("M")[valid]
+    shifted = pd.concat([
+        pd.DataFrame({level: selected_data[level][valid], "월": months + offset, "가격": prices[valid]})
+        for offset in range(window)
+    ])
+    shifted = shifted[shifted["월"] <= months.max()]
+    return shifted.groupby([level, "월"], observed=True)["가격"].quantile(list(quantiles)).unstack()
+
+
+def legacy_repeat_sales(selected_data):
+    from price import unit_prices
+
+    prices = unit_prices(selected_data)["㎡당 가격"]
+    rows = selected_data.assign(가격=prices, 면적=selected_data["전용면적"].round(2))[prices.notna()]
+    rows = rows.sort_values(["일련번호", "층", "면적", "거래일자"], kind="stable")
+    month = rows["거래일자"].dt.year * 12 + rows["거래일자"].dt.month
+    same_unit = (rows[["일련번호", "층", "면적"]] == rows[["일련번호", "층", "면적"]].shift()).all(axis=1)
+    pair = same_unit & (month - month.shift() >= 1)
+    return np.log(rows["가격"] / rows["가격"].shift())[pair]
+
+
+def bench_price(args):
+    from price import DEFAULT_QUANTILES, DEFAULT_WINDOW_MONTHS, apartment_repeat_sales, repeat_sale_pairs, \
+        rolling_price_bands
+
+    for rows in args.rows:
+        selected_data = make_price_frame(rows)
+        timings = {}
+        for level in ("시군구", "법정동"):
+            started = time.perf_counter()
+            bands = rolling_price_bands(selected_data, level)
+            timings[level] = time.perf_counter() - started
+        started = time.perf_counter()
+        pairs = repeat_sale_pairs(selected_data)
+        apartments = apartment_repeat_sales(pairs)
+        timings["반복 거래"] = time.perf_counter() - started
+
+        line = ", ".join(f"{name} {seconds:.3f}s" for name, seconds in timings.items())
+        print(f"{rows:>12,}행: {line} (반복 거래 쌍 {len(pairs):,}개, 단지 {len(apartments):,}개)")
+
+        if rows <= args.check_rows:
+            started = time.perf_counter()
+            expected = legacy_price_bands(selected_data, "법정동", DEFAULT_WINDOW_MONTHS, DEFAULT_QUANTILES)
+            expected_returns = legacy_repeat_sales(selected_data)
+            legacy_time = time.perf_counter() - started
+
+            frame = bands.to_frame()
+            frame.index = pd.MultiIndex.from_arrays([
+                frame["법정동"], pd.PeriodIndex.from_fields(year=frame["거래년도"], month=frame["거래월"], freq="M")])
+            actual = frame[[column for column in frame.columns if column.startswith("p") or column == "중앙값"]]
+            same = (
+                len(actual) == len(expected)
+                and np.allclose(actual.to_numpy(), expected.loc[actual.index].to_numpy(), rtol=1e-9)
+                and len(pairs) == len(expected_returns)
+                and np.isclose(pairs.log_return.sum(), expected_returns.sum())
+            )
+            print(f"{'':>14}pandas groupby {legacy_time:.3f}s, 결과 일치: {same}")
+
+
+# 반복 거래 지수용 합성 데이터: 세대별 고정 가격 수준 × 시군구별 월 상승률 × 잡음
+# 반환: (데이터, 시군구별 월 log 상승률)
+def make_index_frame(rows, seed=0):
+    rng = np.random.default_rng(seed + 2)
+    frame = make_price_frame(rows, seed)
+    # 단지(일련번호)는 한 시군구에만 있다
+    sigungu_names = frame["시군구"].cat.categories
+    frame["시군구"] = pd.Categorical.from_codes(frame["아파트"].cat.codes.to_numpy() % len(sigungu_names),
+                                              categories=sigungu_names)
+    si_do_by_sigungu = {}
+    for task in load_tasks():
+        si_do_by_sigungu.setdefault(task["sigungu_name"], task["si_do_name"])
+    frame["시도"] = frame["시군구"].map(si_do_by_sigungu).astype("category")
+    trends = rng.normal(0.004, 0.003, len(frame["시군구"].cat.categories))
+    months = (frame["거래일자"].dt.year.to_numpy() - 2015) * 12 + frame["거래일자"].dt.month.to_numpy() - 1
+    unit_levels = rng.normal(7, 0.3, (len(frame["아파트"].cat.categories), 21))
+    log_prices = (unit_levels[frame["아파트"].cat.codes.to_numpy(), frame["층"].to_numpy()]
+                  + trends[frame["시군구"].cat.codes.to_numpy()] * months + rng.normal(0, 0.05, rows))
+    frame["거래금액"] = np.round(np.exp(log_prices) * frame["전용면적"].to_numpy()).astype("int32")
+    return frame, trends
+
+
+# 거래 쌍마다 행을 만든 설계 행렬로 푸는 3단계 반복 거래 회귀 (결과 확인용, 시군구 하나)
+def legacy_repeat_index(selected_data, sigungu):
+    from price import unit_prices
+
+    rows = selected_data[selected_data["시군구"] == sigungu]
+    prices = unit_prices(rows)["㎡당 가격"]
+    rows = rows.assign(가격=prices, 면적=rows["전용면적"].round(2), 층=rows["층"].fillna(-9999))[prices.notna()]
+    rows = rows.sort_values(["일련번호", "층", "면적", "거래일자"], kind="stable")
+    month = (rows["거래일자"].dt.year * 12 + rows["거래일자"].dt.month).to_numpy()
+    same_unit = (rows[["일련번호", "층", "면적"]] == rows[["일련번호", "층", "면적"]].shift()).all(axis=1).to_numpy()
+    pair = same_unit & (month - np.r_[0, month[:-1]] >= 1)
+    second = np.flatnonzero(pair)
+    first_month, second_month = month[second - 1], month[second]
+    log_return = np.log(rows["가격"].to_numpy()[second] / rows["가격"].to_numpy()[second - 1])
+
+    start = first_month.min()
+    design = np.zeros((len(second), max(second_month.max(), first_month.max()) - start + 1))
+    design[np.arange(len(second)), first_month - start] -= 1
+    design[np.arange(len(second)), second_month - start] += 1
+    design = design[:, 1:]
+    beta = np.linalg.lstsq(design, log_return, rcond=None)[0]
+    holding = (second_month - first_month).astype(float)
+    errors = (log_return - design @ beta) ** 2
+    alpha, gamma = np.linalg.lstsq(np.c_[np.ones(len(holding)), holding], errors, rcond=None)[0]
+    variance = alpha + gamma * holding
+    if np.all(variance > 0):
+        scale = 1 / np.sqrt(variance)
+        beta = np.linalg.lstsq(design * scale[:, None], log_return * scale, rcond=None)[0]
+    return 100 * np.exp(np.r_[0, beta])
+
+
+def bench_index(args):
+    from repeat_index import RepeatSalesIndex
+
+    for rows in args.rows:
+        selected_data, trends = make_index_frame(rows)
+        started = time.perf_counter()
+        index = RepeatSalesIndex()
+        index.update(selected_data)
+        build_time = time.perf_counter() - started
+        started = time.perf_counter()
+        result = index.fit()
+        fit_time = time.perf_counter() - started
+
+        # 마지막 달을 빼고 만든 지수에 마지막 달만 더하기
+        last = selected_data["거래일자"].max()
+        cutoff = f"{(last - pd.DateOffset(months=1)):%Y%m}"
+        incremental = RepeatSalesIndex()
+        incremental.update(selected_data, through_year_month=cutoff)
+        incremental.fit()
+        new_rows = selected_data[selected_data["거래일자"] >= pd.Timestamp(f"{last:%Y-%m}-01")]
+        started = time.perf_counter()
+        incremental.update(new_rows)
+        update_time = time.perf_counter() - started
+        started = time.perf_counter()
+        incremental_result = incremental.fit()
+        refit_time = time.perf_counter() - started
+
+        same = (
+            np.array_equal(index.cell_keys, incremental.cell_keys)
+            and np.array_equal(index.cell_counts, incremental.cell_counts)
+            and np.allclose(index.cell_sums, incremental.cell_sums)
+            and np.allclose(result["지수"], incremental_result["지수"], equal_nan=True)
+        )
+
+        # 시군구별 실제 월 상승률과 추정 지수의 월 상승률 차이
+        sigungu_codes = pd.Categorical(result["시군구"], categories=selected_data["시군구"].cat.categories).codes
+        slopes = np.log(result["지수"]).groupby(result["시군구"]).diff()
+        error = np.nanmedian(np.abs(slopes - trends[sigungu_codes]))
+        print(f"{rows:>12,}행: 쌍 {index.pair_count:,}개, 칸 {len(index.cell_keys):,}개, 지역 {len(index.regions)}개, "
+              f"만들기 {build_time:.3f}s, 회귀 {fit_time:.3f}s | 마지막 달 추가 {update_time:.3f}s, "
+              f"다시 회귀 {refit_time:.3f}s, 전체와 일치: {same}, 월 상승률 오차 중앙값 {error:.5f}")
+
+        if rows <= args.check_rows:
+            # 거래 쌍으로 모든 달이 이어진 시군구만 비교한다 (끊긴 달은 기준을 정할 수 없어 NaN)
+            connected = result.groupby("시군구")["지수"].apply(lambda values: values.notna().all())
+            pair_counts = result.groupby("시군구")["거래 쌍 수"].sum()[connected]
+            busiest = pair_counts.sort_values(ascending=False).index[:3]
+            matches = []
+            for sigungu in busiest:
+                expected = legacy_repeat_index(selected_data, sigungu)
+                actual = result.loc[result["시군구"] == sigungu, "지수"].to_numpy()
+                matches.append(len(actual) == len(expected) and np.allclose(actual, expected, rtol=1e-6))
+            if matches:
+                print(f"{'':>14}설계 행렬 lstsq와 결과 일치: {all(matches)} (시군구 {len(matches)}개)")
+
+
+# 리포트 표 형식별 파일 크기와 생성 시간
+def bench_report(args):
+    import io
+
+    from aggregate import compute_analysis
+    from report import write_html_report
+
+    for rows in args.rows:
+        selected_data = make_typed_frame(rows)
+        analysis = compute_analysis(selected_data)
+        for table_mode in ("html", "virtual"):
+            buffer = io.StringIO()
+            started = time.perf_counter()
+            write_html_report(buffer, {}, analysis, selected_data, table_mode=table_mode)
+            elapsed = time.perf_counter() - started
+            size = len(buffer.getvalue().encode())
+            print(f"{rows:>10,}행 {table_mode:>7}: {elapsed:.2f}s, {size / 2**20:.1f} MiB")
+
+
+# 조회 결과 표 하나: 이전 방식(chunk마다 DataFrame.to_html)과 iter_table_html 비교
+def bench_table(args):
+    from report import TABLE_CHUNK_ROWS, iter_table_html
+
+    def to_html_chunks(df):
+        options = {"classes": "table", "border": 0, "escape": True}
+        yield df.head(0).to_html(**options).split("<tbody>\n", 1)[0] + "<tbody>\n"
+        for start in range(0, len(df), TABLE_CHUNK_ROWS):
+            chunk = df.iloc[start:start + TABLE_CHUNK_ROWS].to_html(header=False, **options)
+            yield chunk.split("<tbody>\n", 1)[1].rsplit("  </tbody>", 1)[0]
+        yield "  </tbody>\n</table>"
+
+    for rows in args.rows:
+        selected_data = make_typed_frame(rows)
+        results = {}
+        for name, render in (("to_html", to_html_chunks), ("vectorized", iter_table_html)):
+            started = time.perf_counter()
+            size = sum(len(part.encode()) for part in render(selected_data))
+            results[name] = time.perf_counter() - started
+            print(f"{rows:>10,}행 {name:>10}: {results[name]:.2f}s, {size / 2**20:.1f} MiB")
+        print(f"{rows:>10,}행 {'speedup':>10}: {results['to_html'] / results['vectorized']:.1f}x")
+
+
+# 기존 방식(그림마다 순서대로 savefig)과 프로세스 풀 렌더링/캐시 비교
+def bench_figures(args):
+    import figures
+    from aggregate import compute_analysis
+
+    analysis = compute_analysis(make_typed_frame(args.rows))
+    specs = figures.build_figure_specs(analysis)
+
+    started = time.perf_counter()
+    for spec in specs.values():
+        figures.render_figure(spec)
+    serial_time = time.perf_counter() - started
+
+    figures.FIGURE_CACHE_DIR = os.path.join(".cache", "figures-bench")
+    for key in [figures.figure_key(spec) for spec in specs.values()]:
+        figures._memory_cache.pop(key, None)
+        if os.path.exists(figures._cache_path(key)):
+            os.remove(figures._cache_path(key))
+    # 첫 실행은 프로세스 시작 비용이 포함되므로 풀을 미리 띄워 둔다 (앱에서는 시작할 때 한 번)
+    figures.start_pool(args.workers)
+    time.sleep(3)
+
+    started = time.perf_counter()
+    figures.render_figures(specs, max_workers=args.workers)
+    parallel_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    figures.render_figures(specs, max_workers=args.workers)
+    cached_time = time.perf_counter() - started
+
+    print(f"그래프 {len(specs)}개")
+    print(f"순차 렌더링:       {serial_time:.3f}s")
+    print(f"프로세스 풀 렌더링: {parallel_time:.3f}s")
+    print(f"캐시 재사용:       {cached_time * 1000:.2f}ms")
+
+
+# 시군구마다 꼭짓점이 많은 들쭉날쭉한 경계 (실제 경계 파일처럼 구가 있는 시는 구 경계만 넣는다)
+def make_boundaries(path, vertices, seed=0):
+    from district import load_index
+
+    rng = np.random.default_rng(seed)
+    codes = sorted(load_index()["sigungu_by_code"])
+    codes = [code for code in codes
+             if not (code.endswith("0") and any(other != code and other[:4] == code[:4] for other in codes))]
+    columns = int(np.ceil(np.sqrt(len(codes))))
+    width, height = 3.5 / columns, 4.5 / columns
+    features = []
+    for position, code in enumerate(codes):
+        center = np.array([126.0 + (position % columns + 0.5) * width, 34.0 + (position // columns + 0.5) * height])
+        angles = np.linspace(0, 2 * np.pi, vertices, endpoint=False)
+        radius = 0.45 * min(width, height) * (1 + 0.1 * rng.standard_normal(vertices))
+        ring = center + np.column_stack([np.cos(angles), np.sin(angles)]) * radius[:, None]
+        island = center + width * 0.45 + np.column_stack([np.cos(angles), np.sin(angles)])[::20] * 0.002
+        polygons = [[ring.tolist() + ring[:1].tolist()], [island.tolist() + island[:1].tolist()]]
+        features.append({"type": "Feature", "properties": {"SIG_CD": code},
+                         "geometry": {"type": "MultiPolygon", "coordinates": polygons}})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f)
+    return len(codes)
+
+
+def make_map_frame(rows, seed=0):
+    from district import load_index
+
+    rng = np.random.default_rng(seed + 2)
+    pairs = [(district["si_do_name"], sigungu["sigungu_name"])
+             for district in load_index()["districts"] for sigungu in district["sigungu"]]
+    frame = make_price_frame(rows, seed)
+    picked = rng.integers(0, len(pairs), rows)
+    si_do_names, sigungu_names = (np.array(names, dtype=object) for names in zip(*pairs))
+    frame["시도"] = pd.Categorical(si_do_names[picked])
+    frame["시군구"] = pd.Categorical(sigungu_names[picked])
+    return frame
+
+
+# folium.Choropleth로 원본 경계를 매번 직렬화하는 방식과 줌 레벨별 단순화/캐시 경계 비교
+def bench_map(args):
+    import folium
+
+    import region_map
+
+    region_map.BOUNDARY_CACHE_DIR = os.path.join(".cache", "boundaries-bench")
+    region_map.BOUNDARY_SOURCE = os.path.join(region_map.BOUNDARY_CACHE_DIR, "synthetic.geojson")
+    os.makedirs(region_map.BOUNDARY_CACHE_DIR, exist_ok=True)
+    region_count = make_boundaries(region_map.BOUNDARY_SOURCE, args.vertices)
+    for zoom in region_map.ZOOM_LEVELS:
+        if os.path.exists(region_map._cache_path(zoom)):
+            os.remove(region_map._cache_path(zoom))
+    print(f"시군구 경계 {region_count}개 × 꼭짓점 {args.vertices}개, "
+          f"원본 {os.path.getsize(region_map.BOUNDARY_SOURCE) / 2**20:.1f}MB")
+
+    selected_data = make_map_frame(args.rows)
+    started = time.perf_counter()
+    metrics = region_map.region_metrics(selected_data)
+    print(f"지표 집계 ({args.rows:,}행): {time.perf_counter() - started:.3f}s, "
+          f"시군구 {len(metrics)}개 (코드 없음 {metrics['시군구코드'].isna().sum()}개)")
+
+    started = time.perf_counter()
+    with open(region_map.BOUNDARY_SOURCE, encoding="utf-8") as f:
+        geo_data = json.load(f)
+    legacy = folium.Map(location=[36, 127.8], zoom_start=7)
+    folium.Choropleth(geo_data=geo_data, data=metrics.dropna(subset=["시군구코드"]), columns=["시군구코드", "거래량"],
+                      key_on="feature.properties.SIG_CD", fill_color="YlOrRd").add_to(legacy)
+    legacy_html = legacy.get_root().render()
+    legacy_time = time.perf_counter() - started
+    print(f"folium.Choropleth (원본 경계):  {legacy_time:.3f}s, HTML {len(legacy_html) / 2**20:.1f}MB")
+
+    started = time.perf_counter()
+    region_map.prepare_boundaries()
+    print(f"줌 레벨별 경계 만들기 (처음 한 번): {time.perf_counter() - started:.3f}s")
+
+    region_map._boundaries.clear()
+    started = time.perf_counter()
+    region_map.load_boundaries(region_map.NATIONWIDE_ZOOM)
+    print(f"디스크 캐시에서 경계 읽기:      {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    for label, si_do_codes in (("전국", None), ("서울", ["11"])):
+        for metric in region_map.MAP_METRICS:
+            started = time.perf_counter()
+            html = region_map.region_map(metrics, metric, si_do_codes).get_root().render()
+            elapsed = time.perf_counter() - started
+            print(f"{label} {metric:<10} 지도: {elapsed * 1000:.1f}ms, HTML {len(html) / 2**20:.2f}MB "
+                  f"(원본 대비 {legacy_time / elapsed:.0f}배)")
+
+
+# 계측이 꺼져 있을 때/켜져 있을 때 구간 하나의 비용과 시군구 동시 조회 전체 시간
+def bench_trace(args):
+    from instrument import Trace, span, tracing
+
+    def spans(count):
+        started = time.perf_counter()
+        for _ in range(count):
+            with span("bench", "bench", rows=1) as bench_span:
+                bench_span.set(bytes=1)
+        return (time.perf_counter() - started) / count
+
+    disabled = spans(args.spans)
+    with tracing(Trace("bench")):
+        enabled = spans(args.spans)
+    print(f"구간 하나: 꺼짐 {disabled * 1e9:.0f}ns, 켜짐 {enabled * 1e9:.0f}ns")
+
+    tasks = load_tasks()
+    api = StubTransactionPrice(latency=args.latency)
+    for label, trace in (("꺼짐", None), ("켜짐", Trace("bench"))):
+        with tracing(trace):
+            started = time.perf_counter()
+            fetch_all(api, tasks, "202401", "202406", max_workers=16, rate_per_sec=0)
+            elapsed = time.perf_counter() - started
+        events = f", 이벤트 {len(trace.events)}개" if trace is not None else ""
+        print(f"시군구 {len(tasks)}개 동시 조회 (계측 {label}): {elapsed:.3f}s{events}")
+
+
+# 전국 조회 두 개가 먼저 들어간 뒤 시/도 하나짜리 조회가 들어올 때 기다리는 시간
+# (작업 스레드 하나로 들어온 순서대로 vs 우선순위 + 무거운 작업 동시 실행 제한), 같은 조회 공유
+def bench_jobs(args):
+    from jobs import JobScheduler
+
+    tasks = load_tasks()
+    light_tasks = [task for task in tasks if task["si_do_name"] == "서울특별시"]
+    api = StubTransactionPrice(latency=args.latency)
+
+    def fetch_job(job_tasks, start, end):
+        return lambda job: len(fetch_all(api, job_tasks, start, end, max_workers=16, rate_per_sec=0,
+                                         on_progress=job.update_progress))
+
+    for label, workers, prioritized in (("작업 스레드 1개, 들어온 순서", 1, False),
+                                        (f"작업 스레드 {args.workers}개, 우선순위", args.workers, True)):
+        scheduler = JobScheduler(workers=workers, heavy_workers=max(1, workers - 1))
+        started = time.perf_counter()
+        heavy_jobs = [
+            scheduler.submit(("전국", month), fetch_job(tasks, month, month),
+                             priority=len(tasks) if prioritized else 0, heavy=prioritized)[0]
+            for month in ("202401", "202402")
+        ]
+        duplicate, created = scheduler.submit(("전국", "202401"), fetch_job(tasks, "202401", "202401"))
+        # 무거운 작업이 먼저 시작하도록 잠깐 기다린 뒤 가벼운 조회를 넣는다
+        time.sleep(0.05)
+        light_job = scheduler.submit(("서울특별시", "202401"), fetch_job(light_tasks, "202401", "202401"),
+                                     priority=len(light_tasks) if prioritized else 0)[0]
+        light_job.wait()
+        light_elapsed = time.perf_counter() - started
+        for job in heavy_jobs:
+            job.wait()
+        total = time.perf_counter() - started
+        print(f"{label}: 서울 조회 대기 {light_job.started_at - light_job.created_at:.3f}s, 완료 {light_elapsed:.3f}s, "
+              f"전체 {total:.3f}s, 같은 전국 조회 공유 {duplicate is heavy_jobs[0] and not created}")
+
+
+# 전국 여러 해 합성 거래를 데이터셋에 저장한 뒤 저장된 기간 추세를 거래 행(pandas/DuckDB)과 거래량 파일로 계산
+# 같은 결과인지 확인하고, 새 달 하나를 저장할 때 다시 만드는 거래량 파일만 바뀌는지 본다
+def bench_rollup(args):
+    import rollup
+    from dataset import TransactionDataset, region_codes
+    from normalize import normalize_transactions, select_columns
+    from query_engine import compare_analyses, duckdb_available, get_analysis_engine
+    from synthetic import SyntheticTransactionPrice
+
+    def synthetic_frame(rows, start, end, seed):
+        api = SyntheticTransactionPrice(rows, start, end, seed=seed, categorical=True)
+        collector = FrameCollector()
+        for task in api.tasks:
+            collector.add(api.get_data("아파트", "매매", task["sigungu_code"], start_year_month=start,
+                                       end_year_month=end), task["sigungu_name"], task["si_do_name"])
+        return normalize_transactions(select_columns(collector.build()))
+
+    end_year = int(args.end[:4])
+    start = f"{end_year - args.years + 1}01"
+    selected_data = synthetic_frame(args.rows, start, args.end, seed=0)
+    all_codes = region_codes("전국")
+    root = tempfile.mkdtemp(prefix="bench-rollup-")
+    dataset = TransactionDataset(root)
+
+    started = time.perf_counter()
+    dataset.write(selected_data, all_codes, start, args.end)
+    print(f"{args.years}년 {len(selected_data):,}행 저장 (거래량 파일 포함): {time.perf_counter() - started:.3f}s, "
+          f"파티션 {len(dataset.files())}개")
+    del selected_data
+
+    timings = {}
+    started = time.perf_counter()
+    expected = dataset.analyze(all_codes)
+    timings["거래 행 (pandas)"] = time.perf_counter() - started
+    if duckdb_available():
+        started = time.perf_counter()
+        get_analysis_engine("duckdb").analyze_dataset(dataset, all_codes)
+        timings["거래 행 (DuckDB)"] = time.perf_counter() - started
+    rollup._memory.clear()
+    started = time.perf_counter()
+    cold = dataset.analyze_rollup(all_codes)
+    timings["거래량 파일 (처음)"] = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        warm = dataset.analyze_rollup(all_codes)
+    timings["거래량 파일 (메모리)"] = (time.perf_counter() - started) / args.repeat
+    for label, seconds in timings.items():
+        print(f"전국 저장 기간 추세 {label}: {seconds * 1000:.1f}ms")
+    mismatches = [name for name in compare_analyses(expected, warm) if name != "top_apartments"]
+    print(f"거래 행 집계와 일치: {'예' if not mismatches else mismatches}, 처음/메모리 일치 {not compare_analyses(cold, warm)}")
+
+    # 새 달 하나 저장: 그 해 파티션의 거래량 파일만 다시 만든다
+    year, month = divmod(int(args.end[:4]) * 12 + int(args.end[4:6]), 12)
+    new_month = f"{year}{month + 1:02d}"
+    paths = [rollup.rollup_path(root, path) for path in dataset.files()]
+    before = {path: os.stat(path).st_mtime_ns for path in paths}
+    new_data = synthetic_frame(max(1, args.rows // (args.years * 12)), new_month, new_month, seed=1)
+    started = time.perf_counter()
+    dataset.write(new_data, all_codes, new_month, new_month)
+    write_seconds = time.perf_counter() - started
+    changed = sum(1 for path in paths if os.stat(path).st_mtime_ns != before[path])
+    started = time.perf_counter()
+    updated = dataset.analyze_rollup(all_codes)
+    print(f"{new_month} {len(new_data):,}행 추가: 저장 {write_seconds:.3f}s, 다시 만든 기존 거래량 파일 {changed}개, "
+          f"다시 계산 {(time.perf_counter() - started) * 1000:.1f}ms, 총 거래량 {warm.total_volume:,} → {updated.total_volume:,}")
+
+
+# 합성 실거래 데이터로 조회 → 누적 → 정리 → 집계 → 그래프 → 리포트 단계를 행 수별로 재고 결과 파일에 쌓는다
+# 행 수마다 새 프로세스에서 실행한다 (이전 크기의 메모리/캐시가 다음 측정에 섞이지 않도록)
+def bench_suite(args):
+    context = multiprocessing.get_context("spawn")
+    records = []
+    for rows in args.rows:
+        options = {
+            "rows": rows,
+            "start": args.start,
+            "end": args.end,
+            "latency": args.latency,
+            "workers": args.workers,
+            "engine": args.engine,
+            "stages": args.stages,
+            "categorical": rows > args.object_max_rows,
+            "seed": args.seed,
+        }
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            record = pool.submit(run_suite, options).result()
+        record.update(git_revision())
+        records.append(record)
+        stages = ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in record["stages"].items())
+        print(f"{rows:>12,}행 ({record['raw']}): {stages}, 최대 메모리 {record['peak_memory'] / 2**20:.0f}MB")
+
+    os.makedirs(os.path.dirname(args.results) or ".", exist_ok=True)
+    with open(args.results, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    print(f"결과 저장: {args.results} (커밋 {records[0]['commit']}{' +수정' if records[0]['dirty'] else ''})")
+
+
+def run_suite(options):
+    import figures
+    from instrument import Trace, tracing
+    from normalize import normalize_transactions, select_columns
+    from pipeline import StageTimer
+    from query_engine import get_analysis_engine
+    from report import write_html_report
+    from synthetic import SyntheticTransactionPrice
+
+    rows = options["rows"]
+    api = SyntheticTransactionPrice(rows, options["start"], options["end"], latency=options["latency"],
+                                    seed=options["seed"], categorical=options["categorical"])
+    tasks = api.tasks
+    stages = options["stages"]
+    timer = StageTimer()
+    work_dir = tempfile.mkdtemp(prefix="bench-suite-")
+    # 그래프 캐시를 비워 두고 매번 새로 그린다
+    figures.FIGURE_CACHE_DIR = os.path.join(work_dir, "figures")
+    figures._memory_cache.clear()
+    report_bytes = None
+
+    with tracing(Trace("suite")) as trace:
+        if "fetch" in stages:
+            frames = timer.run("fetch", fetch_all, api, tasks, options["start"], options["end"],
+                               max_workers=options["workers"], rate_per_sec=0)
+        else:
+            frames = [api.get_data("아파트", "매매", task["sigungu_code"], start_year_month=options["start"],
+                                   end_year_month=options["end"]) for task in tasks]
+        del api
+
+        def accumulate():
+            collector = FrameCollector()
+            for task, df in zip(tasks, frames):
+                collector.add(df, task["sigungu_name"], task["si_do_name"])
+            return collector.build()
+
+        all_data = timer.run("accumulate", accumulate)
+        del frames
+        selected_data = timer.run("select", select_columns, all_data)
+        del all_data
+        selected_data = timer.run("normalize", normalize_transactions, selected_data)
+        analysis = timer.run("aggregate", get_analysis_engine(options["engine"]).analyze, selected_data)
+        images = {}
+        if "render" in stages:
+            images = timer.run("render", figures.render_figures, figures.build_figure_specs(analysis))
+        if "report" in stages:
+            report_path = os.path.join(work_dir, "report.html")
+            timer.run("report", write_html_report, report_path, images, analysis, selected_data)
+            report_bytes = os.path.getsize(report_path)
+            os.remove(report_path)
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "rows": rows,
+        "raw": "categorical" if options["categorical"] else "object",
+        "engine": options["engine"],
+        "latency": options["latency"],
+        "months": len(month_range(options["start"], options["end"])),
+        "stages": {stage: round(seconds, 6) for stage, seconds in timer.timings.items()},
+        "peak_memory": trace.peak_memory,
+        "report_bytes": report_bytes,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                                    text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": "unknown", "dirty": False}
+    return {"commit": commit, "dirty": dirty}
+
+
+# 결과 파일에서 두 커밋의 단계별 시간을 비교한다 (같은 행 수/원본 형식/엔진/지연끼리)
+# 기준보다 threshold 이상 느려진 단계가 있으면 종료 코드 1
+def bench_compare(args):
+    with open(args.results, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if not records:
+        print(f"결과가 없습니다: {args.results}")
+        return 1
+
+    def matches(record, revision):
+        return record["commit"].startswith(revision) or revision.startswith(record["commit"])
+
+    def latest(revision):
+        by_key = {}
+        for record in records:
+            if matches(record, revision):
+                by_key[(record["rows"], record["raw"], record["engine"], record["latency"])] = record
+        return by_key
+
+    current = args.current or records[-1]["commit"]
+    current_by_key = latest(current)
+    if args.baseline:
+        baseline = args.baseline
+    else:
+        # 기본 기준: 결과 파일에서 현재 커밋보다 먼저 나왔고 같은 조건으로 측정한 마지막 커밋
+        first = next((i for i, record in enumerate(records) if matches(record, current)), len(records))
+        earlier = dict.fromkeys(record["commit"] for record in records[:first] if not matches(record, current))
+        baseline = next((commit for commit in reversed(earlier) if set(latest(commit)) & set(current_by_key)), None)
+        if baseline is None:
+            print(f"비교할 이전 커밋 결과가 없습니다 (현재 {current})")
+            return 1
+    baseline_by_key = latest(baseline)
+    regressions = 0
+    print(f"기준 {baseline} → 현재 {current} (느려짐 기준 {args.threshold:.0%}, {args.min_seconds}s 미만 단계 제외)")
+    for key in sorted(set(baseline_by_key) & set(current_by_key)):
+        before, after = baseline_by_key[key]["stages"], current_by_key[key]["stages"]
+        print(f"{key[0]:>12,}행 ({key[1]}, {key[2]}, 지연 {key[3]}s)")
+        for stage in [stage for stage in SUITE_STAGES if stage in before and stage in after]:
+            ratio = after[stage] / before[stage] if before[stage] else float("inf")
+            slower = ratio > 1 + args.threshold and max(before[stage], after[stage]) >= args.min_seconds
+            regressions += slower
+            print(f"    {stage:<11}{before[stage]:9.3f}s → {after[stage]:9.3f}s  {ratio:6.2f}x"
+                  f"{'  느려짐' if slower else ''}")
+    if not set(baseline_by_key) & set(current_by_key):
+        print("같은 조건으로 측정한 결과가 없습니다")
+        return 1
+    return 1 if regressions else 0
+
+
+# 가짜 API 서버에 장애/지연을 주입하고 재시도, 차단기, checkpoint 재개를 확인
+def bench_resilience(args):
+    import tempfile
+
+    from fake_api import FakeMolitServer
+    from resilient import CircuitBreaker, FetchCheckpoint, QuotaExceededError, ResilientTransactionPrice, RetryPolicy
+
+    tasks = load_tasks(args.sigungu)
+    months = len(month_range(args.start, args.end))
+    expected = StubTransactionPrice(latency=0, seed=1)
+
+    def make_api(server):
+        return ResilientTransactionPrice(
+            "test-key", base_url=server.url, timeout=(1, args.timeout),
+            retry=RetryPolicy(max_attempts=args.attempts, base_delay=0.05, max_delay=1),
+            breaker=CircuitBreaker(failure_threshold=5, reset_timeout=0.5, max_reset_timeout=2)
+        )
+
+    def check(frames):
+        return all(
+            len(df) == months * expected.rows_per_month
+            and list(df["aptNm"]) == list(expected.get_data("아파트", "매매", task["sigungu_code"],
+                                                            start_year_month=args.start,
+                                                            end_year_month=args.end)["aptNm"])
+            for task, df in zip(tasks, frames)
+        )
+
+    def run(server, label, checkpoint=None):
+        api = make_api(server)
+        started = time.perf_counter()
+        error = None
+        frames = None
+        try:
+            frames = fetch_all(api, tasks, args.start, args.end, max_workers=args.workers, rate_per_sec=0,
+                               checkpoint=checkpoint)
+        except Exception as e:
+            error = e
+        elapsed = time.perf_counter() - started
+        print(f"[{label}] {elapsed:.2f}s, 결과 일치: {check(frames) if frames else '-'}"
+              f"{f', 실패: {type(error).__name__}' if error else ''}")
+        print(f"    클라이언트: {api.stats}, 차단기 열림 {api.breaker.opened_count}회")
+        print(f"    서버: {server.stats}")
+        return error
+
+    print(f"시군구 {len(tasks)}개 × {months}개월 = 요청 {len(tasks) * months}개, workers={args.workers}")
+    with FakeMolitServer(latency=args.latency, error_rate=args.error_rate, rate_limit_rate=args.error_rate / 3,
+                         api_error_rate=args.error_rate / 2, slow_rate=args.error_rate / 5,
+                         slow_latency=args.timeout * 3, drop_rate=args.error_rate / 3, retry_after=0,
+                         seed=1) as server:
+        run(server, "장애 주입")
+
+        # 서버가 잠시 모든 요청에 503을 주는 동안 차단기가 열려 요청을 멈춘다
+        server.reset(error_rate=0, rate_limit_rate=0, api_error_rate=0, slow_rate=0, drop_rate=0, outage=(0.1, 1.5))
+        run(server, "일시 장애(1.5s)")
+
+        # 일일 한도가 중간에 소진되면 끝난 시군구만 checkpoint에 남고, 다시 실행하면 나머지만 조회한다
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            checkpoint = FetchCheckpoint(checkpoint_dir)
+            server.reset(outage=None, quota_after=len(tasks) * months // 2)
+            error = run(server, "한도 소진", checkpoint)
+            completed = len(checkpoint.completed())
+            print(f"    checkpoint: 시군구 {completed}개 완료, 한도 오류 구분: {isinstance(error, QuotaExceededError)}")
+            server.reset(quota_after=None)
+            run(server, "재실행", checkpoint)
+            print(f"    재실행 요청 수: {server.stats.get('requests', 0)} "
+                  f"(남은 시군구 {len(tasks) - completed}개 × {months}개월 = {(len(tasks) - completed) * months})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="price_stastic 벤치마크")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    fetch_parser = subparsers.add_parser("fetch", help="시군구 동시 조회 엔진")
+    fetch_parser.add_argument("--sigungu", type=int, default=None, help="조회할 시군구 수 (기본: 전국)")
+    fetch_parser.add_argument("--start", default="202407")
+    fetch_parser.add_argument("--end", default="202408")
+    fetch_parser.add_argument("--latency", type=float, default=0.05, help="월당 주입할 지연 시간(초)")
+    fetch_parser.add_argument("--workers", type=int, default=16)
+    fetch_parser.add_argument("--rate", type=float, default=0, help="초당 요청 수 제한 (0이면 제한 없음)")
+    fetch_parser.set_defaults(func=bench_fetch)
+
+    collect_parser = subparsers.add_parser("collect", help="시군구별 프레임 누적")
+    collect_parser.add_argument("--sigungu", type=int, default=250, help="시군구 수")
+    collect_parser.add_argument("--months", type=int, default=12)
+    collect_parser.add_argument("--rows-per-month", type=int, default=100)
+    collect_parser.set_defaults(func=bench_collect)
+
+    district_parser = subparsers.add_parser("district", help="시군구 코드 인덱스 로드")
+    district_parser.add_argument("--repeat", type=int, default=20)
+    district_parser.set_defaults(func=bench_district)
+
+    aggregate_parser = subparsers.add_parser("aggregate", help="분석 자료 집계")
+    aggregate_parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    aggregate_parser.set_defaults(func=bench_aggregate)
+
+    engine_parser = subparsers.add_parser("engine", help="분석 엔진 결과 일치 확인 (pandas / DuckDB)")
+    engine_parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    engine_parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    engine_parser.set_defaults(func=bench_engine)
+
+    price_parser = subparsers.add_parser("price", help="가격 분석 (㎡당 가격 이동 분위수, 반복 거래)")
+    price_parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    price_parser.add_argument("--check-rows", type=int, default=1_000_000,
+                              help="이 행 수 이하에서는 pandas groupby 결과와 비교")
+    price_parser.set_defaults(func=bench_price)
+
+    index_parser = subparsers.add_parser("index", help="반복 거래 지수 (전체 만들기 / 마지막 달 추가)")
+    index_parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 5_000_000])
+    index_parser.add_argument("--check-rows", type=int, default=1_000_000,
+                              help="이 행 수 이하에서는 설계 행렬로 푼 결과와 비교")
+    index_parser.set_defaults(func=bench_index)
+
+    report_parser = subparsers.add_parser("report", help="HTML 리포트 생성")
+    report_parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    report_parser.set_defaults(func=bench_report)
+
+    table_parser = subparsers.add_parser("table", help="조회 결과 표 HTML 변환 (to_html / 벡터화)")
+    table_parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 500_000])
+    table_parser.set_defaults(func=bench_table)
+
+    figures_parser = subparsers.add_parser("figures", help="그래프 렌더링")
+    figures_parser.add_argument("--rows", type=int, default=100_000)
+    figures_parser.add_argument("--workers", type=int, default=max(2, os.cpu_count() or 1))
+    figures_parser.set_defaults(func=bench_figures)
+
+    map_parser = subparsers.add_parser("map", help="시군구 지도 (경계 단순화/캐시)")
+    map_parser.add_argument("--rows", type=int, default=1_000_000)
+    map_parser.add_argument("--vertices", type=int, default=2000, help="시군구 경계 하나의 꼭짓점 수")
+    map_parser.set_defaults(func=bench_map)
+
+    trace_parser = subparsers.add_parser("trace", help="실행 계측 비용 (꺼짐/켜짐)")
+    trace_parser.add_argument("--spans", type=int, default=200_000)
+    trace_parser.add_argument("--latency", type=float, default=0.01, help="월당 주입할 지연 시간(초)")
+    trace_parser.set_defaults(func=bench_trace)
+
+    rollup_parser = subparsers.add_parser("rollup", help="저장된 기간 추세 (거래 행 / 거래량 파일)")
+    rollup_parser.add_argument("--rows", type=int, default=2_000_000)
+    rollup_parser.add_argument("--years", type=int, default=10)
+    rollup_parser.add_argument("--end", default="202412", help="마지막 년월 (YYYYMM)")
+    rollup_parser.add_argument("--repeat", type=int, default=20)
+    rollup_parser.set_defaults(func=bench_rollup)
+
+    jobs_parser = subparsers.add_parser("jobs", help="백그라운드 조회 작업 (우선순위, 같은 조회 공유)")
+    jobs_parser.add_argument("--workers", type=int, default=2, help="작업 스레드 수")
+    jobs_parser.add_argument("--latency", type=float, default=0.05, help="월당 주입할 지연 시간(초)")
+    jobs_parser.set_defaults(func=bench_jobs)
+
+    suite_parser = subparsers.add_parser("suite", help="합성 실거래 데이터로 전체 단계 측정 (결과 파일에 쌓기)")
+    suite_parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    suite_parser.add_argument("--start", default="202401")
+    suite_parser.add_argument("--end", default="202412")
+    suite_parser.add_argument("--latency", type=float, default=0.0, help="월 요청 하나마다 주입할 지연 시간(초)")
+    suite_parser.add_argument("--workers", type=int, default=8, help="시군구 동시 조회 스레드 수")
+    suite_parser.add_argument("--engine", default="pandas", help="요약표 계산 엔진 (pandas/duckdb)")
+    suite_parser.add_argument("--stages", nargs="+", default=SUITE_STAGES, choices=SUITE_STAGES,
+                              help="측정할 단계 (누적/정리/집계는 항상 실행)")
+    suite_parser.add_argument("--object-max-rows", type=int, default=2_000_000,
+                              help="이 행 수까지는 원본 문자열 컬럼을 object로, 넘으면 categorical로 만든다 (메모리)")
+    suite_parser.add_argument("--seed", type=int, default=0)
+    suite_parser.add_argument("--results", default=BENCHMARK_RESULTS, help="결과를 쌓을 JSON Lines 파일")
+    suite_parser.set_defaults(func=bench_suite)
+
+    compare_parser = subparsers.add_parser("compare", help="두 커밋의 suite 결과 비교 (느려지면 종료 코드 1)")
+    compare_parser.add_argument("--baseline", default=None, help="기준 커밋 (기본: 현재 커밋 전의 마지막 결과)")
+    compare_parser.add_argument("--current", default=None, help="비교할 커밋 (기본: 마지막 결과)")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="이 비율 이상 느려지면 표시")
+    compare_parser.add_argument("--min-seconds", type=float, default=0.05, help="이보다 짧은 단계는 잡음으로 보고 제외")
+    compare_parser.add_argument("--results", default=BENCHMARK_RESULTS)
+    compare_parser.set_defaults(func=bench_compare)
+
+    resilience_parser = subparsers.add_parser("resilience", help="가짜 API 서버 장애 주입 (재시도/차단기/재개)")
+    resilience_parser.add_argument("--sigungu", type=int, default=40)
+    resilience_parser.add_argument("--start", default="202401")
+    resilience_parser.add_argument("--end", default="202406")
+    resilience_parser.add_argument("--workers", type=int, default=8)
+    resilience_parser.add_argument("--latency", type=float, default=0.01, help="서버 응답 지연(초)")
+    resilience_parser.add_argument("--error-rate", type=float, default=0.15, help="일시적 오류 비율")
+    resilience_parser.add_argument("--timeout", type=float, default=0.5, help="클라이언트 읽기 시간 제한(초)")
+    resilience_parser.add_argument("--attempts", type=int, default=8)
+    resilience_parser.set_defaults(func=bench_resilience)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
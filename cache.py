@@ -0,0 +1,182 @@
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import pandas as pd
+
+from fetcher import month_range
+
+# 캐시 위치와 크기 제한, 최근 월 데이터의 유효 시간 (환경 변수로 조정 가능)
+DEFAULT_CACHE_DIR = os.environ.get("MOLIT_CACHE_DIR", os.path.join(".cache", "molit"))
+DEFAULT_MAX_BYTES = int(os.environ.get("MOLIT_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+DEFAULT_RECENT_TTL = float(os.environ.get("MOLIT_CACHE_RECENT_TTL", str(6 * 60 * 60)))
+
+
+# TransactionPrice 앞에 두는 월 단위 디스크 캐시
+# (property_type, trade_type, sigungu_code, YYYYMM) 하나가 Parquet 파일 하나이며,
+# 지난 달 이전 데이터는 계속 보관하고 이번 달과 지난 달은 늦게 신고되는 거래가 있어 TTL을 둔다
+# 원본 TransactionPrice는 오류 응답도 빈 DataFrame으로 돌려주므로 빈 결과는 저장하지 않는다
+# (오류를 예외로 알리는 조회 객체(raises_on_error = True)의 빈 결과는 거래가 없는 달이므로 저장한다)
+class CachedTransactionPrice:
+    def __init__(self, api, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 recent_ttl=DEFAULT_RECENT_TTL):
+        self.api = api
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.recent_ttl = recent_ttl
+        self.lock = threading.Lock()
+        self.total_bytes = None
+
+    # TransactionPrice의 나머지 속성(meta_dict 등)은 원본 객체를 그대로 사용
+    def __getattr__(self, name):
+        return getattr(self.api, name)
+
+    # refresh_since(YYYYMM)를 주면 그 월부터는 캐시를 쓰지 않고 다시 조회해서 캐시를 새로 쓴다
+    # (증분 조회의 lookback 구간처럼 지난 월이라도 늦은 신고를 다시 받아야 할 때)
+    def get_data(self, property_type, trade_type, sigungu_code, year_month=None,
+                 start_year_month=None, end_year_month=None, translate=True, refresh_since=None, **kwargs):
+        if start_year_month and end_year_month:
+            months = month_range(start_year_month, end_year_month)
+        else:
+            months = [str(year_month)]
+
+        frames = []
+        for month in months:
+            df = None
+            if refresh_since is None or month < str(refresh_since):
+                df = self._read(property_type, trade_type, sigungu_code, month)
+            if df is None:
+                df = self.api.get_data(
+                    property_type=property_type,
+                    trade_type=trade_type,
+                    sigungu_code=sigungu_code,
+                    year_month=month,
+                    translate=False,
+                    **kwargs
+                )
+                # 추가 파라미터가 있는 요청은 결과가 달라질 수 있으므로 저장하지 않는다
+                if not kwargs and (not df.empty or getattr(self.api, "raises_on_error", False)):
+                    self._write(property_type, trade_type, sigungu_code, month, df)
+            frames.append(df)
+
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        if translate:
+            df = self.api.translate_columns(df)
+        return df
+
+    # 캐시에 없거나 만료된 월 목록 (refresh_since 이후 월은 모두 다시 조회한다)
+    def missing_months(self, property_type, trade_type, sigungu_code, start_year_month, end_year_month,
+                       refresh_since=None):
+        return [
+            month for month in month_range(start_year_month, end_year_month)
+            if (refresh_since is not None and month >= str(refresh_since))
+            or not self._is_fresh(self._path(property_type, trade_type, sigungu_code, month), month)
+        ]
+
+    def _path(self, property_type, trade_type, sigungu_code, month):
+        return os.path.join(self.cache_dir, property_type, trade_type, str(sigungu_code), f"{month}.parquet")
+
+    def _is_fresh(self, path, month):
+        try:
+            fetched_at = os.path.getmtime(path)
+        except OSError:
+            return False
+        if not is_recent_month(month):
+            return True
+        return time.time() - fetched_at < self.recent_ttl
+
+    def _read(self, property_type, trade_type, sigungu_code, month):
+        path = self._path(property_type, trade_type, sigungu_code, month)
+        if not self._is_fresh(path, month):
+            return None
+        try:
+            df = pd.read_parquet(path)
+            # 마지막 사용 시각은 atime에, 조회 시각은 mtime에 기록한다 (LRU 삭제용)
+            os.utime(path, (time.time(), os.path.getmtime(path)))
+        except (OSError, ValueError):
+            return None
+        return df
+
+    def _write(self, property_type, trade_type, sigungu_code, month, df):
+        path = self._path(property_type, trade_type, sigungu_code, month)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+
+        # 다른 스레드가 쓰다 만 파일을 읽지 않도록 임시 파일에 쓴 뒤 교체한다
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        except (OSError, ValueError, ImportError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = self._scan_size()
+            else:
+                self.total_bytes += os.path.getsize(path) - previous_size
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _cache_files(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".parquet"):
+                    yield os.path.join(root, name)
+
+    def _scan_size(self):
+        total = 0
+        for path in self._cache_files():
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    # 최근에 사용하지 않은 파일부터 최대 크기의 90% 이하가 될 때까지 삭제
+    def _evict(self):
+        entries = []
+        for path in self._cache_files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_atime, stat.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self.total_bytes = total
+
+    def clear(self):
+        with self.lock:
+            for path in list(self._cache_files()):
+                os.remove(path)
+            self.total_bytes = 0
+
+
+# 이번 달과 지난 달은 아직 신고가 들어오는 중인 월로 본다
+def is_recent_month(month, now=None):
+    now = now or datetime.now()
+    year, month_number = int(str(month)[:4]), int(str(month)[4:6])
+    months_ago = (now.year - year) * 12 + now.month - month_number
+    return months_ago <= 1
+
+
+# 신고가 다 들어온 마지막 월 (YYYYMM, is_recent_month가 아닌 가장 최근 월)
+def last_settled_month(now=None):
+    now = now or datetime.now()
+    year, month = divmod(now.year * 12 + now.month - 1 - 2, 12)
+    return f"{year:04d}{month + 1:02d}"
@@ -0,0 +1,249 @@
+import argparse
+import os
+import re
+import sys
+import time
+
+from incremental import DEFAULT_LOOKBACK_MONTHS
+from instrument import Trace, tracing
+from query_engine import ANALYSIS_ENGINE, ENGINE_NAMES
+from schema import PROPERTY_TYPES, TRADE_TYPES, type_label
+
+# 종료 코드 (3/5는 다시 실행하면 checkpoint에서 이어서 조회한다)
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_FETCH_FAILED = 3
+EXIT_NO_DATA = 4
+EXIT_QUOTA_EXCEEDED = 5
+
+SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+TABLE_MODES = ["auto", "html", "virtual"]
+
+
+# Streamlit 없이 조회 → 타입 정리 → 분석 → 리포트를 실행하는 배치용 명령
+# 예: python cli.py --region 서울특별시 --start 202401 --end 202406 --output-dir out
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    for name in ("start", "end"):
+        if not re.fullmatch(r"\d{4}(0[1-9]|1[0-2])", getattr(args, name)):
+            parser.error(f"--{name}: YYYYMM 형식이어야 합니다 ({getattr(args, name)})")
+    if args.start > args.end:
+        parser.error(f"조회 시작 년월({args.start})이 종료 년월({args.end})보다 늦습니다")
+
+    service_key = args.service_key or load_service_key()
+    if not service_key:
+        parser.error(f"서비스 키가 없습니다 (--service-key, SERVICE_KEY 환경 변수 또는 {SECRETS_PATH})")
+
+    if args.processes > 1:
+        if args.region != "전국":
+            parser.error("--processes는 --region 전국에서만 사용할 수 있습니다 (시/도 단위로 나눠 처리)")
+        if args.incremental:
+            parser.error("--processes와 --incremental은 같이 사용할 수 없습니다")
+        if args.dataset_dir:
+            parser.error("--processes와 --dataset-dir은 같이 사용할 수 없습니다")
+
+    # --trace/--chrome-trace가 있을 때만 단계별 구간을 기록한다 (시/도별 프로세스 안은 기록하지 않음)
+    trace = Trace("cli") if args.trace or args.chrome_trace else None
+    with tracing(trace):
+        exit_code = run_fanout_batch(args, service_key) if args.processes > 1 else run_batch(args, service_key)
+    if trace is not None:
+        if args.trace:
+            print(f"계측 파일: {trace.write_json(args.trace)}", file=sys.stderr)
+        if args.chrome_trace:
+            print(f"Chrome trace: {trace.write_chrome_trace(args.chrome_trace)}", file=sys.stderr)
+    return exit_code
+
+
+# 현재 프로세스에서 조회 → 분석 → 데이터셋/리포트 저장
+def run_batch(args, service_key):
+    # 무거운 모듈은 인자를 확인한 뒤에 불러온다
+    from pipeline import StageTimer, analyze_transactions, create_api, fetch_transactions
+    from query_engine import get_analysis_engine
+    from report import write_html_report
+    from resilient import QuotaExceededError
+
+    started = time.perf_counter()
+    timer = StageTimer()
+    api = create_api(service_key)
+
+    def update_progress(processed_count, total_count, task):
+        if not args.quiet:
+            print(f"[{processed_count}/{total_count}] {task['si_do_name']} {task['sigungu_name']} ({task['sigungu_code']})",
+                  file=sys.stderr)
+
+    try:
+        all_data = timer.run("fetch", fetch_transactions, api, args.region, args.start, args.end,
+                             property_type=args.property_type, trade_type=args.trade_type,
+                             incremental=args.incremental, lookback_months=args.lookback,
+                             on_progress=update_progress)
+    except ValueError as e:
+        print(f"오류: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    except QuotaExceededError as e:
+        print(f"API 일일 요청 한도 초과: {e} (다시 실행하면 끝난 시군구부터 이어서 조회)", file=sys.stderr)
+        return EXIT_QUOTA_EXCEEDED
+    except Exception as e:
+        print(f"조회 실패: {e!r} (다시 실행하면 끝난 시군구부터 이어서 조회)", file=sys.stderr)
+        return EXIT_FETCH_FAILED
+
+    if all_data.empty:
+        print(f"조회된 거래가 없습니다: {args.region} {args.start}~{args.end}", file=sys.stderr)
+        return EXIT_NO_DATA
+
+    try:
+        result = analyze_transactions(all_data, render=not args.no_report, timer=timer,
+                                      engine=get_analysis_engine(args.engine))
+        del all_data
+
+        os.makedirs(args.output_dir, exist_ok=True)
+        prefix = output_prefix(args)
+
+        dataset_path = f"{prefix}.parquet"
+        timer.run("write_dataset", result.selected_data.to_parquet, dataset_path, index=False)
+        outputs = [dataset_path]
+
+        # 장기 추세 분석용 데이터셋에도 저장 (같은 시/도의 같은 월은 새 데이터로 바뀐다)
+        if args.dataset_dir:
+            from dataset import TransactionDataset, region_codes
+            store = TransactionDataset(args.dataset_dir, args.property_type, args.trade_type)
+            timer.run("store", store.write, result.selected_data, region_codes(args.region), args.start, args.end)
+            outputs.append(store.root)
+
+        if not args.no_report:
+            report_path = f"{prefix}.html"
+            timer.run("write_report", write_html_report, report_path, result.figures, result.analysis,
+                      result.analysis_data, table_mode=args.table_mode)
+            outputs.append(report_path)
+    except Exception as e:
+        print(f"처리 실패: {e!r}", file=sys.stderr)
+        return EXIT_ERROR
+
+    print(f"거래 {len(result.selected_data):,}건 (분석 대상 {len(result.analysis_data):,}건)")
+    print(f"메모리 사용량: {result.memory_before / 2**20:.1f}MB → {result.memory_after / 2**20:.1f}MB (타입 정리 후)")
+    print_timings(timer.timings, started)
+    for path in outputs:
+        print(path)
+    return EXIT_OK
+
+
+# 전국을 시/도별 프로세스로 나눠 처리한다
+# 데이터셋은 {prefix}.parquet/si_do_code=XX/ 디렉터리로 쓰고 (pd.read_parquet으로 그대로 읽힌다)
+# 리포트의 요약표/그래프는 시/도별 중간 집계를 합쳐서 만든다
+def run_fanout_batch(args, service_key):
+    from fanout import load_shard_rows, run_fanout
+    from figures import build_figure_specs, render_figures
+    from pipeline import StageTimer
+    from report import write_html_report
+    from resilient import QuotaExceededError
+
+    started = time.perf_counter()
+    timer = StageTimer()
+    prefix = output_prefix(args)
+    dataset_path = f"{prefix}.parquet"
+
+    def update_progress(processed_count, total_count, shard):
+        if not args.quiet:
+            peak = f", 최대 메모리 {shard.peak_memory / 2**20:.0f}MB" if shard.peak_memory else ""
+            print(f"[{processed_count}/{total_count}] {shard.si_do_name} ({shard.si_do_code}): "
+                  f"{shard.rows:,}건, {sum(shard.timings.values()):.2f}s{peak}", file=sys.stderr)
+
+    try:
+        result = timer.run("fanout", run_fanout, (service_key,), args.start, args.end, dataset_path,
+                           property_type=args.property_type, trade_type=args.trade_type,
+                           max_workers=args.processes, on_shard=update_progress)
+    except QuotaExceededError as e:
+        print(f"API 일일 요청 한도 초과: {e}", file=sys.stderr)
+        return EXIT_QUOTA_EXCEEDED
+    except Exception as e:
+        print(f"조회 실패: {e!r}", file=sys.stderr)
+        return EXIT_FETCH_FAILED
+
+    if result.rows == 0:
+        print(f"조회된 거래가 없습니다: {args.region} {args.start}~{args.end}", file=sys.stderr)
+        return EXIT_NO_DATA
+
+    outputs = [dataset_path]
+    try:
+        if not args.no_report:
+            figures = timer.run("render", render_figures, build_figure_specs(result.analysis))
+            # 리포트의 "조회 결과" 표에만 행 데이터가 필요하다
+            rows = timer.run("load_rows", load_shard_rows, result.shards)
+            analysis_data = rows.dropna(subset=['전용면적'])
+            del rows
+            report_path = f"{prefix}.html"
+            timer.run("write_report", write_html_report, report_path, figures, result.analysis,
+                      analysis_data, table_mode=args.table_mode)
+            outputs.append(report_path)
+    except Exception as e:
+        print(f"처리 실패: {e!r}", file=sys.stderr)
+        return EXIT_ERROR
+
+    print(f"거래 {result.rows:,}건 (시/도 {len(result.shards)}개, 프로세스 {args.processes}개)")
+    shard_timings = {}
+    for shard in result.shards:
+        for stage, seconds in shard.timings.items():
+            shard_timings[f"shard.{stage}"] = shard_timings.get(f"shard.{stage}", 0.0) + seconds
+    print_timings({**shard_timings, **timer.timings}, started)
+    for path in outputs:
+        print(path)
+    return EXIT_OK
+
+
+def output_prefix(args):
+    return os.path.join(args.output_dir, f"{args.region}_{type_label(args.property_type).replace(',', '+')}_"
+                                         f"{type_label(args.trade_type).replace(',', '+')}_{args.start}_{args.end}")
+
+
+# shard.*는 시/도별 프로세스 시간의 합 (동시에 실행되므로 total보다 클 수 있다)
+def print_timings(timings, started):
+    for stage, seconds in timings.items():
+        print(f"  {stage:<16}{seconds:8.3f}s")
+    print(f"  {'total':<16}{time.perf_counter() - started:8.3f}s")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="부동산 실거래가 조회 및 리포트 생성 (배치)")
+    parser.add_argument("--region", required=True, help="시/도 이름 (예: 서울특별시) 또는 '전국'")
+    parser.add_argument("--start", required=True, help="조회 시작 년월 (YYYYMM)")
+    parser.add_argument("--end", required=True, help="조회 종료 년월 (YYYYMM)")
+    parser.add_argument("--property-type", nargs="+", default=["아파트"], choices=PROPERTY_TYPES, metavar="TYPE",
+                        help=f"부동산 유형, 여러 개면 같이 조회해서 합친다 ({', '.join(PROPERTY_TYPES)}, 기본: 아파트)")
+    parser.add_argument("--trade-type", nargs="+", default=["매매"], choices=TRADE_TYPES, metavar="TYPE",
+                        help=f"거래 유형, 여러 개면 같이 조회해서 합친다 ({', '.join(TRADE_TYPES)}, 기본: 매매)")
+    parser.add_argument("--output-dir", default="output", help="데이터셋과 리포트를 저장할 디렉터리")
+    parser.add_argument("--service-key", default=None, help="공공데이터포털 서비스 키 (기본: SERVICE_KEY 환경 변수)")
+    parser.add_argument("--incremental", action="store_true", help="저장된 데이터에 최근 월만 새로 받아 합치기")
+    parser.add_argument("--lookback", type=int, default=DEFAULT_LOOKBACK_MONTHS, help="증분 조회 시 다시 받을 지난 월 수")
+    parser.add_argument("--table-mode", choices=TABLE_MODES, default="auto", help="리포트 표 형식")
+    parser.add_argument("--no-report", action="store_true", help="데이터셋만 저장하고 그래프/리포트는 만들지 않음")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="전국 조회를 시/도별로 나눠 처리할 프로세스 수 (1이면 현재 프로세스에서 처리)")
+    parser.add_argument("--engine", choices=ENGINE_NAMES, default=ANALYSIS_ENGINE,
+                        help="요약표 계산 엔진 (duckdb가 설치되어 있지 않으면 pandas)")
+    parser.add_argument("--dataset-dir", default=None,
+                        help="조회 결과를 시/도·연도별 Parquet 데이터셋에도 쌓아 둘 디렉터리 (장기 추세 분석용)")
+    parser.add_argument("--quiet", action="store_true", help="시군구별 진행 상황을 출력하지 않음")
+    parser.add_argument("--trace", default=None, metavar="PATH",
+                        help="단계별 시간, 시군구별 행 수/받은 바이트, 최대 메모리를 JSON 파일로 저장")
+    parser.add_argument("--chrome-trace", default=None, metavar="PATH",
+                        help="같은 계측을 Chrome trace event 형식으로 저장 (chrome://tracing, Perfetto에서 열기)")
+    return parser
+
+
+# --service-key가 없으면 환경 변수, 그다음 Streamlit secrets 파일에서 찾는다
+def load_service_key(secrets_path=SECRETS_PATH):
+    if os.environ.get("SERVICE_KEY"):
+        return os.environ["SERVICE_KEY"]
+    try:
+        import tomllib
+        with open(secrets_path, "rb") as f:
+            return tomllib.load(f).get("general", {}).get("SERVICE_KEY")
+    except (ImportError, OSError, ValueError):
+        return None
+
+
+if __name__ == "__main__":
+    sys.exit(main())
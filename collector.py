@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from instrument import span
+
+
+# 시군구별 DataFrame을 모아 두었다가 마지막에 한 번만 합치는 수집기
+# 반복문 안에서 pd.concat을 호출하면 매번 누적 데이터 전체가 복사되므로(O(n²)) 대신 사용한다
+class FrameCollector:
+    def __init__(self):
+        self.frames = []
+        self.sigungu_names = []
+        self.si_do_names = []
+        self.types = []
+
+    def __len__(self):
+        return sum(len(df) for df in self.frames)
+
+    # property_type/trade_type: 조회한 부동산 유형/거래 유형 (여러 유형을 같이 모을 때 select_columns가 구분한다)
+    def add(self, df, sigungu_name, si_do_name, property_type="아파트", trade_type="매매"):
+        if df is None:
+            return
+        self.frames.append(df)
+        self.sigungu_names.append(sigungu_name)
+        self.si_do_names.append(si_do_name)
+        self.types.append((property_type, trade_type))
+
+    def build(self):
+        if not self.frames:
+            return pd.DataFrame()
+
+        lengths = np.array([len(df) for df in self.frames], dtype=np.int64)
+        with span("concat", frames=len(self.frames), rows=int(lengths.sum())):
+            all_data = pd.concat(self.frames, ignore_index=True)
+
+        # 시군구/시도 이름과 유형은 프레임 단위로 한 번만 코드화해서 categorical 컬럼으로 붙인다
+        all_data["sigungu_name"] = _repeat_categorical(self.sigungu_names, lengths)
+        all_data["si_do_name"] = _repeat_categorical(self.si_do_names, lengths)
+        all_data["property_type"] = _repeat_categorical([pair[0] for pair in self.types], lengths)
+        all_data["trade_type"] = _repeat_categorical([pair[1] for pair in self.types], lengths)
+
+        # 합친 뒤에는 원본 프레임 참조를 놓아 메모리를 돌려준다
+        self.frames = []
+        self.sigungu_names = []
+        self.si_do_names = []
+        self.types = []
+        return all_data
+
+
+def _repeat_categorical(names, lengths):
+    # 행이 있는 이름만 카테고리로 사용하고, 기존 groupby 결과와 같은 순서가 되도록 정렬한다
+    categories = sorted({name for name, length in zip(names, lengths) if length > 0})
+    index = {name: code for code, name in enumerate(categories)}
+    codes = np.array([index.get(name, -1) for name in names], dtype=np.int32)
+    return pd.Categorical.from_codes(np.repeat(codes, lengths), categories=categories)
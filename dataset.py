@@ -0,0 +1,327 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from aggregate import compute_partial_analysis, merge_partial_analyses, merge_partials
+from district import DistrictConverter
+from normalize import CATEGORY_COLUMNS
+from rollup import analyze_rollups, load_rollups, refresh_rollups, rollup_path, write_rollup
+from schema import COMMON_COLUMNS, transaction_types
+
+# 조회한 거래를 쌓아 두는 Parquet 데이터셋 위치 (환경 변수로 조정 가능)
+DEFAULT_DATASET_DIR = os.environ.get("TRANSACTION_DATASET_DIR", os.path.join(".cache", "dataset"))
+# 파일 안의 row group 크기 (거래일자 순으로 정렬해서 쓰므로 월 조건으로 row group 단위로 건너뛴다)
+DATASET_ROW_GROUP_SIZE = int(os.environ.get("TRANSACTION_DATASET_ROW_GROUP_SIZE", str(64 * 1024)))
+# 집계할 때 한 번에 메모리에 올리는 행 수
+DATASET_BATCH_SIZE = int(os.environ.get("TRANSACTION_DATASET_BATCH_SIZE", str(256 * 1024)))
+# 배치별 중간 집계를 이 수만큼 모으면 하나로 합쳐 메모리를 일정하게 유지한다
+DATASET_MERGE_EVERY = 32
+
+# 분석(compute_analysis)에 필요한 컬럼
+ANALYSIS_COLUMNS = ["시군구", "법정동", "아파트", "전용면적", "거래일자", "거래유형"]
+
+# normalize_transactions 결과의 컬럼 타입
+_INTEGER_COLUMNS = {"거래금액": "int32", "보증금": "int32", "월세": "int32", "층": "int16", "건축년도": "int16"}
+# 디렉터리 이름에서 읽는 컬럼
+_TYPE_PARTITIONS = {"부동산유형": "property_type", "거래구분": "trade_type"}
+
+# 같은 데이터셋을 여러 세션이 같이 쓰므로 쓰기는 프로세스 전체에서 하나씩
+_write_lock = threading.Lock()
+
+
+# 타입 정리한 거래를 부동산 유형/거래 유형/시도/연도 단위 파일로 저장하고 필요한 부분만 읽는 데이터셋
+# {root}/property_type=아파트/trade_type=매매/si_do_code=11/dealYear=2024/part-0.parquet
+# - property_type/trade_type: 이 객체가 다루는 유형 (이름 하나 또는 목록, None은 전체)
+#   여러 유형을 같이 읽으면 공통 컬럼(schema.COMMON_COLUMNS)이라 같은 분석 코드를 그대로 쓴다
+# - 읽을 때는 유형, 시/도, 연도 조건으로 파일을 고르고 시군구/월 조건은 row group 통계로 걸러낸다 (predicate pushdown)
+# - 필요한 컬럼만 읽고 (column pruning) 파일은 메모리 매핑으로 연다
+# - 같은 유형/시/도의 같은 월을 다시 쓰면 기존 행을 새 행으로 바꾼다
+# - 파일을 쓸 때마다 같은 파티션의 (시군구, 월, 면적 범위, 거래유형) 거래량 파일도 다시 만든다 (rollup.py)
+# 거래일자가 없는 행은 파티션(연도)을 정할 수 없어 저장하지 않는다
+class TransactionDataset:
+    def __init__(self, root=DEFAULT_DATASET_DIR, property_type="아파트", trade_type="매매"):
+        self.root = root
+        self.types = transaction_types(property_type, trade_type)
+
+    def _type_dir(self, property_type, trade_type):
+        return os.path.join(self.root, f"property_type={property_type}", f"trade_type={trade_type}")
+
+    def _path(self, property_type, trade_type, si_do_code, year):
+        return os.path.join(self._type_dir(property_type, trade_type),
+                            f"si_do_code={si_do_code}", f"dealYear={year}", "part-0.parquet")
+
+    # 조회 구간 [start_year_month, end_year_month]의 (유형, si_do_codes) 데이터를 selected_data로 바꿔 쓴다
+    # (조회 결과에 없는 유형/시/도/월도 구간 안이면 비운다, 부동산유형/거래구분 컬럼이 없으면 유형이 하나여야 한다)
+    def write(self, selected_data, si_do_codes, start_year_month, end_year_month):
+        start, end = _month_start(start_year_month), _month_start(end_year_month, 1)
+        converter = DistrictConverter()
+        row_codes = selected_data["시도"].astype("object").map(converter.si_do_codes)
+        dates = selected_data["거래일자"]
+        years = dates.dt.year
+        if "부동산유형" not in selected_data.columns and len(self.types) > 1:
+            raise ValueError("여러 유형을 저장하려면 부동산유형/거래구분 컬럼이 필요합니다")
+
+        with _write_lock:
+            for property_type, trade_type in self.types:
+                if "부동산유형" in selected_data.columns:
+                    type_rows = ((selected_data["부동산유형"] == property_type)
+                                 & (selected_data["거래구분"] == trade_type)).to_numpy()
+                else:
+                    type_rows = np.ones(len(selected_data), dtype=bool)
+                for si_do_code in si_do_codes:
+                    for year in range(int(str(start_year_month)[:4]), int(str(end_year_month)[:4]) + 1):
+                        rows = selected_data.loc[
+                            type_rows & (row_codes == si_do_code).to_numpy() & (years == year).to_numpy()]
+                        self._replace(self._path(property_type, trade_type, si_do_code, year), rows, start, end)
+
+    # 파일 하나에서 [start, end) 구간의 행을 rows로 바꾼다
+    def _replace(self, path, rows, start, end):
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        table = _to_table(rows)
+        if os.path.exists(path):
+            # 조회 구간 밖의 기존 행은 남긴다
+            stored = pq.read_table(path, memory_map=True)
+            dates_column = stored.column("거래일자")
+            outside = pc.or_(pc.less(dates_column, start), pc.greater_equal(dates_column, end))
+            stored = stored.filter(pc.fill_null(outside, True))
+            table = _concat([stored, table])
+
+        if table.num_rows == 0:
+            if os.path.exists(path):
+                os.remove(path)
+            write_rollup(self.root, path, None)
+            return
+        table = table.sort_by([("거래일자", "ascending")])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 쓰는 중인 파일은 "."으로 시작해 읽는 쪽에서 보이지 않는다
+        tmp_path = os.path.join(os.path.dirname(path), f".part-0.{os.getpid()}.{threading.get_ident()}.tmp")
+        pq.write_table(table, tmp_path, row_group_size=DATASET_ROW_GROUP_SIZE)
+        os.replace(tmp_path, path)
+        write_rollup(self.root, path, table)
+
+    # 조건에 맞는 행을 normalize_transactions 결과와 같은 타입의 DataFrame으로 읽는다
+    def load(self, si_do_codes=None, sigungu_names=None, start_year_month=None, end_year_month=None, columns=None):
+        columns = columns or _frame_columns()
+        dataset = self._dataset()
+        if dataset is None:
+            return pd.DataFrame(columns=columns)
+        table = dataset.to_table(
+            columns=_projection(columns),
+            filter=_filter(si_do_codes, sigungu_names, start_year_month, end_year_month),
+        )
+        return _to_frame(table)
+
+    # 조건에 맞는 행을 배치 단위로 읽으면서 compute_analysis와 같은 분석 결과를 만든다
+    # 전체 행을 한 번에 메모리에 올리지 않는다 (배치 하나 + 합쳐 둔 중간 집계)
+    def analyze(self, si_do_codes=None, sigungu_names=None, start_year_month=None, end_year_month=None):
+        import pyarrow.dataset as ds
+
+        dataset = self._dataset()
+        if dataset is None:
+            return merge_partial_analyses([])
+        # 분석에서는 전용면적이 없는 행을 뺀다 (analyze_transactions와 같다)
+        condition = ds.field("전용면적").is_valid()
+        pushed = _filter(si_do_codes, sigungu_names, start_year_month, end_year_month)
+        if pushed is not None:
+            condition = condition & pushed
+        scanner = dataset.scanner(columns=ANALYSIS_COLUMNS, filter=condition, batch_size=DATASET_BATCH_SIZE)
+
+        partials = []
+        for batch in scanner.to_batches():
+            if batch.num_rows == 0:
+                continue
+            partials.append(compute_partial_analysis(_to_frame(batch)))
+            if len(partials) >= DATASET_MERGE_EVERY:
+                partials = [merge_partials(partials)]
+        return merge_partial_analyses(partials)
+
+    # 파티션별 거래량 파일로 만든 분석 결과 (거래 행을 읽지 않으므로 법정동별 최다 거래 아파트 표는 비어 있다)
+    # 월별/면적 범위별/지역별/거래유형별 거래량만 필요한 화면은 analyze 대신 이것을 쓴다
+    def analyze_rollup(self, si_do_codes=None, sigungu_names=None, start_year_month=None, end_year_month=None):
+        return analyze_rollups(self.rollups(si_do_codes, start_year_month, end_year_month),
+                               start_year_month, end_year_month, sigungu_names)
+
+    # 조건에 맞는 파티션의 거래량 파일 (시군구코드 단위, 부동산유형/거래구분/시도코드 컬럼 포함)
+    # 거래량 파일이 없거나 데이터 파일보다 오래된 파티션은 먼저 다시 만든다
+    def rollups(self, si_do_codes=None, start_year_month=None, end_year_month=None):
+        data_paths = self.files(si_do_codes, start_year_month, end_year_month)
+        refresh_rollups(self.root, data_paths, _write_lock)
+        return load_rollups([rollup_path(self.root, path) for path in data_paths])
+
+    # 저장된 파일 목록 (이 객체의 유형만, 시/도와 연도 조건이 있으면 그 파티션만)
+    def files(self, si_do_codes=None, start_year_month=None, end_year_month=None):
+        paths = []
+        for property_type, trade_type in self.types:
+            type_dir = self._type_dir(property_type, trade_type)
+            if not os.path.isdir(type_dir):
+                continue
+            for si_do_dir in sorted(os.listdir(type_dir)):
+                if not si_do_dir.startswith("si_do_code="):
+                    continue
+                if si_do_codes is not None and si_do_dir.split("=", 1)[1] not in {str(code) for code in si_do_codes}:
+                    continue
+                for year_dir in sorted(os.listdir(os.path.join(type_dir, si_do_dir))):
+                    path = os.path.join(type_dir, si_do_dir, year_dir, "part-0.parquet")
+                    if not year_dir.startswith("dealYear=") or not os.path.exists(path):
+                        continue
+                    year = int(year_dir.split("=", 1)[1])
+                    if start_year_month and year < int(str(start_year_month)[:4]):
+                        continue
+                    if end_year_month and year > int(str(end_year_month)[:4]):
+                        continue
+                    paths.append(path)
+        return paths
+
+    # 저장된 (시/도 코드, 연도) 목록 (여러 유형에 있는 같은 시/도·연도는 한 번만)
+    def partitions(self):
+        result = set()
+        for path in self.files():
+            year_dir = os.path.dirname(path)
+            si_do_dir = os.path.dirname(year_dir)
+            result.add((os.path.basename(si_do_dir).split("=", 1)[1], int(os.path.basename(year_dir).split("=", 1)[1])))
+        return sorted(result)
+
+    def _dataset(self):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        from pyarrow import fs
+
+        files = self.files()
+        if not files:
+            return None
+        partitioning = ds.partitioning(
+            pa.schema([("property_type", pa.string()), ("trade_type", pa.string()),
+                       ("si_do_code", pa.string()), ("dealYear", pa.int16())]), flavor="hive")
+        return ds.dataset(
+            files,
+            schema=_schema(with_partitions=True),
+            format="parquet",
+            partitioning=partitioning,
+            partition_base_dir=self.root,
+            filesystem=fs.LocalFileSystem(use_mmap=True),
+        )
+
+
+# 시/도 이름(또는 "전국")에 해당하는 시/도 코드 목록
+def region_codes(si_do_name, converter=None):
+    converter = converter or DistrictConverter()
+    if si_do_name == "전국":
+        return list(dict.fromkeys(district["si_do_code"] for district in converter.districts))
+    si_do_code = converter.get_si_do_code(si_do_name)
+    return [si_do_code] if si_do_code else []
+
+
+# 조건식: 시/도와 연도는 디렉터리 단위로, 시군구와 월은 파일 안에서 거른다
+def _filter(si_do_codes=None, sigungu_names=None, start_year_month=None, end_year_month=None):
+    import pyarrow.dataset as ds
+
+    conditions = []
+    if si_do_codes is not None:
+        conditions.append(ds.field("si_do_code").isin([str(code) for code in si_do_codes]))
+    if start_year_month:
+        conditions.append(ds.field("dealYear") >= int(str(start_year_month)[:4]))
+        conditions.append(ds.field("거래일자") >= _month_start(start_year_month))
+    if end_year_month:
+        conditions.append(ds.field("dealYear") <= int(str(end_year_month)[:4]))
+        conditions.append(ds.field("거래일자") < _month_start(end_year_month, 1))
+    if sigungu_names is not None:
+        conditions.append(ds.field("시군구").isin(list(sigungu_names)))
+    if not conditions:
+        return None
+    condition = conditions[0]
+    for other in conditions[1:]:
+        condition = condition & other
+    return condition
+
+
+def _month_start(year_month, offset=0):
+    import pyarrow as pa
+
+    year, month = divmod(int(str(year_month)[:4]) * 12 + int(str(year_month)[4:6]) - 1 + offset, 12)
+    return pa.scalar(np.datetime64(f"{year:04d}-{month + 1:02d}-01", "ns"), type=pa.timestamp("ns"))
+
+
+# 저장 형식: categorical 컬럼은 사전 인코딩(int32 코드로 통일), 나머지는 normalize_transactions 타입
+# 부동산유형/거래구분은 파일에 쓰지 않고 디렉터리 이름(property_type/trade_type)에서 읽는다
+def _schema(with_partitions=False):
+    import pyarrow as pa
+
+    fields = []
+    for column in COMMON_COLUMNS:
+        if column in ("거래월", "거래일") or column in _TYPE_PARTITIONS:
+            continue
+        if column == "거래년도":
+            fields.append(pa.field("거래일자", pa.timestamp("ns")))
+        elif column in CATEGORY_COLUMNS:
+            fields.append(pa.field(column, pa.dictionary(pa.int32(), pa.string())))
+        elif column in _INTEGER_COLUMNS:
+            fields.append(pa.field(column, pa.type_for_alias(_INTEGER_COLUMNS[column])))
+        elif column == "전용면적":
+            fields.append(pa.field(column, pa.float32()))
+        else:
+            fields.append(pa.field(column, pa.string()))
+    if with_partitions:
+        fields += [pa.field("property_type", pa.string()), pa.field("trade_type", pa.string()),
+                   pa.field("si_do_code", pa.string()), pa.field("dealYear", pa.int16())]
+    return pa.schema(fields)
+
+
+# normalize_transactions 결과와 같은 순서의 컬럼 (저장된 컬럼 + 부동산유형/거래구분)
+def _frame_columns():
+    return list(_schema().names) + list(_TYPE_PARTITIONS)
+
+
+# 읽을 컬럼 → 스캔할 식 (부동산유형/거래구분은 파티션 값)
+def _projection(columns):
+    import pyarrow.dataset as ds
+
+    return {column: ds.field(_TYPE_PARTITIONS.get(column, column)) for column in columns}
+
+
+def _to_table(rows):
+    import pyarrow as pa
+
+    schema = _schema()
+    columns = []
+    for field in schema:
+        series = rows[field.name] if field.name in rows.columns else pd.Series(None, index=rows.index, dtype="object")
+        if pa.types.is_string(field.type):
+            # 원본 문자열 컬럼은 API 응답에 따라 숫자로 오기도 한다
+            series = series.astype("string")
+        elif pa.types.is_dictionary(field.type):
+            series = series.astype("object")
+        columns.append(pa.Array.from_pandas(series, type=field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+# 파일마다 사전이 다르므로 합친 뒤 하나로 맞춘다
+def _concat(tables):
+    import pyarrow as pa
+
+    return pa.concat_tables(tables).unify_dictionaries().combine_chunks()
+
+
+# Arrow 테이블/배치 → DataFrame
+# categorical 카테고리는 실제 값만 이름순으로 둔다 (조회 직후 astype("category")와 같게)
+def _to_frame(table):
+    import pyarrow as pa
+
+    if isinstance(table, pa.Table):
+        table = table.unify_dictionaries()
+    df = table.to_pandas()
+    for column in df.columns:
+        series = df[column]
+        if column in _TYPE_PARTITIONS:
+            series = df[column] = series.astype("category")
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.cat.remove_unused_categories()
+            df[column] = series.cat.reorder_categories(sorted(series.cat.categories))
+        elif column in _INTEGER_COLUMNS and series.dtype.kind == "f":
+            # 결측치가 있는 정수 컬럼은 nullable 정수로 (to_integer와 같다)
+            df[column] = series.astype(_INTEGER_COLUMNS[column].capitalize())
+    return df
+
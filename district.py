@@ -0,0 +1,130 @@
+import json
+import os
+import pickle
+import threading
+
+json_file_path = "district.json"
+# district.json에서 필요한 필드만 뽑아 둔 압축 인덱스 (JSON이 바뀌면 다시 만든다)
+index_file_path = os.environ.get("DISTRICT_INDEX_PATH", os.path.join(".cache", "district.pkl"))
+INDEX_VERSION = 2
+
+_index = None
+_index_lock = threading.Lock()
+
+
+# DistrictConverter 클래스 정의
+# 인덱스는 프로세스당 한 번만 만들고 모든 인스턴스가 공유한다
+class DistrictConverter:
+    def __init__(self):
+        index = load_index()
+        self.districts = index["districts"]
+        self.si_do_codes = index["si_do_codes"]
+        self.sigungu_by_si_do = index["sigungu_by_si_do"]
+        self.sigungu_by_code = index["sigungu_by_code"]
+        self.sigungu_codes = index["sigungu_codes"]
+        self.dong_names = index["dong_names"]
+
+    def get_si_do_code(self, si_do_name):
+        return self.si_do_codes.get(si_do_name)
+
+    def get_sigungu(self, si_do_code):
+        return self.sigungu_by_si_do.get(si_do_code)
+
+    # 시군구코드 -> (시군구명, 시도코드)
+    def get_sigungu_info(self, sigungu_code):
+        return self.sigungu_by_code.get(sigungu_code)
+
+    # (시도명, 시군구명) -> 시군구코드 (시군구명은 시도가 달라도 겹칠 수 있다, 예: 중구)
+    def get_sigungu_code(self, si_do_name, sigungu_name):
+        return self.sigungu_codes.get((si_do_name, sigungu_name))
+
+    # 법정동코드 -> 법정동명
+    def get_dong_name(self, dong_code):
+        return self.dong_names.get(dong_code)
+
+
+def load_index():
+    global _index
+    if _index is not None:
+        return _index
+    with _index_lock:
+        if _index is None:
+            _index = _load_or_build_index()
+    return _index
+
+
+def _source_signature():
+    stat = os.stat(json_file_path)
+    return (INDEX_VERSION, stat.st_size, stat.st_mtime_ns)
+
+
+def _load_or_build_index():
+    signature = _source_signature()
+    try:
+        with open(index_file_path, 'rb') as f:
+            index = pickle.load(f)
+        if index.get("signature") == signature:
+            return index
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        pass
+
+    index = build_index()
+    index["signature"] = signature
+    try:
+        os.makedirs(os.path.dirname(index_file_path) or ".", exist_ok=True)
+        tmp_path = f"{index_file_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, index_file_path)
+    except OSError:
+        # 캐시를 쓸 수 없는 환경이어도 메모리 인덱스는 그대로 사용한다
+        pass
+    return index
+
+
+def build_index():
+    with open(json_file_path, 'r') as f:
+        raw_districts = json.loads(f.read())
+
+    districts = []
+    si_do_codes = {}
+    sigungu_by_si_do = {}
+    sigungu_by_code = {}
+    sigungu_codes = {}
+    dong_names = {}
+    for district in raw_districts:
+        si_do_code = district["si_do_code"]
+        # 앱에서 사용하는 시군구 필드만 남기고 읍면동 목록은 법정동 인덱스로만 보관한다
+        sigungu_list = [
+            {"sigungu_code": sigungu["sigungu_code"], "sigungu_name": sigungu["sigungu_name"]}
+            for sigungu in district["sigungu"]
+        ]
+        districts.append({
+            "si_do_code": si_do_code,
+            "si_do_name": district["si_do_name"],
+            "sigungu": sigungu_list,
+        })
+        si_do_codes[district["si_do_name"]] = si_do_code
+        sigungu_by_si_do[si_do_code] = sigungu_list
+        for sigungu in district["sigungu"]:
+            sigungu_by_code[sigungu["sigungu_code"]] = (sigungu["sigungu_name"], si_do_code)
+            sigungu_codes[(district["si_do_name"], sigungu["sigungu_name"])] = sigungu["sigungu_code"]
+            for dong in sigungu.get("eup_myeon_dong", []):
+                if dong["name"] != "nan":
+                    dong_names[dong["code"]] = dong["name"]
+
+    return {
+        "districts": districts,
+        "si_do_codes": si_do_codes,
+        "sigungu_by_si_do": sigungu_by_si_do,
+        "sigungu_by_code": sigungu_by_code,
+        "sigungu_codes": sigungu_codes,
+        "dong_names": dong_names,
+    }
+
+
+if __name__ == "__main__":
+    # 배포 전에 인덱스를 미리 만들어 둘 때 사용
+    index = load_index()
+    print(f"{index_file_path}: 시도 {len(index['districts'])}개, 시군구 {len(index['sigungu_by_code'])}개, "
+          f"법정동 {len(index['dong_names'])}개")
@@ -0,0 +1,194 @@
+import argparse
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+# 국토교통부 실거래가 API를 흉내 내는 로컬 서버 (장애/지연 주입용)
+# 응답 데이터는 benchmark.StubTransactionPrice와 같다 (월별로 고정된 데이터)
+#
+# 주입할 수 있는 장애 (각 요청마다 확률로 선택)
+# - error_rate: HTTP 500/503
+# - rate_limit_rate: HTTP 429 + Retry-After
+# - api_error_rate: HTTP 200이지만 공공데이터포털 오류 XML (code 01, 일시적 오류)
+# - slow_rate: slow_latency초 지연 후 응답 (클라이언트 시간 제한 확인용)
+# - drop_rate: 응답 없이 연결 끊기
+# - quota_after: 이 수 이후의 요청은 모두 일일 한도 초과(code 22)
+# - outage: (시작 초, 길이 초) 서버 시작 기준 이 구간에는 모든 요청에 503 (차단기 확인용)
+
+
+class FakeMolitServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0, rate_limit_rate=0.0,
+                 api_error_rate=0.0, slow_rate=0.0, slow_latency=5.0, drop_rate=0.0, quota_after=None,
+                 outage=None, retry_after=1, rows_per_month=50, seed=0):
+        from benchmark import StubTransactionPrice
+
+        self.stub = StubTransactionPrice(latency=0, rows_per_month=rows_per_month, seed=seed)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.api_error_rate = api_error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.drop_rate = drop_rate
+        self.quota_after = quota_after
+        self.outage = outage
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.started_at = time.monotonic()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset(self, **options):
+        with self.lock:
+            for name, value in options.items():
+                setattr(self, name, value)
+            self.stats = {}
+            self.started_at = time.monotonic()
+
+    def _count(self, name):
+        self.stats[name] = self.stats.get(name, 0) + 1
+
+    # 요청 하나에 대해 어떤 응답을 줄지 정한다 (잠금 안에서 난수를 뽑아 seed가 같으면 순서도 같다)
+    def _choose(self):
+        with self.lock:
+            self._count("requests")
+            elapsed = time.monotonic() - self.started_at
+            if self.outage and self.outage[0] <= elapsed < self.outage[0] + self.outage[1]:
+                outcome = "outage"
+            elif self.quota_after is not None and self.stats["requests"] > self.quota_after:
+                outcome = "quota"
+            else:
+                value = self.rng.random()
+                outcome = "ok"
+                for name, rate in (("drop", self.drop_rate), ("error", self.error_rate),
+                                   ("rate_limit", self.rate_limit_rate), ("api_error", self.api_error_rate),
+                                   ("slow", self.slow_rate)):
+                    if value < rate:
+                        outcome = name
+                        break
+                    value -= rate
+            self._count(outcome)
+            return outcome
+
+    def handle(self, request):
+        params = {key: values[0] for key, values in parse_qs(urlparse(request.path).query).items()}
+        outcome = self._choose()
+        if self.latency:
+            time.sleep(self.latency)
+
+        if outcome == "drop":
+            request.close_connection = True
+            request.connection.shutdown(socket.SHUT_RDWR)
+            return
+        if outcome in ("error", "outage"):
+            return self._send(request, 503 if outcome == "outage" else 500, "<html>Service Unavailable</html>")
+        if outcome == "rate_limit":
+            return self._send(request, 429, "Too Many Requests", {"Retry-After": str(self.retry_after)})
+        if outcome == "api_error":
+            return self._send(request, 200, service_error_xml("01", "APPLICATION_ERROR"))
+        if outcome == "quota":
+            return self._send(request, 200, service_error_xml("22", "LIMITED_NUMBER_OF_SERVICE_REQUESTS_EXCEEDS_ERROR"))
+        if outcome == "slow":
+            time.sleep(self.slow_latency)
+
+        df = self.stub.get_data("아파트", "매매", params.get("LAWD_CD"), year_month=params.get("DEAL_YMD"))
+        self._send(request, 200, items_xml(df.to_dict("records")))
+
+    def _send(self, request, status, body, headers=None):
+        data = body.encode("utf-8")
+        try:
+            request.send_response(status)
+            request.send_header("Content-Type", "application/xml; charset=utf-8")
+            request.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                request.send_header(name, value)
+            request.end_headers()
+            request.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # 클라이언트가 시간 제한으로 먼저 끊은 경우
+            pass
+
+
+def items_xml(records):
+    items = "".join(
+        "<item>" + "".join(f"<{key}>{escape(str(value))}</{key}>" for key, value in record.items()) + "</item>"
+        for record in records
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        "<response><header><resultCode>000</resultCode><resultMsg>OK</resultMsg></header>"
+        f"<body><items>{items}</items><numOfRows>99999</numOfRows><pageNo>1</pageNo>"
+        f"<totalCount>{len(records)}</totalCount></body></response>"
+    )
+
+
+def service_error_xml(code, message):
+    return (
+        "<OpenAPI_ServiceResponse><cmmMsgHeader><errMsg>SERVICE ERROR</errMsg>"
+        f"<returnAuthMsg>{message}</returnAuthMsg><returnReasonCode>{code}</returnReasonCode>"
+        "</cmmMsgHeader></OpenAPI_ServiceResponse>"
+    )
+
+
+if __name__ == "__main__":
+    # 예: python fake_api.py --port 8080 --error-rate 0.1 --rate-limit-rate 0.05 --latency 0.05
+    # 앱/CLI는 MOLIT_API_BASE_URL=http://127.0.0.1:8080 으로 실행하면 이 서버로 요청한다
+    parser = argparse.ArgumentParser(description="실거래가 API 가짜 서버")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--api-error-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=5.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--quota-after", type=int, default=None)
+    args = parser.parse_args()
+
+    fake = FakeMolitServer(port=args.port, latency=args.latency, error_rate=args.error_rate,
+                           rate_limit_rate=args.rate_limit_rate, api_error_rate=args.api_error_rate,
+                           slow_rate=args.slow_rate, slow_latency=args.slow_latency, drop_rate=args.drop_rate,
+                           quota_after=args.quota_after)
+    print(f"{fake.url} 에서 대기 중")
+    try:
+        fake.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,163 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from aggregate import compute_partial_analysis, merge_partial_analyses
+from district import DistrictConverter
+from fetcher import DEFAULT_RATE_PER_SEC
+from normalize import memory_footprint, normalize_transactions, select_columns
+from pipeline import StageTimer, create_api, fetch_transactions
+
+# 전국 배치에서 동시에 처리할 시/도 수 (기본: CPU 수, 환경 변수로 조정 가능)
+FANOUT_WORKERS = int(os.environ.get("FANOUT_WORKERS", str(os.cpu_count() or 1)))
+
+
+# 시/도 하나를 처리한 결과 (행 데이터는 파일로만 남기고 합칠 수 있는 집계만 돌려준다)
+class ShardResult:
+    def __init__(self, si_do_code, si_do_name, partial, rows, dataset_path, memory_before, memory_after,
+                 timings, peak_memory):
+        self.si_do_code = si_do_code
+        self.si_do_name = si_do_name
+        self.partial = partial
+        self.rows = rows
+        self.dataset_path = dataset_path
+        self.memory_before = memory_before
+        self.memory_after = memory_after
+        self.timings = timings
+        self.peak_memory = peak_memory
+
+
+class FanoutResult:
+    def __init__(self, analysis, shards):
+        self.analysis = analysis
+        # district.json 순서
+        self.shards = shards
+
+    @property
+    def rows(self):
+        return sum(shard.rows for shard in self.shards)
+
+
+# district.json의 시/도별 작업 (si_do_code 단위로 나눈다)
+def build_shards(converter=None):
+    converter = converter or DistrictConverter()
+    return [(district["si_do_code"], district["si_do_name"]) for district in converter.districts]
+
+
+# 전국 데이터를 시/도별로 프로세스 풀에 나눠 조회/집계하고 중간 집계를 합친다
+# - 각 프로세스는 시/도 하나의 데이터만 메모리에 올리고, 타입 정리한 행은 dataset_dir에 시/도별 파일로 쓴다
+#   (시/도 하나를 끝내면 프로세스를 새로 띄워 메모리를 돌려준다)
+# - API 초당 요청 수는 프로세스 수로 나눠서 전체 합이 rate_per_sec를 넘지 않게 한다
+# - api_factory(*api_args)는 각 프로세스에서 API 객체를 만든다 (pickle 가능한 최상위 함수여야 한다)
+# on_shard(완료 수, 전체 수, ShardResult)는 호출한 스레드에서 실행된다
+def run_fanout(api_args, start_year_month, end_year_month, dataset_dir,
+               property_type="아파트", trade_type="매매",
+               api_factory=create_api, max_workers=FANOUT_WORKERS, rate_per_sec=DEFAULT_RATE_PER_SEC,
+               shards=None, on_shard=None):
+    shards = shards if shards is not None else build_shards()
+    if not shards:
+        return FanoutResult(merge_partial_analyses([]), [])
+
+    max_workers = max(1, min(max_workers, len(shards)))
+    jobs = [
+        {
+            "api_factory": api_factory,
+            "api_args": tuple(api_args),
+            "si_do_code": si_do_code,
+            "si_do_name": si_do_name,
+            "start_year_month": str(start_year_month),
+            "end_year_month": str(end_year_month),
+            "property_type": property_type,
+            "trade_type": trade_type,
+            "rate_per_sec": rate_per_sec / max_workers if rate_per_sec else rate_per_sec,
+            "dataset_path": shard_path(dataset_dir, si_do_code),
+        }
+        for si_do_code, si_do_name in shards
+    ]
+
+    results = [None] * len(jobs)
+    pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                               max_tasks_per_child=1)
+    try:
+        futures = {pool.submit(process_shard, job): index for index, job in enumerate(jobs)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            results[index] = future.result()
+            if on_shard:
+                on_shard(done, len(jobs), results[index])
+    finally:
+        # 실패 시 남은 시/도는 취소하고 바로 예외를 올린다
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    analysis = merge_partial_analyses([result.partial for result in results])
+    return FanoutResult(analysis, results)
+
+
+def shard_path(dataset_dir, si_do_code):
+    return os.path.join(dataset_dir, f"si_do_code={si_do_code}", "part-0.parquet")
+
+
+# 프로세스 풀에서 실행: 시/도 하나를 조회 → 타입 정리 → 중간 집계하고 행은 파일로 쓴다
+def process_shard(job):
+    timer = StageTimer()
+    api = job["api_factory"](*job["api_args"])
+    all_data = timer.run("fetch", fetch_transactions, api, job["si_do_name"],
+                         job["start_year_month"], job["end_year_month"],
+                         property_type=job["property_type"], trade_type=job["trade_type"],
+                         rate_per_sec=job["rate_per_sec"])
+
+    selected_data = timer.run("select", select_columns, all_data)
+    del all_data
+    memory_before = memory_footprint(selected_data)
+    selected_data = timer.run("normalize", normalize_transactions, selected_data)
+    memory_after = memory_footprint(selected_data)
+
+    analysis_data = selected_data.dropna(subset=['전용면적'])
+    partial = timer.run("aggregate", compute_partial_analysis, analysis_data)
+    del analysis_data
+
+    path = job["dataset_path"]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    timer.run("write", selected_data.to_parquet, tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+    return ShardResult(job["si_do_code"], job["si_do_name"], partial, len(selected_data), path,
+                       memory_before, memory_after, timer.timings, _peak_memory())
+
+
+# 시/도별 파일을 district.json 순서로 이어 읽는다 (단일 프로세스에서 전국을 조회한 것과 같은 행 순서)
+# categorical 컬럼은 시/도마다 카테고리가 다르므로 pyarrow에서 사전을 합친 뒤 변환한다
+def load_shard_rows(shards, columns=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tables = [_widen_dictionaries(pq.read_table(shard.dataset_path, columns=columns))
+              for shard in shards if shard.rows]
+    if not tables:
+        return pd.DataFrame()
+    table = pa.concat_tables(tables, promote_options="default").unify_dictionaries()
+    return table.to_pandas()
+
+
+# 카테고리 수에 따라 코드 타입(int8/int16)이 파일마다 다를 수 있으므로 int32로 맞춘다
+def _widen_dictionaries(table):
+    import pyarrow as pa
+
+    fields = [
+        field.with_type(pa.dictionary(pa.int32(), field.type.value_type)) if pa.types.is_dictionary(field.type) else field
+        for field in table.schema
+    ]
+    return table.cast(pa.schema(fields, metadata=table.schema.metadata))
+
+
+def _peak_memory():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Linux에서 ru_maxrss 단위는 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
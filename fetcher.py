@@ -0,0 +1,191 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from urllib.parse import urlparse
+
+from instrument import propagate, span
+
+# 동시 요청 수와 호스트별 초당 요청 수 (환경 변수로 조정 가능)
+DEFAULT_MAX_WORKERS = int(os.environ.get("FETCH_MAX_WORKERS", "8"))
+DEFAULT_RATE_PER_SEC = float(os.environ.get("FETCH_RATE_PER_SEC", "10"))
+
+
+# 토큰 버킷 방식의 요청 속도 제한
+class RateLimiter:
+    def __init__(self, rate_per_sec, burst=None):
+        self.rate_per_sec = rate_per_sec
+        self.capacity = burst if burst is not None else max(1.0, rate_per_sec)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        if not self.rate_per_sec or self.rate_per_sec <= 0:
+            return
+        # 버킷 용량보다 큰 요청은 용량만큼씩 나눠서 받는다
+        while tokens > 0:
+            take = min(tokens, self.capacity)
+            self._acquire(take)
+            tokens -= take
+
+    def _acquire(self, tokens):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_sec)
+                self.updated_at = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate_per_sec
+            time.sleep(wait)
+
+
+# 호스트별 RateLimiter 공유 (같은 API 서버로 가는 요청은 하나의 버킷을 사용)
+_host_limiters = {}
+_host_limiters_lock = threading.Lock()
+
+
+def get_host_limiter(host, rate_per_sec=DEFAULT_RATE_PER_SEC):
+    with _host_limiters_lock:
+        limiter = _host_limiters.get(host)
+        if limiter is None or limiter.rate_per_sec != rate_per_sec:
+            limiter = RateLimiter(rate_per_sec)
+            _host_limiters[host] = limiter
+        return limiter
+
+
+def get_api_host(api, property_type, trade_type):
+    try:
+        url = api.meta_dict[property_type][trade_type]["url"]
+    except (AttributeError, KeyError, TypeError):
+        return "default"
+    return urlparse(url).netloc or "default"
+
+
+def count_months(start_year_month, end_year_month):
+    start = datetime.strptime(str(start_year_month), "%Y%m")
+    end = datetime.strptime(str(end_year_month), "%Y%m")
+    return max(1, (end.year - start.year) * 12 + end.month - start.month + 1)
+
+
+# start_year_month부터 end_year_month까지의 YYYYMM 목록
+def month_range(start_year_month, end_year_month):
+    start = datetime.strptime(str(start_year_month), "%Y%m")
+    months = []
+    for offset in range(count_months(start_year_month, end_year_month)):
+        year, month = divmod(start.month - 1 + offset, 12)
+        months.append(f"{start.year + year}{month + 1:02d}")
+    return months
+
+
+# 실제로 API에 보낼 요청 수 (캐시가 있으면 캐시에 없는 월과 refresh_since 이후 월만 센다)
+def count_requests(api, property_type, trade_type, sigungu_code, start_year_month, end_year_month,
+                   refresh_since=None):
+    if hasattr(api, "missing_months"):
+        return len(api.missing_months(property_type, trade_type, sigungu_code, start_year_month, end_year_month,
+                                      refresh_since=refresh_since))
+    return count_months(start_year_month, end_year_month)
+
+
+# 조회 대상 시군구 목록 생성 (converter.districts 순서 유지)
+def build_tasks(converter, si_do_name):
+    tasks = []
+    if si_do_name == "전국":
+        for district in converter.districts:
+            for sigungu in district["sigungu"]:
+                tasks.append({
+                    "si_do_name": district["si_do_name"],
+                    "sigungu_code": sigungu["sigungu_code"],
+                    "sigungu_name": sigungu["sigungu_name"],
+                })
+    else:
+        si_do_code = converter.get_si_do_code(si_do_name)
+        for sigungu in converter.get_sigungu(si_do_code) or []:
+            tasks.append({
+                "si_do_name": si_do_name,
+                "sigungu_code": sigungu["sigungu_code"],
+                "sigungu_name": sigungu["sigungu_name"],
+            })
+    return tasks
+
+
+# 시군구별 데이터를 동시에 조회하고 tasks 순서대로 결과를 반환
+# 시군구/시도 이름 컬럼은 FrameCollector가 합치면서 붙인다
+# on_progress(완료 수, 전체 수, task)는 호출한 스레드에서 실행되므로 Streamlit 요소를 갱신해도 된다
+# checkpoint(resilient.FetchCheckpoint)를 주면 끝난 시군구를 바로 저장하고, 저장된 시군구는 다시 조회하지 않는다
+# task에 property_type/trade_type이 있으면 인자 대신 그 유형으로 조회한다 (여러 유형을 한 풀에서 같이 조회)
+# refresh_since(YYYYMM)를 주면 월 단위 캐시(cache.CachedTransactionPrice)가 그 월부터는 다시 조회한다
+def fetch_all(api, tasks, start_year_month, end_year_month,
+              property_type="아파트", trade_type="매매",
+              max_workers=DEFAULT_MAX_WORKERS, rate_per_sec=DEFAULT_RATE_PER_SEC,
+              on_progress=None, checkpoint=None, refresh_since=None):
+    total_count = len(tasks)
+    results = [None] * total_count
+    if total_count == 0:
+        return results
+
+    # 캐시가 없는 조회 객체는 항상 API에 요청하므로 넘기지 않는다 (추가 파라미터는 요청에 그대로 붙는다)
+    cache_options = {}
+    if refresh_since is not None and hasattr(api, "missing_months"):
+        cache_options["refresh_since"] = str(refresh_since)
+
+    def fetch_one(task):
+        task_property_type = task.get("property_type", property_type)
+        task_trade_type = task.get("trade_type", trade_type)
+        with span("sigungu", "fetch", sigungu=task["sigungu_name"], code=task["sigungu_code"],
+                  type=f"{task_property_type} {task_trade_type}") as fetch_span:
+            df = fetch_task(task, task_property_type, task_trade_type, fetch_span)
+            fetch_span.set(rows=len(df))
+        return df
+
+    def fetch_task(task, task_property_type, task_trade_type, fetch_span):
+        key = task_key(task)
+        if checkpoint is not None:
+            df = checkpoint.load(key)
+            if df is not None:
+                fetch_span.set(checkpoint=True)
+                return df
+        # get_data는 월마다 한 번씩 요청하므로 요청할 월 수만큼 토큰을 사용한다
+        limiter = get_host_limiter(get_api_host(api, task_property_type, task_trade_type), rate_per_sec)
+        limiter.acquire(count_requests(api, task_property_type, task_trade_type, task["sigungu_code"],
+                                       start_year_month, end_year_month, **cache_options))
+        df = api.get_data(
+            property_type=task_property_type,
+            trade_type=task_trade_type,
+            sigungu_code=task["sigungu_code"],
+            start_year_month=start_year_month,
+            end_year_month=end_year_month,
+            translate=False,
+            **cache_options
+        )
+        if checkpoint is not None:
+            checkpoint.save(key, df)
+        return df
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, total_count)))
+    try:
+        # 계측 중이면 풀 스레드에서도 같은 계측에 기록한다
+        fetch = propagate(fetch_one)
+        futures = {pool.submit(fetch, task): index for index, task in enumerate(tasks)}
+        processed_count = 0
+        for future in as_completed(futures):
+            index = futures[future]
+            results[index] = future.result()
+            processed_count += 1
+            if on_progress:
+                on_progress(processed_count, total_count, tasks[index])
+    finally:
+        # 실패 시 남은 요청은 취소하고 바로 예외를 올린다 (이미 보낸 요청은 끝까지 받아 checkpoint에 저장)
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    return results
+
+
+# checkpoint에 저장하는 이름 (유형이 있는 task는 유형까지 붙인다)
+def task_key(task):
+    if "property_type" in task:
+        return f"{task['property_type']}_{task['trade_type']}_{task['sigungu_code']}"
+    return task["sigungu_code"]
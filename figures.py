@@ -0,0 +1,232 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from instrument import Trace, current_trace, span, tracing
+
+# 그래프 이미지 캐시 위치와 렌더링 프로세스 수 (환경 변수로 조정 가능)
+FIGURE_CACHE_DIR = os.environ.get("FIGURE_CACHE_DIR", os.path.join(".cache", "figures"))
+FIGURE_WORKERS = int(os.environ.get("FIGURE_WORKERS", str(min(4, os.cpu_count() or 1))))
+FIGURE_DPI = 100
+FIGURE_MEMORY_ITEMS = 64
+# 그리는 방식을 바꾸면 올려서 이전 캐시를 쓰지 않도록 한다
+FIGURE_VERSION = 1
+
+font_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'NanumGothicCoding.ttf')
+
+_memory_cache = OrderedDict()
+_memory_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+_font_ready = False
+
+
+# 분석 결과로 그래프 설명(spec)을 만든다. spec은 집계된 값만 담고 있어 해시로 캐시 키를 만들 수 있다
+def build_figure_specs(analysis):
+    monthly = analysis.monthly_transactions
+    specs = OrderedDict()
+    specs["매월 거래량"] = {
+        "kind": "bar",
+        "x": [f"{year}-{month}" for year, month in zip(monthly['거래년도'], monthly['거래월'])],
+        "y": [int(value) for value in monthly['거래량']],
+        "color": "skyblue",
+        "xlabel": "연도-월",
+    }
+    specs["전용면적 범위별 거래량"] = {
+        "kind": "bar",
+        "x": [str(label) for label in analysis.area_counts.index],
+        "y": [int(value) for value in analysis.area_counts.values],
+        "color": "#2196F3",  # 색상 변경 및 아웃라인 제거
+        "edgecolor": "none",
+        "xlabel": "면적 범위",
+    }
+    if not analysis.regional_counts.empty:
+        specs["지역별 면적 대비 거래량"] = {
+            "kind": "bar",
+            "x": [str(label) for label in analysis.regional_counts.index],
+            "y": [int(value) for value in analysis.regional_counts.values],
+            "color": "#FFC107",
+            "edgecolor": "none",
+            "xlabel": "시군구",
+        }
+    if not analysis.transaction_types.empty:
+        specs["거래유형 분석"] = {
+            "kind": "pie",
+            "values": [int(value) for value in analysis.transaction_types.values],
+            "labels": [str(label) for label in analysis.transaction_types.index],
+            "colors": ["#FF5733", "#33FF57"],
+        }
+    return specs
+
+
+# spec별 이미지 바이트를 반환 (캐시에 없는 그래프만 프로세스 풀에서 병렬로 렌더링)
+def render_figures(specs, fmt="png", max_workers=FIGURE_WORKERS):
+    images = OrderedDict()
+    missing = {}
+    for title, spec in specs.items():
+        key = figure_key(spec, fmt)
+        data = _cache_get(key)
+        if data is None:
+            missing[title] = (key, spec)
+        images[title] = data
+
+    if missing:
+        jobs = [(spec, fmt, FIGURE_DPI) for _, spec in missing.values()]
+        with span("figures", "figure", cached=len(specs) - len(missing), rendered=len(missing)):
+            results = _render_many(jobs, max_workers)
+        for (title, (key, _)), data in zip(missing.items(), results):
+            _cache_put(key, data)
+            images[title] = data
+    return images
+
+
+def figure_key(spec, fmt="png"):
+    payload = json.dumps([FIGURE_VERSION, fmt, FIGURE_DPI, spec], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _render_many(jobs, max_workers):
+    if len(jobs) == 1 or max_workers <= 1:
+        return [render_figure(*job) for job in jobs]
+    try:
+        pool = _get_pool(max_workers)
+        trace = current_trace()
+        if trace is None:
+            return list(pool.map(_render_job, jobs))
+        # 계측 중이면 렌더링 프로세스에서 기록한 구간을 받아 현재 계측에 붙인다
+        results = []
+        for data, events in pool.map(_render_traced_job, jobs):
+            trace.merge(events)
+            results.append(data)
+        return results
+    except (OSError, RuntimeError):
+        # 프로세스를 만들 수 없거나 풀이 깨진 경우 현재 프로세스에서 그린다
+        _reset_pool()
+        return [render_figure(*job) for job in jobs]
+
+
+def _render_job(job):
+    return render_figure(*job)
+
+
+def _render_traced_job(job):
+    with tracing(Trace("figure")) as trace:
+        data = render_figure(*job)
+    return data, trace.events
+
+
+# 프로세스 풀은 한 번 만들어 재사용한다 (Streamlit 스레드에서 fork하지 않도록 spawn 사용)
+# 각 프로세스는 시작할 때 matplotlib과 폰트를 미리 불러 둔다
+def _get_pool(max_workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_setup_font)
+        return _pool
+
+
+# 첫 렌더링에서 프로세스 시작 비용을 치르지 않도록 미리 프로세스를 띄워 둔다 (기다리지 않음)
+def start_pool(max_workers=FIGURE_WORKERS):
+    if max_workers <= 1 or _pool is not None:
+        return
+    try:
+        pool = _get_pool(max_workers)
+        for _ in range(max_workers):
+            pool.submit(time.sleep, 0.2)
+    except (OSError, RuntimeError):
+        _reset_pool()
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _setup_font():
+    global _font_ready
+    if _font_ready:
+        return
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.font_manager as fm
+
+    if os.path.exists(font_path):
+        fm.fontManager.addfont(font_path)
+        matplotlib.rcParams['font.family'] = 'NanumGothicCoding'  # 사용자 선택한 폰트 적용
+    _font_ready = True
+
+
+# 프로세스 풀에서 실행되는 렌더링 함수 (Agg 백엔드)
+def render_figure(spec, fmt="png", dpi=FIGURE_DPI):
+    from io import BytesIO
+
+    _setup_font()
+    from matplotlib.figure import Figure
+
+    with span("plot", "figure", kind=spec["kind"], xlabel=spec.get("xlabel")):
+        fig = Figure(figsize=(10, 6))
+        ax = fig.subplots()
+        if spec["kind"] == "pie":
+            ax.pie(spec["values"], labels=spec["labels"], autopct='%1.1f%%', startangle=140, colors=spec.get("colors"))
+            ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+        else:
+            ax.bar(spec["x"], spec["y"], color=spec.get("color"), edgecolor=spec.get("edgecolor"))
+            ax.set_xlabel(spec.get("xlabel", ""), fontsize=14)
+            ax.set_ylabel(spec.get("ylabel", "거래량"), fontsize=14)
+            ax.tick_params(axis='x', labelrotation=45)
+            fig.tight_layout()
+
+    with span("savefig", "figure", format=fmt) as savefig_span:
+        buffer = BytesIO()
+        fig.savefig(buffer, format=fmt, dpi=dpi)
+        savefig_span.set(bytes=buffer.tell())
+    return buffer.getvalue()
+
+
+def _cache_path(key):
+    return os.path.join(FIGURE_CACHE_DIR, key[:2], key)
+
+
+def _cache_get(key):
+    with _memory_lock:
+        data = _memory_cache.get(key)
+        if data is not None:
+            _memory_cache.move_to_end(key)
+            return data
+    try:
+        with open(_cache_path(key), "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    _remember(key, data)
+    return data
+
+
+def _cache_put(key, data):
+    _remember(key, data)
+    path = _cache_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def _remember(key, data):
+    with _memory_lock:
+        _memory_cache[key] = data
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > FIGURE_MEMORY_ITEMS:
+            _memory_cache.popitem(last=False)
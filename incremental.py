@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from cache import last_settled_month
+from fetcher import fetch_all
+
+DEFAULT_STORE_DIR = os.environ.get("INCREMENTAL_STORE_DIR", os.path.join(".cache", "incremental"))
+# 이번 달 외에 늦은 신고를 고려해 다시 조회할 지난 월 수
+DEFAULT_LOOKBACK_MONTHS = int(os.environ.get("INCREMENTAL_LOOKBACK_MONTHS", "2"))
+
+# 같은 거래를 식별하는 키 (해제 여부는 갱신될 수 있으므로 키에서 제외)
+# 부동산 유형마다 있는 필드만 쓴다 (일련번호가 없는 유형은 법정동/지번/건물 이름으로, 전월세는 보증금/월세까지)
+TRANSACTION_KEY_COLUMNS = ["aptSeq", "umdNm", "jibun", "offiNm", "mhouseNm", "houseType",
+                           "dealYear", "dealMonth", "dealDay", "floor", "excluUseAr", "totalFloorAr",
+                           "dealAmount", "deposit", "monthlyRent"]
+
+# 같은 저장소 디렉터리를 쓰는 IncrementalStore끼리 같이 쓰는 잠금 (동시에 실행되는 조회 작업 사이)
+_store_locks = {}
+_store_locks_lock = threading.Lock()
+
+
+def store_lock(store_dir):
+    with _store_locks_lock:
+        return _store_locks.setdefault(os.path.abspath(store_dir), threading.Lock())
+
+
+# 시군구별로 마지막으로 완전히 조회한 월을 기억해 두고 열린 구간(최근 월)만 새로 받아 합치는 저장소
+# 같은 디렉터리의 저장소는 여러 작업이 동시에 갱신할 수 있으므로 state.json과 시군구 파일은
+# 디렉터리별 잠금 안에서 다시 읽고 합쳐서 쓴다
+class IncrementalStore:
+    def __init__(self, store_dir=DEFAULT_STORE_DIR, property_type="아파트", trade_type="매매"):
+        self.store_dir = os.path.join(store_dir, property_type, trade_type)
+        self.property_type = property_type
+        self.trade_type = trade_type
+        self.state_path = os.path.join(self.store_dir, "state.json")
+        self.lock = store_lock(self.store_dir)
+        with self.lock:
+            self.state = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r') as f:
+                return json.loads(f.read())
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(json.dumps(self.state, ensure_ascii=False, indent=2))
+        os.replace(tmp_path, self.state_path)
+
+    def _path(self, sigungu_code):
+        return os.path.join(self.store_dir, f"{sigungu_code}.parquet")
+
+    # 시군구별로 새로 받아야 하는 구간 (start, end), 받을 필요가 없으면 None
+    def fetch_window(self, sigungu_code, start_year_month, end_year_month, lookback_months, now=None):
+        coverage = self.state.get(sigungu_code)
+        if not coverage or str(start_year_month) < coverage["first_month"]:
+            return str(start_year_month), str(end_year_month)
+
+        open_start = shift_month(current_month(now), -lookback_months)
+        fetch_start = max(str(start_year_month), min(shift_month(coverage["last_complete_month"], 1), open_start))
+        if fetch_start > str(end_year_month):
+            return None
+        return fetch_start, str(end_year_month)
+
+    # tasks 순서대로 시군구별 전체 구간 데이터를 반환 (필요한 월만 API에서 조회)
+    # lookback 구간 [open_start, end]는 월 단위 디스크 캐시에 있어도 다시 조회한다
+    def refresh(self, api, tasks, start_year_month, end_year_month,
+                lookback_months=DEFAULT_LOOKBACK_MONTHS, on_progress=None, now=None, **fetch_options):
+        start_year_month, end_year_month = str(start_year_month), str(end_year_month)
+        open_start = shift_month(current_month(now), -lookback_months)
+        # 다른 작업이 그사이 갱신한 구간부터 이어서 받는다
+        with self.lock:
+            self.state = self._load_state()
+
+        # 같은 구간을 받는 시군구끼리 묶어서 조회
+        windows = {}
+        window_by_index = {}
+        for index, task in enumerate(tasks):
+            window = self.fetch_window(task["sigungu_code"], start_year_month, end_year_month, lookback_months, now)
+            windows.setdefault(window, []).append(index)
+            window_by_index[index] = window
+
+        total_count = len(tasks)
+        processed = [0]
+
+        def update_progress(_, __, task):
+            processed[0] += 1
+            if on_progress:
+                on_progress(processed[0], total_count, task)
+
+        fetched = {}
+        for window, indexes in windows.items():
+            if window is None:
+                for index in indexes:
+                    update_progress(None, None, tasks[index])
+                continue
+            group = [tasks[index] for index in indexes]
+            frames = fetch_all(api, group, window[0], window[1],
+                               property_type=self.property_type, trade_type=self.trade_type,
+                               on_progress=update_progress, refresh_since=open_start, **fetch_options)
+            fetched.update(zip(indexes, frames))
+
+        # lookback 구간보다 이전이면서 신고가 다 들어온 월(cache.last_settled_month)까지만 완전히 조회한 월로 본다
+        closed_month = min(shift_month(open_start, -1), last_settled_month(now))
+        results = []
+        completed = {}
+        for index, task in enumerate(tasks):
+            sigungu_code = task["sigungu_code"]
+            stored = self.merge(sigungu_code, fetched.get(index))
+            if index in fetched:
+                fetch_start, fetch_end = window_by_index[index]
+                completed[sigungu_code] = (fetch_start, min(fetch_end, closed_month))
+            results.append(filter_months(stored, start_year_month, end_year_month))
+
+        # 저장할 때 state.json을 다시 읽어 다른 작업이 저장한 구간을 잃지 않도록 이번에 받은 구간만 합친다
+        with self.lock:
+            self.state = self._load_state()
+            for sigungu_code, (fetch_start, complete_month) in completed.items():
+                self.state[sigungu_code] = update_coverage(self.state.get(sigungu_code), fetch_start, complete_month)
+            self._save_state()
+        return results
+
+    # 저장된 데이터와 새로 받은 데이터를 합치고 같은 거래는 새 데이터로 갱신
+    def merge(self, sigungu_code, new_data):
+        with self.lock:
+            return self._merge(sigungu_code, new_data)
+
+    def _merge(self, sigungu_code, new_data):
+        path = self._path(sigungu_code)
+        stored = pd.read_parquet(path) if os.path.exists(path) else None
+        if new_data is None:
+            return stored if stored is not None else pd.DataFrame()
+        if stored is None or stored.empty:
+            merged = dedupe_transactions(new_data)
+        else:
+            merged = dedupe_transactions(pd.concat([stored, new_data], ignore_index=True))
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        merged.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        return merged
+
+
+# 거래 키가 같은 행은 마지막 행만 남긴다
+# 새로 받은 행이 뒤에 오므로 나중에 들어온 해제(cdealType) 정보가 기존 행을 덮어쓴다
+def dedupe_transactions(df):
+    if df.empty:
+        return df.reset_index(drop=True)
+    key_columns = [column for column in TRANSACTION_KEY_COLUMNS if column in df.columns]
+    key = transaction_key(df, key_columns)
+    return df.loc[~key.duplicated(keep="last")].reset_index(drop=True)
+
+
+def transaction_key(df, key_columns=TRANSACTION_KEY_COLUMNS):
+    # 숫자/문자열 표기가 섞여도 같은 키가 되도록 문자열로 정규화한다 (예: "1,000" 과 1000)
+    parts = [
+        df[column].astype(str).str.replace(",", "", regex=False).str.strip()
+        for column in key_columns
+    ]
+    key = parts[0]
+    for part in parts[1:]:
+        key = key + "|" + part
+    return key
+
+
+# 완전히 조회한 구간 [fetch_start, complete_month]를 기존 구간과 합친다
+# 두 구간이 이어지지 않으면 중간 월을 받은 적이 없으므로 새 구간으로 바꾼다
+def update_coverage(coverage, fetch_start, complete_month):
+    if complete_month < fetch_start:
+        complete_month = shift_month(fetch_start, -1)
+    if coverage:
+        first_month, last_complete = coverage["first_month"], coverage["last_complete_month"]
+        if fetch_start <= shift_month(last_complete, 1) and first_month <= shift_month(complete_month, 1):
+            fetch_start = min(first_month, fetch_start)
+            complete_month = max(last_complete, complete_month)
+    return {
+        "first_month": fetch_start,
+        "last_complete_month": complete_month,
+        "updated_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def filter_months(df, start_year_month, end_year_month):
+    if df is None or df.empty or "dealYear" not in df.columns:
+        return df if df is not None else pd.DataFrame()
+    year_month = (pd.to_numeric(df["dealYear"], errors="coerce") * 100
+                  + pd.to_numeric(df["dealMonth"], errors="coerce"))
+    mask = year_month.between(int(start_year_month), int(end_year_month))
+    return df.loc[mask].reset_index(drop=True)
+
+
+def current_month(now=None):
+    return (now or datetime.now()).strftime("%Y%m")
+
+
+def shift_month(year_month, offset):
+    year, month = int(str(year_month)[:4]), int(str(year_month)[4:6])
+    year, month = divmod(year * 12 + month - 1 + offset, 12)
+    return f"{year}{month + 1:02d}"
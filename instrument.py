@@ -0,0 +1,308 @@
+import contextvars
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# 실행 계측 기본값 (Streamlit 사이드바 체크박스의 초깃값) 과 계측 파일을 저장하는 위치
+INSTRUMENT_ENABLED = os.environ.get("INSTRUMENT", "0") == "1"
+TRACE_DIR = os.environ.get("TRACE_DIR", os.path.join(".cache", "traces"))
+# 메모리 최대치 (ru_maxrss) 단위: Linux는 KB, macOS는 바이트
+_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+_current = contextvars.ContextVar("instrument_trace", default=None)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_memory():
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT
+
+
+# 실행 한 번의 계측 기록
+# 이벤트는 (이름, 분류, 시작/끝 perf_counter_ns, 프로세스/스레드, 부모 이벤트, 인자)이며
+# 분류: stage(파이프라인 단계), app(화면 구간), fetch(시군구 조회), http(API 요청), figure, report
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.started_at = datetime.now()
+        self.origin = time.perf_counter_ns()
+        self.events = []
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.phase_span = None
+
+    def span(self, name, category="stage", **args):
+        return _Span(self, name, category, args)
+
+    # 화면처럼 들여쓰기 없이 이어지는 구간: 이전 구간을 끝내고 새 구간을 시작한다 (None이면 끝내기만)
+    def phase(self, name, category="app"):
+        if self.phase_span is not None:
+            self.phase_span.__exit__(None, None, None)
+            self.phase_span = None
+        if name is not None:
+            self.phase_span = self.span(name, category).__enter__()
+
+    def _record(self, event):
+        with self.lock:
+            self.events.append(event)
+
+    # 다른 프로세스(그래프 렌더링 풀)나 다른 계측(백그라운드 조회 작업)에서 기록한 이벤트를 현재 스레드의 열린 구간 아래에 붙인다
+    # 계측을 시작하기 전에 시작한 이벤트가 있으면 시작 시각을 그만큼 앞당긴다
+    def merge(self, events):
+        stack = self._stack()
+        self.origin = min([self.origin] + [event["start"] for event in events])
+        ids = {}
+        for event in sorted(events, key=lambda event: event["start"]):
+            ids[event["id"]] = next(self.ids)
+        for event in events:
+            parent = ids[event["parent"]] if event["parent"] is not None else stack[-1].id if stack else None
+            self._record(dict(event, id=ids[event["id"]], parent=parent))
+
+    def _stack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    @property
+    def peak_memory(self):
+        return max((event["peak_memory"] for event in self.events), default=_peak_memory())
+
+    @property
+    def duration(self):
+        end = max((event["end"] for event in self.events), default=self.origin)
+        return (end - self.origin) / 1e9
+
+    # 단계별 소요 시간 (같은 이름은 합친다, 메모리는 구간이 끝날 때의 프로세스 최대 사용량)
+    def stage_summary(self):
+        import pandas as pd
+
+        frame = self._frame()
+        frame = frame[~frame["분류"].isin(["fetch", "http"])]
+        if frame.empty:
+            return pd.DataFrame(columns=["분류", "단계", "횟수", "합계(초)", "최대(초)", "최대 메모리(MB)"])
+        summary = frame.groupby(["분류", "단계"], sort=False).agg(
+            횟수=("시간(초)", "size"),
+            **{"합계(초)": ("시간(초)", "sum"), "최대(초)": ("시간(초)", "max"),
+               "최대 메모리(MB)": ("최대 메모리", "max")}
+        ).reset_index()
+        summary["최대 메모리(MB)"] = summary["최대 메모리(MB)"] / 2**20
+        return summary
+
+    # 시군구별 조회 행 수와 받은 바이트 (API 요청 이벤트를 감싼 시군구 조회 이벤트에 더한다)
+    def sigungu_summary(self):
+        import pandas as pd
+
+        events = {event["id"]: event for event in self.events}
+        received = {}
+        for event in self.events:
+            if event["category"] != "http":
+                continue
+            parent = event["parent"]
+            while parent in events and events[parent]["category"] != "fetch":
+                parent = events[parent]["parent"]
+            if parent in events:
+                received[parent] = received.get(parent, 0) + event["args"].get("bytes", 0)
+        rows = []
+        for event in sorted(self.events, key=lambda event: event["start"]):
+            if event["category"] == "fetch":
+                args = event["args"]
+                rows.append({
+                    "시군구": args.get("sigungu"),
+                    "시군구코드": args.get("code"),
+                    "유형": args.get("type"),
+                    "행 수": args.get("rows"),
+                    "받은 바이트": received.get(event["id"], 0),
+                    "checkpoint": args.get("checkpoint", False),
+                    "시간(초)": (event["end"] - event["start"]) / 1e9,
+                })
+        return pd.DataFrame(rows, columns=["시군구", "시군구코드", "유형", "행 수", "받은 바이트", "checkpoint", "시간(초)"])
+
+    # 이벤트는 끝난 순서로 쌓이므로 시작 순서로 정렬한다
+    def _frame(self):
+        import pandas as pd
+
+        events = sorted(self.events, key=lambda event: event["start"])
+        return pd.DataFrame({
+            "분류": [event["category"] for event in events],
+            "단계": [event["name"] for event in events],
+            "시간(초)": [(event["end"] - event["start"]) / 1e9 for event in events],
+            "최대 메모리": [event["peak_memory"] for event in events],
+        })
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "duration": self.duration,
+            "peak_memory": self.peak_memory,
+            "events": [
+                {
+                    "id": event["id"],
+                    "name": event["name"],
+                    "category": event["category"],
+                    "start": (event["start"] - self.origin) / 1e9,
+                    "duration": (event["end"] - event["start"]) / 1e9,
+                    "pid": event["pid"],
+                    "tid": event["tid"],
+                    "parent": event["parent"],
+                    "peak_memory": event["peak_memory"],
+                    "args": event["args"],
+                }
+                for event in self.events
+            ],
+        }
+
+    # chrome://tracing, Perfetto에서 열 수 있는 trace event 형식 (완료 이벤트 "X", 시간은 마이크로초)
+    def to_chrome_trace(self):
+        events = [{"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": self.name}}]
+        for event in self.events:
+            events.append({
+                "name": event["name"],
+                "cat": event["category"],
+                "ph": "X",
+                "ts": (event["start"] - self.origin) / 1e3,
+                "dur": (event["end"] - event["start"]) / 1e3,
+                "pid": event["pid"],
+                "tid": event["tid"],
+                "args": dict(event["args"], peak_memory=event["peak_memory"]),
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_json(self, path):
+        _write_json(path, self.to_dict())
+        return path
+
+    def write_chrome_trace(self, path):
+        _write_json(path, self.to_chrome_trace())
+        return path
+
+    # TRACE_DIR에 실행 시각 이름으로 JSON 계측 파일을 남긴다
+    def save(self, trace_dir=TRACE_DIR):
+        name = f"{self.name}-{self.started_at:%Y%m%d-%H%M%S}-{os.getpid()}-{id(self):x}.json"
+        return self.write_json(os.path.join(trace_dir, name))
+
+
+def _write_json(path, value):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(value, f, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
+
+
+class _Span:
+    def __init__(self, trace, name, category, args):
+        self.trace = trace
+        self.name = name
+        self.category = category
+        self.args = args
+
+    # 구간이 끝나기 전에 알게 된 값 (행 수, 바이트 등) 을 더한다
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        stack = self.trace._stack()
+        self.id = next(self.trace.ids)
+        self.parent = stack[-1].id if stack else None
+        stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        stack = self.trace._stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.trace._record({
+            "id": self.id,
+            "name": self.name,
+            "category": self.category,
+            "start": self.start,
+            "end": end,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "parent": self.parent,
+            "peak_memory": _peak_memory(),
+            "args": self.args,
+        })
+        return False
+
+
+# 계측이 꺼져 있을 때 쓰는 아무 일도 하지 않는 구간
+class _NullSpan:
+    def set(self, **args):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def current_trace():
+    return _current.get()
+
+
+# 현재 계측 중이면 구간을 기록하고, 아니면 아무 일도 하지 않는다 (꺼져 있을 때는 ContextVar 조회 한 번)
+def span(name, category="stage", **args):
+    trace = _current.get()
+    if trace is None:
+        return _NULL_SPAN
+    return trace.span(name, category, **args)
+
+
+def phase(name, category="app"):
+    trace = _current.get()
+    if trace is not None:
+        trace.phase(name, category)
+
+
+# with 블록 안에서 trace로 계측한다 (None이면 계측하지 않음)
+@contextmanager
+def tracing(trace):
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+# Streamlit처럼 스크립트 전체가 한 블록인 곳에서 이번 실행의 계측을 켜거나 끈다 (다음 실행에서 다시 정한다)
+def activate(trace):
+    _current.set(trace)
+    return trace
+
+
+# 스레드 풀에 넘기는 함수가 현재 계측을 이어서 쓰도록 감싼다 (계측 중이 아니면 그대로 반환)
+def propagate(func):
+    trace = _current.get()
+    if trace is None:
+        return func
+
+    def run(*args, **kwargs):
+        token = _current.set(trace)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return run
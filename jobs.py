@@ -0,0 +1,225 @@
+import heapq
+import itertools
+import os
+import shutil
+import threading
+import time
+
+from instrument import tracing
+
+# 프로세스 전체에서 공유하는 조회 작업 스레드 수, 무거운 작업(전국 등)이 같이 쓸 수 있는 스레드 수,
+# 끝난 작업을 남겨 두는 시간 (환경 변수로 조정 가능)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_HEAVY_WORKERS = int(os.environ.get("JOB_HEAVY_WORKERS", str(max(1, JOB_WORKERS - 1))))
+JOB_RETENTION = float(os.environ.get("JOB_RETENTION", str(30 * 60)))
+# 예상 API 요청 수 (시군구 수 × 유형 조합 수 × 월 수) 가 이 이상이면 무거운 작업
+JOB_HEAVY_REQUESTS = int(os.environ.get("JOB_HEAVY_REQUESTS", "500"))
+# 화면에서 작업 진행 상황을 다시 확인하는 간격 (초)
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "1"))
+# 작업 결과로 만든 파일(HTML 리포트 등)을 두는 위치 (작업을 정리할 때 같이 지운다)
+JOB_FILE_DIR = os.environ.get("JOB_FILE_DIR", os.path.join(".cache", "jobs"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+# 백그라운드에서 실행하는 조회 작업 하나 (여러 세션이 같은 작업을 같이 본다)
+# func(job)의 반환값이 result, 예외는 error에 남는다 (params: 작업을 만든 조건, 결과를 보여 줄 때 쓴다)
+class Job:
+    def __init__(self, job_id, key, func, priority, heavy, trace, params):
+        self.id = job_id
+        self.key = key
+        self.params = params
+        self.func = func
+        self.priority = priority
+        self.heavy = heavy
+        self.trace = trace
+        self.trace_path = None
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.processed = 0
+        self.total = 0
+        self.current = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.finished = threading.Event()
+
+    # fetch_all의 on_progress 형식 (완료된 시군구 수, 전체 수, 방금 끝난 작업)
+    def update_progress(self, processed_count, total_count, task):
+        self.processed = processed_count
+        self.total = total_count
+        self.current = task
+
+    @property
+    def done(self):
+        return self.status in (DONE, FAILED)
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def wait(self, timeout=None):
+        return self.finished.wait(timeout)
+
+    # 이 작업의 결과 파일 경로 (프로세스마다 작업 id가 1부터 시작하므로 pid를 붙인다)
+    @property
+    def file_dir(self):
+        return os.path.join(JOB_FILE_DIR, f"{os.getpid()}-{self.id}")
+
+    def file_path(self, name):
+        return os.path.join(self.file_dir, name)
+
+    def remove_files(self):
+        shutil.rmtree(self.file_dir, ignore_errors=True)
+
+
+# 우선순위 큐와 작업 스레드로 조회 작업을 Streamlit 스크립트 실행과 따로 돌린다
+# - 같은 키의 작업이 대기/실행 중이면 새로 만들지 않고 그 작업을 돌려준다 (세션/사용자 사이 공유)
+# - 우선순위 값이 작은 작업부터 실행한다 (예상 요청 수가 적은 시/도 하나짜리 조회가 먼저)
+# - 무거운 작업은 heavy_workers개까지만 같이 실행해서 가벼운 작업이 쓸 스레드를 남겨 둔다
+# - 끝난 작업은 retention초 동안 id로 다시 찾을 수 있다 (페이지가 다시 실행되어도 결과를 보여 준다)
+#   retention이 지나 정리한 작업은 결과 파일(file_path)도 지운다
+class JobScheduler:
+    def __init__(self, workers=JOB_WORKERS, heavy_workers=JOB_HEAVY_WORKERS, retention=JOB_RETENTION):
+        self.workers = max(1, workers)
+        self.heavy_workers = max(1, min(heavy_workers, self.workers))
+        self.retention = retention
+        self.queue = []
+        self.jobs = {}
+        self.active = {}
+        self.running_heavy = 0
+        self.ids = itertools.count(1)
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.submitted = 0
+        self.deduplicated = 0
+        self.threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            for index in range(self.workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    # (작업, 새로 만들었는지) 반환
+    # 대기 중인 같은 작업이 더 높은 우선순위로 다시 들어오면 우선순위를 올린다
+    def submit(self, key, func, priority=0, heavy=False, trace=None, params=None):
+        with self.condition:
+            self._prune()
+            job = self.active.get(key)
+            if job is not None:
+                self.deduplicated += 1
+                if job.status == QUEUED and priority < job.priority:
+                    job.priority = priority
+                    heapq.heappush(self.queue, (priority, next(self.sequence), job))
+                return job, False
+            job = Job(next(self.ids), key, func, priority, heavy, trace, params)
+            self.jobs[job.id] = job
+            self.active[key] = job
+            self.submitted += 1
+            heapq.heappush(self.queue, (priority, next(self.sequence), job))
+            self.condition.notify_all()
+            return job, True
+
+    def get(self, job_id):
+        with self.condition:
+            return self.jobs.get(job_id)
+
+    # 같은 키로 대기/실행 중인 작업 (없으면 None)
+    def find(self, key):
+        with self.condition:
+            return self.active.get(key)
+
+    def stats(self):
+        with self.condition:
+            statuses = [job.status for job in self.jobs.values()]
+            return {
+                "workers": self.workers,
+                "queued": statuses.count(QUEUED),
+                "running": statuses.count(RUNNING),
+                "done": statuses.count(DONE),
+                "failed": statuses.count(FAILED),
+                "submitted": self.submitted,
+                "deduplicated": self.deduplicated,
+            }
+
+    def _work(self):
+        while True:
+            with self.condition:
+                job = self._next_job()
+                while job is None:
+                    self.condition.wait()
+                    job = self._next_job()
+                job.status = RUNNING
+                job.started_at = time.time()
+                if job.heavy:
+                    self.running_heavy += 1
+            self._run(job)
+
+    # 실행할 수 있는 작업 중 우선순위가 가장 높은 것을 큐에서 꺼낸다
+    # (우선순위를 올리면서 큐에 두 번 들어간 항목, 자리가 없는 무거운 작업은 건너뛴다)
+    def _next_job(self):
+        skipped = []
+        job = None
+        while self.queue:
+            entry = heapq.heappop(self.queue)
+            priority, _, candidate = entry
+            if candidate.status != QUEUED or priority != candidate.priority:
+                continue
+            if candidate.heavy and self.running_heavy >= self.heavy_workers:
+                skipped.append(entry)
+                continue
+            job = candidate
+            break
+        for entry in skipped:
+            heapq.heappush(self.queue, entry)
+        return job
+
+    def _run(self, job):
+        try:
+            with tracing(job.trace):
+                job.result = job.func(job)
+            job.status = DONE
+        except Exception as e:
+            job.error = e
+            job.status = FAILED
+        finally:
+            job.func = None
+            job.finished_at = time.time()
+            # 계측 파일을 못 써도 (디스크 부족 등) 작업 정리는 끝까지 한다 (trace_path는 None으로 둔다)
+            if job.trace is not None:
+                try:
+                    job.trace_path = job.trace.save()
+                except OSError:
+                    pass
+            with self.condition:
+                if self.active.get(job.key) is job:
+                    del self.active[job.key]
+                if job.heavy:
+                    self.running_heavy -= 1
+                self.condition.notify_all()
+            job.finished.set()
+
+    def _prune(self):
+        expired_before = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.done and job.finished_at < expired_before]:
+            self.jobs.pop(job_id).remove_files()
+
+
+# 프로세스 하나에 스케줄러 하나 (Streamlit 세션들이 같이 사용)
+def get_scheduler():
+    global _scheduler
+    if _scheduler is not None:
+        return _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = JobScheduler()
+    return _scheduler
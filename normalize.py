@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+from schema import TYPE_COLUMNS, get_schema_adapter
+
+# 반복되는 값이 많은 문자열 컬럼은 categorical로 저장한다
+CATEGORY_COLUMNS = ["시도", "시군구", "법정동", "아파트", "거래유형", "중개사소재지", "부동산유형", "거래구분"]
+
+
+# 원본 조회 결과의 API 필드 이름을 공통 컬럼(schema.COMMON_COLUMNS)으로 바꾼다
+# 여러 유형을 합친 결과는 FrameCollector가 붙인 property_type/trade_type 컬럼으로 유형마다 따로 바꾼 뒤 합친다
+# (유형 컬럼이 없으면 property_type/trade_type 인자의 유형으로 본다)
+def select_columns(all_data, property_type="아파트", trade_type="매매"):
+    if all_data.empty or not set(TYPE_COLUMNS) <= set(all_data.columns):
+        return get_schema_adapter(property_type, trade_type).select(all_data)
+    groups = all_data.groupby(TYPE_COLUMNS, observed=True, sort=False).indices
+    if len(groups) == 1:
+        return get_schema_adapter(*next(iter(groups))).select(all_data)
+    # 유형별 행은 수집 순서대로 이어져 있으므로 합친 순서가 원래 행 순서와 같다
+    return pd.concat([get_schema_adapter(*pair).select(all_data.iloc[positions])
+                      for pair, positions in sorted(groups.items(), key=lambda item: item[1][0])])
+
+
+# 조회 직후 컬럼 타입을 정리한다
+# - 거래금액/보증금/월세: 쉼표가 들어간 문자열 -> int32 (만원)
+# - 전용면적: float32
+# - 거래년도/거래월/거래일: 거래일자(datetime64) 하나로 합침
+# - 층/건축년도: int16
+# - 시도/시군구/법정동/아파트/거래유형/중개사소재지/부동산유형/거래구분: categorical
+def normalize_transactions(selected_data):
+    columns = {}
+    for column in selected_data.columns:
+        series = selected_data[column]
+        if column == "거래년도":
+            columns["거래일자"] = pd.to_datetime(
+                pd.DataFrame({
+                    "year": to_number(series),
+                    "month": to_number(selected_data["거래월"]),
+                    "day": to_number(selected_data["거래일"]),
+                }),
+                errors="coerce"
+            )
+        elif column in ("거래월", "거래일"):
+            continue
+        elif column in ("거래금액", "보증금", "월세"):
+            columns[column] = to_integer(series, "int32")
+        elif column == "전용면적":
+            columns[column] = to_number(series).astype("float32")
+        elif column in ("층", "건축년도"):
+            columns[column] = to_integer(series, "int16")
+        elif column in CATEGORY_COLUMNS:
+            columns[column] = series if isinstance(series.dtype, pd.CategoricalDtype) else series.astype("category")
+        else:
+            columns[column] = series
+    return pd.DataFrame(columns, index=selected_data.index)
+
+
+def to_number(series):
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        # PublicDataReader는 정수 컬럼을 nullable Int64로 돌려준다
+        # 결측치(NA)가 있으면 to_datetime 등에서 실패하므로 float(NaN)로 바꿔서 쓴다
+        return pd.to_numeric(series, errors="coerce").astype("float64")
+    cleaned = series.astype("string").str.replace(",", "", regex=False).str.strip()
+    return pd.to_numeric(cleaned, errors="coerce")
+
+
+# 결측치가 없으면 numpy 정수형, 있으면 pandas nullable 정수형(Int32/Int16)을 사용
+def to_integer(series, dtype):
+    values = to_number(series)
+    if values.isna().any():
+        return values.round().astype(dtype.capitalize())
+    return values.round().astype(np.dtype(dtype))
+
+
+def memory_footprint(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+# 거래일자에서 월별 집계용 (거래년도, 거래월) 키를 만든다
+def year_month_keys(selected_data):
+    dates = selected_data["거래일자"]
+    return [dates.dt.year.astype("Int16").rename("거래년도"), dates.dt.month.astype("Int8").rename("거래월")]
@@ -0,0 +1,168 @@
+import time
+from collections import OrderedDict
+
+from cache import CachedTransactionPrice
+from collector import FrameCollector
+from dataset import region_codes
+from district import DistrictConverter
+from fetcher import build_tasks, count_months, fetch_all
+from figures import build_figure_specs, render_figures
+from incremental import DEFAULT_LOOKBACK_MONTHS, IncrementalStore
+from instrument import span
+from normalize import memory_footprint, normalize_transactions, select_columns
+from query_engine import get_analysis_engine
+from resilient import FetchCheckpoint, ResilientTransactionPrice
+from schema import transaction_types, type_label
+
+
+# 조회 → 정리 → 분석 → 그래프까지의 결과
+class PipelineResult:
+    def __init__(self, selected_data, analysis_data, analysis, figures, memory_before, memory_after, timings):
+        # 타입 정리까지 끝난 전체 조회 결과 (화면의 "조회 결과" 표)
+        self.selected_data = selected_data
+        # 전용면적 결측치를 뺀 분석 대상 데이터 (리포트의 "조회 결과" 표)
+        self.analysis_data = analysis_data
+        self.analysis = analysis
+        self.figures = figures
+        self.memory_before = memory_before
+        self.memory_after = memory_after
+        self.timings = timings
+
+    # 결과 캐시 크기 계산용 (DataFrame + 요약표 + 거래량 배열 + 그래프 이미지)
+    @property
+    def nbytes(self):
+        total = memory_footprint(self.selected_data)
+        if self.analysis_data is not self.selected_data:
+            total += memory_footprint(self.analysis_data)
+        analysis = self.analysis
+        for table in (analysis.monthly_transactions, analysis.top_apartments):
+            total += memory_footprint(table)
+        for series in (analysis.regional_counts, analysis.area_counts, analysis.transaction_types):
+            total += int(series.memory_usage(deep=True))
+        if analysis.cube is not None:
+            total += int(analysis.cube["counts"].nbytes)
+        total += sum(len(image) for image in self.figures.values() if isinstance(image, (bytes, bytearray)))
+        return total
+
+
+# 단계별 소요 시간 기록 (계측 중이면 같은 이름의 구간도 남긴다)
+class StageTimer:
+    def __init__(self):
+        self.timings = OrderedDict()
+
+    def run(self, name, func, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            with span(name):
+                return func(*args, **kwargs)
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - started
+
+
+# PublicDataReader API (재시도/차단기가 있는 조회 객체를 월 단위 디스크 캐시를 거쳐 사용)
+def create_api(service_key):
+    return CachedTransactionPrice(ResilientTransactionPrice(service_key))
+
+
+# 조회 한 번의 예상 API 요청 수 (시군구 수 × 유형 조합 수 × 월 수, 디스크 캐시에 있는 월도 센다)
+# 백그라운드 조회 작업의 우선순위에 쓴다 (잘못된 입력은 0, 실제 오류는 작업을 실행할 때 낸다)
+def estimate_requests(si_do_name, start_year_month, end_year_month, property_type="아파트", trade_type="매매"):
+    try:
+        types = transaction_types(property_type, trade_type)
+        months = count_months(start_year_month, end_year_month)
+    except ValueError:
+        return 0
+    return len(build_tasks(DistrictConverter(), si_do_name)) * len(types) * months
+
+
+# 시/도(또는 "전국")의 시군구별 데이터를 조회해서 하나의 DataFrame으로 합친다
+# property_type/trade_type: 이름 하나 또는 목록 (목록이면 모든 조합을 조회해서 같이 합친다)
+# 여러 유형은 (유형, 시군구) 조회를 한 스레드 풀에서 같이 진행한다 (증분 조회는 유형별 저장소를 차례로 갱신)
+def fetch_transactions(api, si_do_name, start_year_month, end_year_month,
+                       property_type="아파트", trade_type="매매",
+                       incremental=False, lookback_months=DEFAULT_LOOKBACK_MONTHS, on_progress=None,
+                       **fetch_options):
+    types = transaction_types(property_type, trade_type)
+    tasks = build_tasks(DistrictConverter(), si_do_name)
+    if not tasks:
+        raise ValueError(f"시/도를 찾을 수 없습니다: {si_do_name}")
+
+    collector = FrameCollector()
+    if incremental:
+        for property_type, trade_type in types:
+            store = IncrementalStore(property_type=property_type, trade_type=trade_type)
+            frames = store.refresh(
+                api,
+                tasks,
+                start_year_month,
+                end_year_month,
+                lookback_months=int(lookback_months),
+                on_progress=on_progress,
+                **fetch_options
+            )
+            for task, df in zip(tasks, frames):
+                collector.add(df, task["sigungu_name"], task["si_do_name"], property_type, trade_type)
+        return collector.build()
+
+    # 중간에 실패해도 끝난 시군구는 checkpoint에 남으므로 다시 실행하면 이어서 조회한다
+    typed_tasks = [dict(task, property_type=property_type, trade_type=trade_type)
+                   for property_type, trade_type in types for task in tasks]
+    checkpoint = FetchCheckpoint.for_run(si_do_name, type_label(property_type), type_label(trade_type),
+                                         start_year_month, end_year_month)
+    frames = fetch_all(
+        api,
+        typed_tasks,
+        start_year_month,
+        end_year_month,
+        on_progress=on_progress,
+        checkpoint=checkpoint,
+        **fetch_options
+    )
+    checkpoint.clear()
+
+    for task, df in zip(typed_tasks, frames):
+        collector.add(df, task["sigungu_name"], task["si_do_name"], task["property_type"], task["trade_type"])
+    return collector.build()
+
+
+# 합친 원본 데이터의 컬럼/타입을 정리하고 분석 자료와 그래프를 만든다
+# engine: query_engine의 분석 엔진 (기본: ANALYSIS_ENGINE)
+def analyze_transactions(all_data, render=True, timer=None, engine=None):
+    timer = timer or StageTimer()
+    engine = engine or get_analysis_engine()
+
+    # 컬럼 이름 변환 및 타입 정리
+    selected_data = timer.run("select", select_columns, all_data)
+    memory_before = memory_footprint(selected_data)
+    selected_data = timer.run("normalize", normalize_transactions, selected_data)
+    memory_after = memory_footprint(selected_data)
+
+    # 전용면적 결측치 처리 (normalize_transactions에서 float32로 변환됨)
+    # 결측치가 없으면 복사하지 않고 같은 DataFrame을 쓴다
+    analysis_data = selected_data
+    if selected_data['전용면적'].isna().any():
+        analysis_data = selected_data.dropna(subset=['전용면적'])  # 결측치 삭제
+    analysis = timer.run("aggregate", engine.analyze, analysis_data)
+
+    figures = OrderedDict()
+    if render:
+        figures = timer.run("render", render_figures, build_figure_specs(analysis))
+
+    return PipelineResult(selected_data, analysis_data, analysis, figures, memory_before, memory_after, timer.timings)
+
+
+# 조회부터 그래프까지 한 번에 실행 (Streamlit 화면과 CLI가 같이 사용)
+def run_pipeline(api, si_do_name, start_year_month, end_year_month,
+                 property_type="아파트", trade_type="매매",
+                 incremental=False, lookback_months=DEFAULT_LOOKBACK_MONTHS,
+                 on_progress=None, render=True, dataset=None, engine=None):
+    timer = StageTimer()
+    all_data = timer.run("fetch", fetch_transactions, api, si_do_name, start_year_month, end_year_month,
+                         property_type=property_type, trade_type=trade_type,
+                         incremental=incremental, lookback_months=lookback_months, on_progress=on_progress)
+    result = analyze_transactions(all_data, render=render, timer=timer, engine=engine)
+    # 장기 추세 분석용 데이터셋(TransactionDataset)에 조회 구간을 저장
+    if dataset is not None:
+        timer.run("store", dataset.write, result.selected_data, region_codes(si_do_name),
+                  start_year_month, end_year_month)
+    return result
@@ -0,0 +1,292 @@
+import numpy as np
+import pandas as pd
+
+# 1평 = 400/121㎡ (약 3.3058㎡)
+SQM_PER_PYEONG = 400 / 121
+# 가격 구간 (분위수)과 이동 구간 길이(개월)
+DEFAULT_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+DEFAULT_WINDOW_MONTHS = 3
+# 해제여부가 이 값인 거래는 취소된 거래라 가격 분석에서 뺀다
+CANCELLED_MARK = "O"
+# 같은 세대로 보는 반복 거래 사이의 최소 간격(개월)
+MIN_HOLDING_MONTHS = 1
+# 층이 없는 거래의 세대 키에 쓰는 층 값
+UNKNOWN_FLOOR = -9999
+
+
+# 거래금액(만원)을 전용면적으로 나눈 ㎡당/평당 가격 (만원)
+# 가격 분석 대상이 아닌 행(취소, 금액/면적/날짜 없음)은 NaN
+def unit_prices(selected_data):
+    valid = valid_price_mask(selected_data)
+    amount = selected_data['거래금액'].to_numpy(dtype='float64', na_value=np.nan)
+    area = selected_data['전용면적'].to_numpy(dtype='float64', na_value=np.nan)
+    per_sqm = np.full(len(selected_data), np.nan)
+    per_sqm[valid] = amount[valid] / area[valid]
+    return pd.DataFrame({
+        '㎡당 가격': per_sqm,
+        '평당 가격': per_sqm * SQM_PER_PYEONG,
+    }, index=selected_data.index)
+
+
+# 가격 분석에 쓸 수 있는 행: 금액/면적이 양수, 거래일자 있음, 취소되지 않음
+def valid_price_mask(selected_data):
+    amount = selected_data['거래금액'].to_numpy(dtype='float64', na_value=np.nan)
+    area = selected_data['전용면적'].to_numpy(dtype='float64', na_value=np.nan)
+    valid = (amount > 0) & (area > 0) & ~np.isnat(selected_data['거래일자'].to_numpy(dtype='datetime64[ns]'))
+    if '해제여부' in selected_data.columns:
+        valid &= selected_data['해제여부'].to_numpy(dtype=object) != CANCELLED_MARK
+    return valid
+
+
+# 지역(시군구/법정동)별 월별 ㎡당 가격 분위수
+# - values: (지역, 월, 분위수) 배열, counts: (지역, 월) 이동 구간 안의 거래 수
+# - 월은 첫 거래월부터 마지막 거래월까지 빠짐없이 이어진다 (거래가 없으면 NaN)
+class PriceBands:
+    def __init__(self, level, labels, months, quantiles, window, counts, values):
+        self.level = level
+        self.labels = labels
+        self.months = months
+        self.quantiles = tuple(quantiles)
+        self.window = window
+        self.counts = counts
+        self.values = values
+
+    @property
+    def median(self):
+        return self.values[:, :, self.quantiles.index(0.5)]
+
+    # 같은 달 전년 대비 중앙값 변화율 (첫 12개월과 전년 거래가 없는 칸은 NaN)
+    @property
+    def year_over_year(self):
+        change = np.full(self.median.shape, np.nan)
+        if self.median.shape[1] > 12:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                change[:, 12:] = self.median[:, 12:] / self.median[:, :-12] - 1
+        return change
+
+    # 거래가 있는 (지역, 월)만 긴 표로
+    def to_frame(self):
+        regions, months = np.nonzero(self.counts)
+        frame = pd.DataFrame({
+            self.level: pd.Categorical.from_codes(regions, categories=self.labels),
+            '거래년도': np.array([year for year, _ in self.months], dtype=np.int64)[months] if len(self.months) else months,
+            '거래월': np.array([month for _, month in self.months], dtype=np.int64)[months] if len(self.months) else months,
+            '거래량': self.counts[regions, months],
+        })
+        for index, quantile in enumerate(self.quantiles):
+            frame[_quantile_label(quantile)] = self.values[regions, months, index]
+        frame['전년 대비'] = self.year_over_year[regions, months]
+        return frame
+
+
+# 지역별로 최근 window개월(해당 월 포함) 거래의 ㎡당 가격 분위수를 구한다
+# 각 거래를 window개 월 칸에 복제한 뒤 (칸, 가격)으로 한 번 정렬해서 모든 칸의 분위수를 배열 연산으로 읽는다
+# (pandas quantile의 linear 보간과 같다)
+def rolling_price_bands(selected_data, level='시군구', window=DEFAULT_WINDOW_MONTHS, quantiles=DEFAULT_QUANTILES):
+    valid = valid_price_mask(selected_data)
+    group_codes, labels = _category_codes(selected_data[level])
+    valid &= group_codes >= 0
+    prices = (selected_data['거래금액'].to_numpy(dtype='float64', na_value=np.nan)[valid]
+              / selected_data['전용면적'].to_numpy(dtype='float64', na_value=np.nan)[valid])
+    group_codes = group_codes[valid].astype(np.int64)
+    month_keys = _month_keys(selected_data)[valid]
+
+    if len(prices) == 0:
+        shape = (len(labels), 0)
+        return PriceBands(level, labels, [], quantiles, window, np.zeros(shape, dtype=np.int64),
+                          np.zeros(shape + (len(quantiles),)))
+
+    first, last = int(month_keys.min()), int(month_keys.max())
+    month_count = last - first + 1
+    month_codes = month_keys - first
+
+    # 가격은 순위(정수)로 바꿔 두고 정렬한 가격 배열에서 다시 읽는다
+    value_order = np.argsort(prices)
+    sorted_prices = prices[value_order]
+    ranks = np.empty(len(prices), dtype=np.int64)
+    ranks[value_order] = np.arange(len(prices), dtype=np.int64)
+
+    # 거래 하나가 해당 월부터 window-1개월 뒤까지의 칸에 들어간다
+    cells, cell_ranks = [], []
+    for offset in range(window):
+        inside = month_codes + offset < month_count
+        cells.append(group_codes[inside] * month_count + month_codes[inside] + offset)
+        cell_ranks.append(ranks[inside])
+    cells, cell_ranks = np.concatenate(cells), np.concatenate(cell_ranks)
+
+    # (칸, 가격) 순 정렬: 칸 번호와 가격 순위를 정수 하나로 합쳐 정렬한다 (lexsort보다 몇 배 빠르다)
+    counts = np.bincount(cells, minlength=len(labels) * month_count)
+    bits = max(int(len(prices)).bit_length(), 1)
+    if len(counts) < 1 << (62 - bits):
+        key = (cells << bits) | cell_ranks
+        key.sort()
+        values = sorted_prices[key & ((1 << bits) - 1)]
+    else:
+        values = sorted_prices[cell_ranks[np.lexsort((cell_ranks, cells))]]
+    starts = np.cumsum(counts) - counts
+
+    result = np.full((len(counts), len(quantiles)), np.nan)
+    filled = counts > 0
+    for index, quantile in enumerate(quantiles):
+        position = starts[filled] + quantile * (counts[filled] - 1)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, starts[filled] + counts[filled] - 1)
+        result[filled, index] = values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+    months = [(1970 + value // 12, value % 12 + 1) for value in range(first, last + 1)]
+    return PriceBands(level, labels, months, quantiles, window,
+                      counts.reshape(len(labels), month_count),
+                      result.reshape(len(labels), month_count, len(quantiles)))
+
+
+# 같은 세대(일련번호, 층, 전용면적)의 연속된 두 거래
+# 세대를 식별하는 번호가 없으므로 같은 단지·층·면적이면 같은 세대로 본다
+class RepeatSales:
+    def __init__(self, apartment_codes, apartment_labels, apartment_names, first_month, second_month, log_return):
+        # 일련번호 코드와 라벨, 일련번호별 아파트 이름
+        self.apartment_codes = apartment_codes
+        self.apartment_labels = apartment_labels
+        self.apartment_names = apartment_names
+        # 1970-01 기준 월 번호
+        self.first_month = first_month
+        self.second_month = second_month
+        # log(두 번째 ㎡당 가격 / 첫 번째 ㎡당 가격)
+        self.log_return = log_return
+
+    def __len__(self):
+        return len(self.log_return)
+
+    @property
+    def holding_months(self):
+        return self.second_month - self.first_month
+
+
+def repeat_sale_pairs(selected_data, min_holding_months=MIN_HOLDING_MONTHS):
+    sales = unit_sales(selected_data)
+    first, second = sales.consecutive_pairs(min_holding_months)
+    return RepeatSales(
+        sales.apartment_codes[first], sales.apartment_labels, sales.apartment_names,
+        sales.months[first], sales.months[second], sales.log_prices[second] - sales.log_prices[first],
+    )
+
+
+# 가격 분석 대상 거래를 (세대, 거래일) 순으로 정렬한 배열
+# 세대 키는 (일련번호, 층, 전용면적×100), 층이 없으면 UNKNOWN_FLOOR
+class UnitSales:
+    def __init__(self, unit, apartment_codes, apartment_labels, apartment_names, floors, areas, months,
+                 log_prices, region_codes=None, region_labels=None):
+        self.unit = unit
+        self.apartment_codes = apartment_codes
+        self.apartment_labels = apartment_labels
+        self.apartment_names = apartment_names
+        self.floors = floors
+        self.areas = areas
+        self.months = months
+        # log(㎡당 가격)
+        self.log_prices = log_prices
+        self.region_codes = region_codes
+        self.region_labels = region_labels
+
+    def __len__(self):
+        return len(self.unit)
+
+    # mask에 해당하는 거래만 (정렬 순서 유지)
+    def take(self, mask):
+        region_codes = self.region_codes[mask] if self.region_codes is not None else None
+        return UnitSales(
+            self.unit[mask], self.apartment_codes[mask], self.apartment_labels, self.apartment_names,
+            self.floors[mask], self.areas[mask], self.months[mask], self.log_prices[mask],
+            region_codes, self.region_labels,
+        )
+
+    # 같은 세대의 바로 다음 거래와 짝 (min_holding_months 미만 간격은 제외), (앞 거래 위치, 뒤 거래 위치)
+    def consecutive_pairs(self, min_holding_months=MIN_HOLDING_MONTHS):
+        pair = (self.unit[1:] == self.unit[:-1]) & (self.months[1:] - self.months[:-1] >= min_holding_months)
+        first = np.flatnonzero(pair)
+        return first, first + 1
+
+    # 세대별 첫 거래/마지막 거래 위치
+    def unit_bounds(self):
+        starts = np.flatnonzero(np.r_[True, self.unit[1:] != self.unit[:-1]]) if len(self.unit) else np.array([], dtype=np.int64)
+        ends = np.r_[starts[1:] - 1, len(self.unit) - 1] if len(starts) else starts
+        return starts, ends
+
+
+# level을 주면 각 거래의 지역(시군구/법정동) 코드도 같이 정렬해 둔다
+def unit_sales(selected_data, level=None):
+    valid = valid_price_mask(selected_data) & selected_data['일련번호'].notna().to_numpy()
+    columns = ['일련번호', '아파트', '층', '전용면적', '거래일자', '거래금액'] + ([level] if level else [])
+    rows = selected_data.loc[valid, columns]
+
+    apartment_codes, apartment_labels = pd.factorize(rows['일련번호'].astype('object').to_numpy(), sort=True)
+    floors = rows['층'].to_numpy(dtype='float64', na_value=np.nan)
+    floors = np.where(np.isnan(floors), UNKNOWN_FLOOR, floors).astype(np.int64)
+    areas = np.round(rows['전용면적'].to_numpy(dtype='float64') * 100).astype(np.int64)
+    floor_codes, _ = pd.factorize(floors)
+    area_codes, _ = pd.factorize(areas)
+    unit = (apartment_codes.astype(np.int64) * (floor_codes.max(initial=0) + 1) + floor_codes) \
+        * (area_codes.max(initial=0) + 1) + area_codes
+
+    # (세대, 거래일) 정렬: 일 번호가 17비트 안에 들어가므로 정수 하나로 합쳐 정렬한다
+    # 같은 날 거래는 원래 순서를 유지한다 (stable)
+    days = rows['거래일자'].to_numpy(dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+    if len(days) and int(unit.max()) < 1 << 45 and int(days.max() - days.min()) < 1 << 17:
+        order = np.argsort((unit << 17) | (days - days.min()), kind='stable')
+    else:
+        order = np.lexsort((days, unit))
+    months = days[order].astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    prices = (rows['거래금액'].to_numpy(dtype='float64', na_value=np.nan)
+              / rows['전용면적'].to_numpy(dtype='float64', na_value=np.nan))
+
+    # 일련번호별 아파트 이름 (첫 번째 행)
+    names = rows['아파트'].astype('object').to_numpy()
+    first_rows = np.empty(len(apartment_labels), dtype=np.int64)
+    first_rows[apartment_codes[::-1]] = np.arange(len(apartment_codes) - 1, -1, -1)
+
+    region_codes = region_labels = None
+    if level:
+        region_codes, region_labels = _category_codes(rows[level])
+        region_codes = region_codes[order]
+
+    return UnitSales(
+        unit[order], apartment_codes[order], list(apartment_labels), list(names[first_rows]),
+        floors[order], areas[order], months, np.log(prices[order]), region_codes, region_labels,
+    )
+
+
+# 단지(일련번호)별 반복 거래 요약: 거래 쌍 수, 평균 보유 기간, 연환산 상승률
+# 연환산 상승률 = exp(로그 수익률 합 / 보유 연수 합) - 1 (보유 기간이 긴 쌍에 더 큰 비중)
+def apartment_repeat_sales(pairs, min_pairs=1):
+    size = len(pairs.apartment_labels)
+    pair_counts = np.bincount(pairs.apartment_codes, minlength=size)
+    holding_years = np.bincount(pairs.apartment_codes, weights=pairs.holding_months / 12, minlength=size)
+    log_returns = np.bincount(pairs.apartment_codes, weights=pairs.log_return, minlength=size)
+
+    keep = pair_counts >= max(min_pairs, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annual = np.expm1(log_returns[keep] / holding_years[keep])
+        holding = holding_years[keep] * 12 / pair_counts[keep]
+    frame = pd.DataFrame({
+        '일련번호': np.asarray(pairs.apartment_labels, dtype='object')[keep],
+        '아파트': np.asarray(pairs.apartment_names, dtype='object')[keep],
+        '반복 거래 수': pair_counts[keep],
+        '평균 보유 개월': holding,
+        '연환산 상승률': annual,
+    })
+    return frame.sort_values('반복 거래 수', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def _quantile_label(quantile):
+    return '중앙값' if quantile == 0.5 else f"p{quantile * 100:g}"
+
+
+def _category_codes(series):
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype('category')
+    return series.cat.codes.to_numpy(), list(series.cat.categories)
+
+
+# 1970-01 기준 월 번호 (거래일자 없음은 가격 분석에서 이미 빠진다)
+def _month_keys(selected_data):
+    dates = selected_data['거래일자'].to_numpy(dtype='datetime64[ns]')
+    return dates.astype('datetime64[M]').astype(np.int64)
@@ -0,0 +1,259 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from aggregate import AREA_BINS, AREA_LABELS, build_analysis, compute_analysis
+
+# 분석 자료를 계산하는 엔진 ("pandas" 또는 "duckdb", 환경 변수로 조정 가능)
+# duckdb가 설치되어 있지 않으면 pandas 엔진을 사용한다
+ANALYSIS_ENGINE = os.environ.get("ANALYSIS_ENGINE", "pandas")
+# DuckDB가 쿼리 하나에 사용할 스레드 수
+DUCKDB_THREADS = int(os.environ.get("DUCKDB_THREADS", str(os.cpu_count() or 1)))
+ENGINE_NAMES = ["pandas", "duckdb"]
+# 요약표의 라벨(카테고리)이 되는 컬럼
+LABEL_COLUMNS = ["시군구", "법정동", "아파트", "거래유형"]
+ANALYSIS_COLUMNS = LABEL_COLUMNS + ["전용면적", "거래일자"]
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def duckdb_available():
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+# 기존 numpy/pandas 집계 (compute_analysis, TransactionDataset.analyze)
+class PandasEngine:
+    name = "pandas"
+
+    def analyze(self, selected_data):
+        return compute_analysis(selected_data)
+
+    def analyze_dataset(self, dataset, si_do_codes=None, sigungu_names=None, start_year_month=None, end_year_month=None):
+        return dataset.analyze(si_do_codes, sigungu_names, start_year_month, end_year_month)
+
+
+# 같은 요약표를 DuckDB SQL로 계산한다 (멀티 스레드 벡터 실행)
+# - (월, 시군구, 면적 범위, 거래유형)별 거래량과 법정동별 최다 거래 아파트만 SQL 결과로 받아 오므로
+#   파이썬으로 넘어오는 데이터는 요약 크기다
+# - 거래량 배열을 만든 뒤에는 pandas 엔진과 같은 build_analysis로 요약표를 만든다 (결과가 같다)
+# DataFrame은 복사하지 않고 그대로 스캔하고, 데이터셋은 Parquet 파일을 직접 읽는다
+class DuckDBEngine:
+    name = "duckdb"
+
+    def __init__(self, threads=DUCKDB_THREADS):
+        import duckdb
+
+        self.connection = duckdb.connect(":memory:")
+        self.connection.execute(f"SET threads = {int(threads)}")
+
+    def analyze(self, selected_data):
+        import pyarrow as pa
+
+        # categorical 컬럼은 코드(정수)만 넘기고 라벨은 카테고리에서 찾는다
+        # (DuckDB가 스캔할 때마다 큰 카테고리를 ENUM으로 바꾸지 않도록, 숫자 배열은 복사 없이 넘어간다)
+        columns, labels = {}, {}
+        for column in ANALYSIS_COLUMNS:
+            series = selected_data[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                columns[column] = pa.array(series.cat.codes.to_numpy())
+                labels[column] = list(series.cat.categories)
+            else:
+                columns[column] = pa.array(series, from_pandas=True)
+        table = pa.table(columns)
+
+        # 연결 하나를 여러 세션이 같이 쓰므로 호출마다 커서를 따로 연다
+        cursor = self.connection.cursor()
+        try:
+            cursor.register("transactions", table)
+            return self._analyze(cursor, "transactions", (), labels)
+        finally:
+            cursor.close()
+
+    def analyze_dataset(self, dataset, si_do_codes=None, sigungu_names=None, start_year_month=None, end_year_month=None):
+        files = dataset.files()
+        if not files:
+            return _empty_analysis()
+        conditions, params = ["전용면적 IS NOT NULL AND NOT isnan(전용면적)"], []
+        if si_do_codes is not None:
+            conditions.append("list_contains(?, si_do_code)")
+            params.append([str(code) for code in si_do_codes])
+        if start_year_month:
+            conditions.append("dealYear >= ? AND 거래일자 >= make_date(?, ?, 1)")
+            params += [int(str(start_year_month)[:4]), int(str(start_year_month)[:4]), int(str(start_year_month)[4:6])]
+        if end_year_month:
+            year, month = divmod(int(str(end_year_month)[:4]) * 12 + int(str(end_year_month)[4:6]), 12)
+            conditions.append("dealYear <= ? AND 거래일자 < make_date(?, ?, 1)")
+            params += [int(str(end_year_month)[:4]), year, month + 1]
+        if sigungu_names is not None:
+            conditions.append("list_contains(?, 시군구::VARCHAR)")
+            params.append(list(sigungu_names))
+
+        # 데이터셋의 유형에 해당하는 파일만 읽고, si_do_code/dealYear는 디렉터리 이름에서 읽으므로
+        # 조건에 맞지 않는 파일은 열지 않는다 (예전에 저장한 파일은 컬럼이 적을 수 있어 이름으로 맞춘다)
+        paths = ", ".join("'" + path.replace("'", "''") + "'" for path in files)
+        source = f"""(
+            SELECT 시군구, 법정동, 아파트, 전용면적, 거래일자, 거래유형
+            FROM read_parquet([{paths}], hive_partitioning = true, union_by_name = true,
+                              hive_types = {{'property_type': VARCHAR, 'trade_type': VARCHAR,
+                                             'si_do_code': VARCHAR, 'dealYear': SMALLINT}})
+            WHERE {' AND '.join(conditions)}
+        )"""
+        cursor = self.connection.cursor()
+        try:
+            return self._analyze(cursor, source, params)
+        finally:
+            cursor.close()
+
+    # source: 거래 행을 돌려주는 테이블 이름 또는 괄호로 감싼 SELECT
+    # coded_labels: 코드(정수)로 넘긴 컬럼의 라벨 (코드 -1은 결측)
+    def _analyze(self, cursor, source, params=(), coded_labels=None):
+        coded_labels = coded_labels or {}
+        value = {
+            column: f"nullif({column}, -1)" if column in coded_labels else f"{column}::VARCHAR"
+            for column in LABEL_COLUMNS
+        }
+        area_case = " ".join(
+            f"WHEN CAST(전용면적 AS DOUBLE) < {AREA_BINS[index + 1]} THEN {index}"
+            for index in range(len(AREA_LABELS) - 1)
+        )
+        cells = cursor.execute(f"""
+            SELECT
+                (year(거래일자) - 1970) * 12 + month(거래일자) - 1 AS month_key,
+                {value['시군구']} AS sigungu,
+                CASE WHEN 전용면적 IS NULL OR isnan(전용면적) OR 전용면적 < {AREA_BINS[0]} THEN NULL
+                     {area_case} ELSE {len(AREA_LABELS) - 1} END AS area,
+                {value['거래유형']} AS transaction_type,
+                count(*) AS transactions
+            FROM {source}
+            GROUP BY ALL
+        """, params).df()
+
+        # 법정동마다 거래량이 가장 많은 아파트 (동률이면 라벨 순서가 앞선 아파트: 코드 순서 = 카테고리 순서)
+        top = cursor.execute(f"""
+            WITH pairs AS (
+                SELECT {value['법정동']} AS dong, {value['아파트']} AS apartment, count(*) AS transactions
+                FROM {source}
+                GROUP BY ALL
+                HAVING dong IS NOT NULL AND apartment IS NOT NULL
+            )
+            SELECT dong, apartment, transactions
+            FROM pairs
+            QUALIFY row_number() OVER (PARTITION BY dong ORDER BY transactions DESC, apartment) = 1
+            ORDER BY dong
+        """, params).df()
+
+        labels = dict(coded_labels)
+        missing = [column for column in LABEL_COLUMNS if column not in labels]
+        if missing:
+            # 문자열 컬럼은 astype("category")처럼 실제 값을 이름순으로 (한 번의 스캔으로 모은다)
+            row = cursor.execute(
+                f"SELECT {', '.join(f'list(DISTINCT {value[column]})' for column in missing)} FROM {source}",
+                params
+            ).fetchone()
+            for column, values in zip(missing, row):
+                labels[column] = sorted(item for item in values or [] if item is not None)
+
+        positions = {
+            "sigungu": _positions(cells["sigungu"], labels["시군구"], "시군구" in coded_labels),
+            "transaction_type": _positions(cells["transaction_type"], labels["거래유형"], "거래유형" in coded_labels),
+        }
+        cube = _build_cube(cells, positions, labels["시군구"], labels["거래유형"])
+        top_apartments = _top_apartments_frame(
+            _positions(top["dong"], labels["법정동"], "법정동" in coded_labels),
+            _positions(top["apartment"], labels["아파트"], "아파트" in coded_labels),
+            top["transactions"], labels["법정동"], labels["아파트"])
+        return build_analysis(cube, top_apartments)
+
+
+# SQL 집계 결과(칸별 거래량)를 count_cube와 같은 배열로 옮긴다 (결측값은 각 축의 마지막 칸)
+def _build_cube(cells, positions, sigungu_names, type_names):
+    month_keys = cells["month_key"].dropna()
+    months = []
+    if len(month_keys):
+        first, last = int(month_keys.min()), int(month_keys.max())
+        months = [(1970 + value // 12, value % 12 + 1) for value in range(first, last + 1)]
+        month_codes = cells["month_key"].fillna(first + len(months)).to_numpy(dtype=np.int64) - first
+    else:
+        month_codes = np.zeros(len(cells), dtype=np.int64)
+
+    shape = (len(months) + 1, len(sigungu_names) + 1, len(AREA_LABELS) + 1, len(type_names) + 1)
+    counts = np.zeros(shape, dtype=np.int64)
+    index = (
+        month_codes,
+        positions["sigungu"],
+        cells["area"].fillna(len(AREA_LABELS)).to_numpy(dtype=np.int64),
+        positions["transaction_type"],
+    )
+    np.add.at(counts, index, cells["transactions"].to_numpy(dtype=np.int64))
+    return {"counts": counts, "months": months, "sigungu": sigungu_names, "area": AREA_LABELS, "types": type_names}
+
+
+def _empty_analysis():
+    cells = pd.DataFrame({"month_key": [], "area": [], "transactions": []})
+    empty = np.array([], dtype=np.int64)
+    cube = _build_cube(cells, {"sigungu": empty, "transaction_type": empty}, [], [])
+    return build_analysis(cube, _top_apartments_frame(empty, empty, empty, [], []))
+
+
+# 라벨 위치 (결측은 len(labels)): 코드로 넘긴 컬럼은 값이 곧 위치
+def _positions(values, labels, coded):
+    if coded:
+        return values.fillna(len(labels)).to_numpy(dtype=np.int64)
+    positions = pd.Index(labels).get_indexer(values)
+    return np.where(positions < 0, len(labels), positions).astype(np.int64)
+
+
+def _top_apartments_frame(dongs, apartments, counts, dong_names, apartment_names):
+    if len(counts) == 0:
+        return pd.DataFrame({'법정동': [], '아파트': [], '거래량': []})
+    return pd.DataFrame({
+        '법정동': pd.Categorical.from_codes(dongs, categories=dong_names),
+        '아파트': pd.Categorical.from_codes(apartments, categories=apartment_names),
+        '거래량': np.asarray(counts).astype(np.int64),
+    })
+
+
+# 엔진 이름 → 엔진 (프로세스당 하나, duckdb를 쓸 수 없으면 pandas)
+def get_analysis_engine(name=None):
+    name = name or ANALYSIS_ENGINE
+    if name not in ENGINE_NAMES:
+        raise ValueError(f"알 수 없는 분석 엔진입니다: {name} ({', '.join(ENGINE_NAMES)})")
+    if name == "duckdb" and not duckdb_available():
+        name = "pandas"
+    engine = _engines.get(name)
+    if engine is not None:
+        return engine
+    with _engines_lock:
+        if name not in _engines:
+            _engines[name] = DuckDBEngine() if name == "duckdb" else PandasEngine()
+    return _engines[name]
+
+
+# 두 분석 결과의 요약표가 같은지 비교하고 다른 표 이름 목록을 돌려준다 (엔진 결과 일치 확인용)
+def compare_analyses(expected, actual):
+    mismatches = []
+    for name in ("monthly_transactions", "top_apartments"):
+        try:
+            pd.testing.assert_frame_equal(getattr(expected, name), getattr(actual, name))
+        except AssertionError:
+            mismatches.append(name)
+    for name in ("regional_counts", "area_counts", "transaction_types"):
+        try:
+            pd.testing.assert_series_equal(getattr(expected, name), getattr(actual, name))
+        except AssertionError:
+            mismatches.append(name)
+    if expected.cube is not None and actual.cube is not None:
+        same_cube = (
+            np.array_equal(expected.cube["counts"], actual.cube["counts"])
+            and all(list(expected.cube[key]) == list(actual.cube[key]) for key in ("months", "sigungu", "types"))
+        )
+        if not same_cube:
+            mismatches.append("cube")
+    return mismatches
@@ -0,0 +1,340 @@
+import html
+import json
+import os
+import pickle
+import threading
+
+import numpy as np
+import pandas as pd
+from branca.element import MacroElement
+from jinja2 import Template
+
+from district import DistrictConverter
+from price import unit_prices
+
+# 시군구 경계 GeoJSON (WGS84 경위도, 파일 경로 또는 URL) 과 시군구코드가 들어 있는 속성 이름
+# 기본값은 국가공간정보포털 시군구 경계(TL_SCCO_SIG)를 GeoJSON으로 바꾼 파일의 SIG_CD
+BOUNDARY_SOURCE = os.environ.get("SIGUNGU_BOUNDARY_SOURCE", "sigungu.geojson")
+BOUNDARY_CODE_PROPERTY = os.environ.get("SIGUNGU_BOUNDARY_CODE_PROPERTY", "SIG_CD")
+# 줌 레벨별로 단순화한 경계를 저장하는 위치
+BOUNDARY_CACHE_DIR = os.environ.get("BOUNDARY_CACHE_DIR", os.path.join(".cache", "boundaries"))
+# 단순화 방식을 바꾸면 올려서 이전 캐시를 쓰지 않도록 한다
+BOUNDARY_VERSION = 1
+# 전국 지도 / 시도 지도에 쓰는 줌 레벨 (이 레벨의 화면 1픽셀보다 작은 굴곡은 지운다)
+NATIONWIDE_ZOOM = 7
+SI_DO_ZOOM = 9
+ZOOM_LEVELS = (NATIONWIDE_ZOOM, SI_DO_ZOOM)
+# 단순화 허용 오차 (화면 픽셀 수)
+SIMPLIFY_PIXELS = 1.0
+# 지도 색 구간 (분위수) 과 색
+MAP_CLASSES = 6
+MAP_COLORS = ["#ffffb2", "#fed976", "#feb24c", "#fd8d3c", "#f03b20", "#bd0026"]
+MAP_METRICS = ["거래량", "㎡당 가격 중앙값"]
+
+_boundaries = {}
+_boundaries_lock = threading.Lock()
+
+
+# 줌 레벨 하나의 시군구 경계
+# - features: 시도코드 -> {시군구코드: 직렬화한 GeoJSON Feature 문자열} (속성은 code 하나)
+# - bounds: 시군구코드 -> (남, 서, 북, 동)
+# 지도를 그릴 때마다 경계를 다시 직렬화하지 않도록 문자열을 그대로 이어 붙인다
+class RegionBoundaries:
+    def __init__(self, zoom, features, bounds):
+        self.zoom = zoom
+        self.features = features
+        self.bounds = bounds
+
+    # 지도에 넣을 시도 (None이면 전국) 의 시군구코드
+    def codes(self, si_do_codes=None):
+        si_do_codes = self.features if si_do_codes is None else si_do_codes
+        return {code for si_do_code in si_do_codes for code in self.features.get(si_do_code, ())}
+
+    def geojson(self, si_do_codes=None):
+        si_do_codes = self.features if si_do_codes is None else si_do_codes
+        parts = [feature for si_do_code in si_do_codes for feature in self.features.get(si_do_code, {}).values()]
+        return '{"type":"FeatureCollection","features":[' + ",".join(parts) + "]}"
+
+
+# 지역 보기에 쓰는 줌 레벨 (시도 여러 개면 전국 지도)
+def zoom_level(si_do_codes):
+    return NATIONWIDE_ZOOM if si_do_codes is None or len(si_do_codes) > 1 else SI_DO_ZOOM
+
+
+# 줌 레벨의 시군구 경계 (프로세스당 한 번, 디스크 캐시가 없으면 원본에서 만든다)
+def load_boundaries(zoom=NATIONWIDE_ZOOM):
+    boundaries = _boundaries.get(zoom)
+    if boundaries is not None:
+        return boundaries
+    with _boundaries_lock:
+        if zoom not in _boundaries:
+            _boundaries.update(prepare_boundaries([zoom]))
+    return _boundaries[zoom]
+
+
+# 여러 줌 레벨의 경계를 한 번에 준비 (원본 GeoJSON은 필요할 때 한 번만 읽는다)
+def prepare_boundaries(zoom_levels=ZOOM_LEVELS):
+    source_path = _source_path()
+    signature = _source_signature(source_path)
+    prepared = {}
+    regions = None
+    for zoom in zoom_levels:
+        boundaries = _cache_get(zoom, signature)
+        if boundaries is None:
+            if regions is None:
+                regions = read_regions(source_path)
+            boundaries = simplify_regions(regions, zoom)
+            _cache_put(zoom, signature, boundaries)
+        prepared[zoom] = boundaries
+    return prepared
+
+
+def _source_path():
+    if not BOUNDARY_SOURCE.startswith(("http://", "https://")):
+        return BOUNDARY_SOURCE
+    path = os.path.join(BOUNDARY_CACHE_DIR, "source.geojson")
+    if not os.path.exists(path):
+        import requests
+
+        response = requests.get(BOUNDARY_SOURCE, timeout=60)
+        response.raise_for_status()
+        os.makedirs(BOUNDARY_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(response.content)
+        os.replace(tmp_path, path)
+    return path
+
+
+def _source_signature(source_path):
+    try:
+        stat = os.stat(source_path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"시군구 경계 파일이 없습니다: {source_path} "
+                                f"(SIGUNGU_BOUNDARY_SOURCE로 GeoJSON 경로나 URL을 지정하세요)") from None
+    return (BOUNDARY_VERSION, BOUNDARY_CODE_PROPERTY, os.path.abspath(source_path), stat.st_size, stat.st_mtime_ns)
+
+
+def _cache_path(zoom):
+    return os.path.join(BOUNDARY_CACHE_DIR, f"sigungu-z{zoom}.pkl")
+
+
+def _cache_get(zoom, signature):
+    try:
+        with open(_cache_path(zoom), "rb") as f:
+            cached = pickle.load(f)
+        if cached.get("signature") == signature:
+            return cached["boundaries"]
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError, KeyError):
+        pass
+    return None
+
+
+def _cache_put(zoom, signature, boundaries):
+    path = _cache_path(zoom)
+    try:
+        os.makedirs(BOUNDARY_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"signature": signature, "boundaries": boundaries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError:
+        # 캐시를 쓸 수 없는 환경이어도 메모리의 경계는 그대로 사용한다
+        pass
+
+
+# 원본 GeoJSON -> {시군구코드: [폴리곤, ...]} (폴리곤은 링 배열 목록, 첫 링이 바깥 경계)
+def read_regions(source_path):
+    with open(source_path, "r", encoding="utf-8") as f:
+        collection = json.load(f)
+    regions = {}
+    for feature in collection["features"]:
+        code = str(feature["properties"][BOUNDARY_CODE_PROPERTY])
+        geometry = feature["geometry"]
+        polygons = [geometry["coordinates"]] if geometry["type"] == "Polygon" else geometry["coordinates"]
+        for polygon in polygons:
+            rings = [np.asarray(ring, dtype=np.float64)[:, :2] for ring in polygon]
+            if np.abs(rings[0]).max() > 180:
+                raise ValueError(f"시군구 경계가 경위도(WGS84) 좌표가 아닙니다: {source_path}")
+            regions.setdefault(code, []).append(rings)
+    return regions
+
+
+# 줌 레벨의 1픽셀(SIMPLIFY_PIXELS)보다 작은 굴곡을 지우고 좌표 자릿수를 줄여 직렬화한다
+def simplify_regions(regions, zoom):
+    tolerance = SIMPLIFY_PIXELS * 360 / (256 * 2 ** zoom)
+    decimals = max(int(np.ceil(-np.log10(tolerance))) + 1, 0)
+    converter = DistrictConverter()
+    features = {}
+    bounds = {}
+    for code, polygons in regions.items():
+        simplified = []
+        for polygon in polygons:
+            rings = [_simplify_ring(ring, tolerance) for ring in polygon]
+            # 바깥 경계가 1픽셀보다 작아지면 폴리곤을 (구멍은 링만) 뺀다
+            if len(rings[0]) < 4:
+                continue
+            simplified.append([np.round(rings[0], decimals)] +
+                              [np.round(ring, decimals) for ring in rings[1:] if len(ring) >= 4])
+        if not simplified:
+            # 전부 작아지면 가장 큰 바깥 경계를 그대로 남긴다 (지도에서 빠지지 않도록)
+            simplified = [[np.round(max((polygon[0] for polygon in polygons), key=len), decimals)]]
+        points = np.concatenate([polygon[0] for polygon in simplified])
+        west, south = points.min(axis=0)
+        east, north = points.max(axis=0)
+        bounds[code] = (float(south), float(west), float(north), float(east))
+        feature = {
+            "type": "Feature",
+            "properties": {"code": code},
+            "geometry": {"type": "MultiPolygon",
+                         "coordinates": [[ring.tolist() for ring in polygon] for polygon in simplified]},
+        }
+        info = converter.get_sigungu_info(code)
+        si_do_code = info[1] if info else code[:2]
+        features.setdefault(si_do_code, {})[code] = json.dumps(feature, separators=(",", ":"))
+    return RegionBoundaries(zoom, features, bounds)
+
+
+# Douglas-Peucker: 구간마다 양 끝을 잇는 선분에서 가장 먼 점이 허용 오차보다 멀면 남기고 나눈다
+def _simplify_ring(points, tolerance):
+    count = len(points)
+    if count <= 4:
+        return points
+    keep = np.zeros(count, dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, count - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        inner = points[start + 1:end]
+        origin = points[start]
+        direction = points[end] - origin
+        length = np.hypot(direction[0], direction[1])
+        offset = inner - origin
+        if length == 0:
+            # 닫힌 링의 처음과 끝은 같은 점이라 점까지의 거리를 쓴다
+            distance = np.hypot(offset[:, 0], offset[:, 1])
+        else:
+            distance = np.abs(direction[0] * offset[:, 1] - direction[1] * offset[:, 0]) / length
+        farthest = int(np.argmax(distance))
+        if distance[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return points[keep]
+
+
+# 시군구별 거래량과 ㎡당 가격 중앙값 (시군구코드는 시도명+시군구명으로 district.json에서 찾는다)
+def region_metrics(selected_data):
+    frame = pd.DataFrame({
+        '시도': selected_data['시도'],
+        '시군구': selected_data['시군구'],
+        '㎡당 가격': unit_prices(selected_data)['㎡당 가격'],
+    })
+    metrics = frame.groupby(['시도', '시군구'], observed=True, sort=False).agg(
+        거래량=('㎡당 가격', 'size'),
+        **{'㎡당 가격 중앙값': ('㎡당 가격', 'median')}
+    ).reset_index()
+    converter = DistrictConverter()
+    metrics.insert(0, '시군구코드', [converter.get_sigungu_code(str(si_do), str(sigungu))
+                                 for si_do, sigungu in zip(metrics['시도'], metrics['시군구'])])
+    return metrics
+
+
+# 시군구별 지표를 색칠한 folium 지도 (경계와 지표는 시군구코드로 잇는다)
+# - si_do_codes: 지도에 넣을 시도 (None이면 전국), zoom: 경계 단순화 레벨 (None이면 시도 수로 고른다)
+# - 경계에 없는 시(예: 수원시)의 지표는 그 시에 속한 구 경계에 칠한다
+def region_map(metrics, metric="거래량", si_do_codes=None, zoom=None):
+    import folium
+    from branca.colormap import StepColormap
+
+    boundaries = load_boundaries(zoom_level(si_do_codes) if zoom is None else zoom)
+    drawn = boundaries.codes(si_do_codes)
+    metrics = metrics[metrics['시군구코드'].notna() & metrics[metric].notna()]
+    codes = _boundary_codes(metrics['시군구코드'], drawn)
+    # 지도에 없는 지역은 색 구간을 나눌 때도 뺀다
+    shown = np.array([bool(region_codes) for region_codes in codes], dtype=bool)
+    metrics = metrics[shown]
+    codes = [region_codes for region_codes in codes if region_codes]
+    values = metrics[metric].to_numpy(dtype=np.float64)
+
+    styles = {}
+    colormap = None
+    if len(values):
+        breaks = np.unique(np.quantile(values, np.linspace(0, 1, MAP_CLASSES + 1)))
+        if len(breaks) == 1:
+            breaks = np.array([breaks[0], breaks[0] + 1])
+        classes = np.clip(np.searchsorted(breaks, values, side='right') - 1, 0, len(breaks) - 2)
+        colors = MAP_COLORS[-(len(breaks) - 1):]
+        colormap = StepColormap(colors, index=breaks.tolist(), vmin=float(breaks[0]), vmax=float(breaks[-1]),
+                                caption=metric)
+        rows = zip(metrics['시군구코드'], metrics['시도'], metrics['시군구'], metrics['거래량'], metrics['㎡당 가격 중앙값'],
+                   codes, classes)
+        # 시 지표를 구 경계에 먼저 칠하고, 구 자신의 지표가 있으면 그것으로 덮는다
+        for region_code, si_do, sigungu, volume, price, region_codes, color_class in sorted(
+                rows, key=lambda row: row[0] in drawn):
+            tooltip = _tooltip(si_do, sigungu, volume, price)
+            for code in region_codes:
+                styles[code] = [colors[color_class], tooltip]
+
+    folium_map = folium.Map(control_scale=True)
+    RegionLayer(boundaries.geojson(si_do_codes), styles).add_to(folium_map)
+    if colormap is not None:
+        colormap.add_to(folium_map)
+    fitted = [boundaries.bounds[code] for code in (styles or drawn)]
+    if fitted:
+        south, west, north, east = np.asarray(fitted).T
+        folium_map.fit_bounds([[south.min(), west.min()], [north.max(), east.max()]])
+    return folium_map
+
+
+# 지표의 시군구코드마다 칠할 경계 코드 목록 (경계에 없으면 같은 시의 구 경계들)
+def _boundary_codes(region_codes, boundary_codes):
+    children = {}
+    for code in boundary_codes:
+        children.setdefault(code[:4], []).append(code)
+    return [[code] if code in boundary_codes else children.get(code[:4], []) if code.endswith("0") else []
+            for code in region_codes]
+
+
+def _tooltip(si_do, sigungu, volume, price):
+    price_text = f"{price:,.0f}만원" if pd.notna(price) else "-"
+    return (f"{html.escape(str(si_do))} {html.escape(str(sigungu))}<br>"
+            f"거래량 {volume:,}건<br>㎡당 가격 중앙값 {price_text}")
+
+
+# 미리 직렬화한 경계 문자열을 그대로 넣는 GeoJSON 레이어
+# (folium.GeoJson은 그릴 때마다 경계 전체를 다시 읽고 직렬화한다)
+# styles: 시군구코드 -> [색, 툴팁], 없는 코드는 회색
+class RegionLayer(MacroElement):
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }}_styles = {{ this.styles }};
+        var {{ this.get_name() }} = L.geoJson({{ this.geometry }}, {
+            style: function(feature) {
+                var style = {{ this.get_name() }}_styles[feature.properties.code];
+                return {color: "#666666", weight: 0.5, fillColor: style ? style[0] : "#bbbbbb",
+                        fillOpacity: style ? 0.75 : 0.2};
+            },
+            onEachFeature: function(feature, layer) {
+                var style = {{ this.get_name() }}_styles[feature.properties.code];
+                if (style) { layer.bindTooltip(style[1], {sticky: true}); }
+            }
+        }).addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, geometry, styles):
+        super().__init__()
+        self._name = "RegionLayer"
+        self.geometry = geometry
+        self.styles = json.dumps(styles, ensure_ascii=False).replace("</", "<\\/")
+
+
+if __name__ == "__main__":
+    # 배포 전에 줌 레벨별 경계를 미리 만들어 둘 때 사용
+    for zoom, boundaries in prepare_boundaries().items():
+        size = sum(len(feature) for features in boundaries.features.values() for feature in features.values())
+        print(f"{_cache_path(zoom)}: 줌 {zoom}, 시군구 {len(boundaries.bounds)}개, {size / 2**20:.1f}MB")
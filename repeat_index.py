@@ -0,0 +1,394 @@
+import os
+import pickle
+import threading
+
+import numpy as np
+import pandas as pd
+
+from district import DistrictConverter
+from price import MIN_HOLDING_MONTHS, unit_sales
+
+# 반복 거래 지수 상태를 저장하는 위치 (환경 변수로 조정 가능)
+REPEAT_INDEX_DIR = os.environ.get("REPEAT_INDEX_DIR", os.path.join(".cache", "repeat_index"))
+# 저장 형식이 바뀌면 올린다 (다른 버전 파일은 버리고 새로 만든다)
+REPEAT_INDEX_VERSION = 2
+# 칸 키에서 월 번호(1970-01 기준)가 차지하는 비트 수 (2140년까지)
+MONTH_BITS = 11
+# 지수 기준값 (지역별 첫 달)
+BASE_INDEX = 100.0
+
+# 데이터셋에서 이미 읽은 달이 바뀌었는지 비교하는 거래량 파일 컬럼 (rollup.py)
+ROLLUP_DIGEST_COLUMNS = ["시군구코드", "거래년월", "면적범위", "거래유형", "거래량"]
+
+# 지수 계산에 필요한 컬럼
+INDEX_COLUMNS = ["시도", "일련번호", "아파트", "층", "전용면적", "거래일자", "거래금액", "해제여부"]
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+# 지역(시도, 시군구)별 반복 거래 지수 (Case-Shiller 방식)
+# - 같은 세대(일련번호, 층, 전용면적)의 연속된 두 거래를 한 쌍으로 보고 취소된 거래는 뺀다 (price.unit_sales)
+# - 거래 쌍은 (지역, 앞 거래월, 뒤 거래월) 칸별 충분 통계(쌍 수, Σy, Σy², y = log 가격 비)로만 쌓아 둔다
+#   칸 수는 지역 수 × 월 수² 이하라 거래 쌍이 수백만 개여도 메모리가 늘지 않는다
+# - 새 달이 들어오면 새 거래끼리의 쌍과, 세대별 마지막 거래와 새 거래의 쌍만 더한다 (기존 기간은 다시 읽지 않는다)
+# - 회귀는 칸 통계에서 정규방정식을 바로 만들어 풀고, 거래 쌍이 바뀐 지역만 다시 푼다
+# update는 지역마다 이미 반영한 달(region_last_months) 이전 거래를 무시한다
+# update_from_dataset은 시/도별로 읽은 달의 거래량을 기억해 두고, 그 달들이 바뀌면
+# (이전 연도를 나중에 저장했거나 늦은 신고가 들어온 경우) 그 시/도의 지역만 데이터셋에서 다시 만든다
+class RepeatSalesIndex:
+    def __init__(self, level="시군구", min_holding_months=MIN_HOLDING_MONTHS):
+        self.level = level
+        self.min_holding_months = min_holding_months
+        # (시도, 시군구) 목록, 칸 키의 지역 번호는 이 목록의 위치
+        self.regions = []
+        self._region_positions = {}
+        # 칸 키 (지역 << 2·MONTH_BITS | 앞 거래월 << MONTH_BITS | 뒤 거래월) 순으로 정렬
+        self.cell_keys = np.array([], dtype=np.int64)
+        self.cell_counts = np.array([], dtype=np.int64)
+        self.cell_sums = np.array([], dtype=np.float64)
+        self.cell_squares = np.array([], dtype=np.float64)
+        # 세대별 마지막 거래 (지역 번호, 월 번호, log ㎡당 가격)
+        self.last_units = _unit_index([], [], [])
+        self.last_regions = np.array([], dtype=np.int64)
+        self.last_months = np.array([], dtype=np.int64)
+        self.last_log_prices = np.array([], dtype=np.float64)
+        # 지역 번호별로 반영한 마지막 월 (1970-01 기준 월 번호, 없으면 -1, 데이터에 있던 월)
+        self.region_last_months = np.array([], dtype=np.int64)
+        # 데이터셋에서 읽은 시/도 코드 → {"last_month": 읽은 마지막 월 (YYYYMM), "digest": 그 월까지의 거래량 요약}
+        self.sources = {}
+        # 지역 번호 → (첫 월, log 지수, 월별 거래 쌍 수)
+        self._fits = {}
+        self.lock = threading.RLock()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.RLock()
+
+    @property
+    def pair_count(self):
+        return int(self.cell_counts.sum())
+
+    # 반영한 마지막 월 (1970-01 기준 월 번호, 모든 지역 중 가장 늦은 월, 없으면 None)
+    @property
+    def last_month(self):
+        if not len(self.region_last_months) or self.region_last_months.max() < 0:
+            return None
+        return int(self.region_last_months.max())
+
+    # 새 달의 거래를 더한다 (지역마다 이미 반영한 달 이전 달과 through_year_month 이후 달은 건너뛴다)
+    # through_year_month: 다 모인 마지막 달 (YYYYMM, 기본: 데이터의 마지막 달)
+    # 반환: 새로 더한 거래 쌍 수
+    def update(self, selected_data, through_year_month=None):
+        frame, region_labels = _region_frame(selected_data, self.level)
+        all_sales = unit_sales(frame, "지역")
+
+        # 반영한 달은 잠금 안에서 읽는다 (여러 세션이 같이 갱신해도 같은 달을 두 번 더하지 않도록)
+        with self.lock:
+            region_map = np.array([self._region_position(region_labels(code)) for code in all_sales.region_labels],
+                                  dtype=np.int64)
+            keep = all_sales.months > self.region_last_months[region_map[all_sales.region_codes]]
+            if through_year_month:
+                keep &= all_sales.months <= _month_number(through_year_month)
+            sales = all_sales.take(keep)
+            if len(sales) == 0:
+                return 0
+
+            # 새 거래끼리의 쌍
+            first, second = sales.consecutive_pairs(self.min_holding_months)
+            first_months, first_log_prices = sales.months[first], sales.log_prices[first]
+
+            # 세대별 마지막 거래와 이번에 들어온 첫 거래의 쌍
+            starts, ends = sales.unit_bounds()
+            apartment_labels = np.asarray(sales.apartment_labels, dtype=object)
+            units = _unit_index(apartment_labels[sales.apartment_codes[starts]], sales.floors[starts], sales.areas[starts])
+            found = self.last_units.get_indexer(units) if len(self.last_units) else np.full(len(units), -1)
+            linked = np.flatnonzero(found >= 0)
+            linked = linked[sales.months[starts[linked]] - self.last_months[found[linked]] >= self.min_holding_months]
+            first_months = np.concatenate([first_months, self.last_months[found[linked]]])
+            first_log_prices = np.concatenate([first_log_prices, self.last_log_prices[found[linked]]])
+            second = np.concatenate([second, starts[linked]])
+
+            regions = region_map[sales.region_codes[second]]
+            self._add_cells(regions, first_months, sales.months[second],
+                            sales.log_prices[second] - first_log_prices)
+
+            # 세대별 마지막 거래 갱신 (처음 보는 세대는 뒤에 붙인다)
+            known = found >= 0
+            self.last_months[found[known]] = sales.months[ends[known]]
+            self.last_log_prices[found[known]] = sales.log_prices[ends[known]]
+            new = ends[~known]
+            self.last_units = self.last_units.append(units[~known])
+            self.last_regions = np.concatenate([self.last_regions, region_map[sales.region_codes[new]]])
+            self.last_months = np.concatenate([self.last_months, sales.months[new]])
+            self.last_log_prices = np.concatenate([self.last_log_prices, sales.log_prices[new]])
+
+            # 지역별 반영한 달은 요청한 범위가 아니라 실제로 들어온 거래의 마지막 달
+            np.maximum.at(self.region_last_months, region_map[sales.region_codes], sales.months)
+            for region in np.unique(regions):
+                self._fits.pop(int(region), None)
+            return len(second)
+
+    # 데이터셋에서 시/도별로 아직 반영하지 않은 달만 연도 단위로 읽어 더한다 (한 번에 1년치만 메모리에 올린다)
+    # 이미 읽은 달의 거래량(파티션별 거래량 파일)이 읽을 때와 다르면 (이전 연도를 새로 저장했거나
+    # 늦은 신고가 들어온 경우) 그 시/도의 지역을 지우고 through_year_month까지 다시 읽는다
+    # 거래량이 그대로인 변경(해제 여부만 바뀐 거래 등)은 알 수 없다
+    # 반환: 새로 읽거나 다시 만든 시/도 수 (0이면 지수가 바뀌지 않았다)
+    def update_from_dataset(self, dataset, si_do_codes=None, through_year_month=None):
+        codes = None if si_do_codes is None else {str(code) for code in si_do_codes}
+        partitions = [(code, year) for code, year in dataset.partitions() if codes is None or code in codes]
+        through = int(through_year_month) if through_year_month else None
+        changed = 0
+        with self.lock:
+            sources = sorted({code for code, _ in partitions} | {code for code in self.sources
+                                                                  if codes is None or code in codes})
+            for code in sources:
+                rollup = dataset.rollups([code], None, through_year_month)
+                if through is not None:
+                    rollup = rollup[rollup["거래년월"] <= through]
+                source = self.sources.get(code)
+                if source is not None and _rollup_digest(rollup, source["last_month"]) != source["digest"]:
+                    self._drop_si_do(code)
+                    source = None
+                if rollup.empty:
+                    if self.sources.pop(code, None) is not None:
+                        changed += 1
+                    continue
+                last_month = int(rollup["거래년월"].max())
+                if source is not None and source["last_month"] >= last_month:
+                    continue
+
+                start = _year_month(_month_number(source["last_month"]) + 1) if source else None
+                for year in sorted(year for partition_code, year in partitions if partition_code == code):
+                    if (start and year < int(start[:4])) or (through and year > through // 100):
+                        continue
+                    batch_start = max(start or f"{year}01", f"{year}01")
+                    frame = dataset.load([code], None, batch_start, f"{year}12",
+                                         columns=INDEX_COLUMNS + [self.level])
+                    self.update(frame, through_year_month)
+                self.sources[code] = {"last_month": last_month, "digest": _rollup_digest(rollup, last_month)}
+                changed += 1
+        return changed
+
+    # 3단계 가중 반복 거래 회귀 (Case, Shiller 1987)
+    # 1) 최소제곱으로 월별 log 지수를 구하고
+    # 2) 잔차² 를 보유 기간에 회귀해서 쌍마다 분산 α + γ·보유 개월을 정한 뒤
+    # 3) 분산의 역수를 가중치로 다시 푼다
+    # 지역마다 거래 쌍이 가장 많이 이어진 월들만 지수를 내고 (첫 달 = 100), 이어지지 않은 달은 NaN
+    def fit(self):
+        with self.lock:
+            regions = self.cell_keys >> (2 * MONTH_BITS)
+            bounds = np.flatnonzero(np.r_[True, regions[1:] != regions[:-1], True]) if len(regions) else [0]
+            frames = []
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                region = int(regions[start])
+                if region not in self._fits:
+                    keys = self.cell_keys[start:end]
+                    self._fits[region] = _fit_region(
+                        (keys >> MONTH_BITS) & ((1 << MONTH_BITS) - 1), keys & ((1 << MONTH_BITS) - 1),
+                        self.cell_counts[start:end], self.cell_sums[start:end], self.cell_squares[start:end])
+                first, log_index, pairs = self._fits[region]
+                months = np.arange(first, first + len(log_index))
+                frames.append(pd.DataFrame({
+                    "시도": self.regions[region][0],
+                    self.level: self.regions[region][1],
+                    "거래년도": 1970 + months // 12,
+                    "거래월": months % 12 + 1,
+                    "지수": BASE_INDEX * np.exp(log_index),
+                    "거래 쌍 수": pairs,
+                }))
+        if not frames:
+            return pd.DataFrame({"시도": [], self.level: [], "거래년도": [], "거래월": [], "지수": [], "거래 쌍 수": []})
+        return pd.concat(frames, ignore_index=True)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self.lock:
+            with open(tmp_path, "wb") as f:
+                pickle.dump({"version": REPEAT_INDEX_VERSION, "index": self}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    # 저장된 지수를 읽는다 (없거나 읽을 수 없으면 빈 지수)
+    @classmethod
+    def load(cls, path, level="시군구"):
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+            if state.get("version") == REPEAT_INDEX_VERSION and state["index"].level == level:
+                return state["index"]
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, KeyError, ValueError):
+            pass
+        return cls(level)
+
+    def _region_position(self, label):
+        position = self._region_positions.get(label)
+        if position is None:
+            position = self._region_positions[label] = len(self.regions)
+            self.regions.append(label)
+            self.region_last_months = np.append(self.region_last_months, -1)
+        return position
+
+    # 시/도 하나의 지역을 비운다 (칸 통계, 세대별 마지막 거래, 반영한 달, 지수)
+    def _drop_si_do(self, si_do_code):
+        si_do_codes = DistrictConverter().si_do_codes
+        regions = np.array([position for position, (si_do, _) in enumerate(self.regions)
+                            if str(si_do_codes.get(si_do)) == str(si_do_code)], dtype=np.int64)
+        if not len(regions):
+            return
+        keep = ~np.isin(self.cell_keys >> (2 * MONTH_BITS), regions)
+        self.cell_keys, self.cell_counts = self.cell_keys[keep], self.cell_counts[keep]
+        self.cell_sums, self.cell_squares = self.cell_sums[keep], self.cell_squares[keep]
+        keep = ~np.isin(self.last_regions, regions)
+        self.last_units, self.last_regions = self.last_units[keep], self.last_regions[keep]
+        self.last_months, self.last_log_prices = self.last_months[keep], self.last_log_prices[keep]
+        self.region_last_months[regions] = -1
+        for region in regions:
+            self._fits.pop(int(region), None)
+
+    # 거래 쌍을 칸별 통계에 더한다
+    def _add_cells(self, regions, first_months, second_months, log_returns):
+        if len(log_returns) == 0:
+            return
+        if first_months.min() < 0 or second_months.max() >= 1 << MONTH_BITS:
+            raise ValueError("반복 거래 지수는 1970년 1월 이후 거래만 다룹니다")
+        keys = (regions << (2 * MONTH_BITS)) | (first_months << MONTH_BITS) | second_months
+        keys, inverse = np.unique(np.concatenate([self.cell_keys, keys]), return_inverse=True)
+        counts = np.concatenate([self.cell_counts, np.ones(len(log_returns), dtype=np.int64)])
+        sums = np.concatenate([self.cell_sums, log_returns])
+        squares = np.concatenate([self.cell_squares, log_returns ** 2])
+        self.cell_keys = keys
+        self.cell_counts = np.bincount(inverse, weights=counts, minlength=len(keys)).astype(np.int64)
+        self.cell_sums = np.bincount(inverse, weights=sums, minlength=len(keys))
+        self.cell_squares = np.bincount(inverse, weights=squares, minlength=len(keys))
+
+
+# 지역 하나의 칸 통계로 지수를 구한다
+# first: 앞 거래월, second: 뒤 거래월, counts/sums/squares: 칸별 쌍 수, Σy, Σy²
+# 반환: (첫 월, 첫 월부터 마지막 월까지의 log 지수, 월별 거래 쌍 수)
+def _fit_region(first, second, counts, sums, squares):
+    start = int(first.min())
+    size = int(second.max()) - start + 1
+    first, second = first - start, second - start
+    pairs = np.bincount(first, weights=counts, minlength=size) + np.bincount(second, weights=counts, minlength=size)
+    log_index = np.full(size, np.nan)
+
+    # 거래 쌍으로 이어진 월 묶음 중 쌍이 가장 많은 묶음만 풀 수 있다 (묶음마다 기준이 따로 필요하다)
+    components = _components(first, second, size)
+    weights = np.bincount(components[first], weights=counts, minlength=size)
+    inside = components[first] == np.argmax(weights)
+    months = np.flatnonzero(components == np.argmax(weights))
+    positions = np.full(size, -1)
+    positions[months] = np.arange(len(months))
+    a, b = positions[first[inside]], positions[second[inside]]
+    n, s, q = counts[inside].astype(np.float64), sums[inside], squares[inside]
+
+    # 1단계: 최소제곱
+    beta = _solve(a, b, n, s, len(months))
+    # 2단계: 칸별 잔차 제곱합 Σ(y - d)² = Σy² - 2dΣy + nd² 를 보유 기간에 회귀
+    difference = beta[b] - beta[a]
+    errors = np.maximum(q - 2 * difference * s + n * difference ** 2, 0)
+    holding = (months[b] - months[a]).astype(np.float64)
+    moments = np.array([[n.sum(), (n * holding).sum()], [(n * holding).sum(), (n * holding ** 2).sum()]])
+    if np.unique(holding).size > 1 and abs(np.linalg.det(moments)) > 0:
+        alpha, gamma = np.linalg.solve(moments, [errors.sum(), (holding * errors).sum()])
+        variance = alpha + gamma * holding
+        # 3단계: 분산이 양수로 추정될 때만 가중치를 준다 (아니면 1단계 결과)
+        if np.all(variance > 0):
+            beta = _solve(a, b, n / variance, s / variance, len(months))
+
+    log_index[months] = beta
+    return start, log_index, pairs.astype(np.int64)
+
+
+# 쌍 (a → b) 가 log 지수 차 β_b - β_a 로 설명되도록 가중 정규방정식 X'WX β = X'Wy 를 푼다
+# 설계 행렬은 행마다 두 칸(-1, +1)만 있으므로 만들지 않고 칸 통계를 bincount로 바로 더한다
+# weights: 칸별 가중치 합 (Σw), weighted_sums: 칸별 Σwy, 첫 월(0)은 기준이라 β = 0
+def _solve(a, b, weights, weighted_sums, size):
+    beta = np.zeros(size)
+    if size < 2:
+        return beta
+    normal = (np.bincount(a * size + a, weights=weights, minlength=size * size)
+              + np.bincount(b * size + b, weights=weights, minlength=size * size)
+              - np.bincount(a * size + b, weights=weights, minlength=size * size)
+              - np.bincount(b * size + a, weights=weights, minlength=size * size)).reshape(size, size)
+    right = np.bincount(b, weights=weighted_sums, minlength=size) - np.bincount(a, weights=weighted_sums, minlength=size)
+    try:
+        beta[1:] = np.linalg.solve(normal[1:, 1:], right[1:])
+    except np.linalg.LinAlgError:
+        beta[1:] = np.linalg.lstsq(normal[1:, 1:], right[1:], rcond=None)[0]
+    return beta
+
+
+# 월을 꼭짓점, 거래 쌍을 간선으로 본 연결 요소 번호 (묶음에서 가장 작은 월 번호)
+def _components(first, second, size):
+    labels = np.arange(size)
+    while True:
+        smaller = np.minimum(labels[first], labels[second])
+        updated = labels.copy()
+        np.minimum.at(updated, first, smaller)
+        np.minimum.at(updated, second, smaller)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+# 지수 계산에 필요한 컬럼만 고르고 (시도, level) 조합을 정수 컬럼 "지역"으로 붙인다
+# (이름이 같은 시군구가 여러 시/도에 있으므로 시도와 같이 구분한다, 둘 중 하나라도 없으면 뺀다)
+# 반환: (DataFrame, "지역" 값 → (시도, level) 이름)
+def _region_frame(selected_data, level):
+    columns = [column for column in dict.fromkeys(INDEX_COLUMNS + [level]) if column in selected_data.columns]
+    si_do = selected_data["시도"].astype("category")
+    region = selected_data[level].astype("category")
+    si_do_codes = si_do.cat.codes.to_numpy().astype(np.int64)
+    region_codes = region.cat.codes.to_numpy().astype(np.int64)
+    valid = (si_do_codes >= 0) & (region_codes >= 0)
+    width = max(len(region.cat.categories), 1)
+    frame = selected_data.loc[valid, columns].assign(지역=si_do_codes[valid] * width + region_codes[valid])
+    si_do_labels, level_labels = list(si_do.cat.categories), list(region.cat.categories)
+    return frame, lambda code: (si_do_labels[int(code) // width], level_labels[int(code) % width])
+
+
+# 거래량 파일에서 last_month(YYYYMM)까지의 행을 순서와 상관없이 하나의 값으로 요약한다
+def _rollup_digest(rollup, last_month):
+    rows = rollup.loc[rollup["거래년월"] <= last_month, ROLLUP_DIGEST_COLUMNS]
+    return int(pd.util.hash_pandas_object(rows, index=False).to_numpy().sum(dtype=np.uint64))
+
+
+def _unit_index(apartments, floors, areas):
+    return pd.MultiIndex.from_arrays([
+        pd.Index(apartments, dtype=object),
+        pd.Index(floors, dtype=np.int64),
+        pd.Index(areas, dtype=np.int64),
+    ])
+
+
+def _month_number(year_month):
+    return (int(str(year_month)[:4]) - 1970) * 12 + int(str(year_month)[4:6]) - 1
+
+
+def _year_month(month_number):
+    year, month = divmod(int(month_number), 12)
+    return f"{1970 + year:04d}{month + 1:02d}"
+
+
+# (부동산 유형, 거래 유형, level) → 저장된 지수 (프로세스당 하나)
+def get_repeat_index(property_type="아파트", trade_type="매매", level="시군구"):
+    key = (property_type, trade_type, level)
+    index = _indexes.get(key)
+    if index is not None:
+        return index
+    with _indexes_lock:
+        if key not in _indexes:
+            _indexes[key] = RepeatSalesIndex.load(repeat_index_path(*key), level)
+    return _indexes[key]
+
+
+def repeat_index_path(property_type="아파트", trade_type="매매", level="시군구"):
+    return os.path.join(REPEAT_INDEX_DIR, property_type, trade_type, f"{level}.pkl")
@@ -1,41 +1,428 @@
 import base64
+import html
+import json
 from io import BytesIO
 
-def generate_html_report(figures, dataframes):
-    html_content = """
+import numpy as np
+import pandas as pd
+
+from instrument import span
+
+# 큰 표는 이 행 수만큼 나눠서 HTML로 변환한다
+TABLE_CHUNK_ROWS = 5000
+# 숫자 컬럼 중 천 단위 구분 기호를 넣지 않는 컬럼 (크기가 아니라 연도/월/층처럼 값 자체를 읽는 컬럼)
+PLAIN_NUMBER_COLUMNS = {"건축년도", "거래년도", "거래월", "거래일", "층"}
+# 실수 컬럼의 최대 소수 자릿수 (컬럼의 모든 값을 나타낼 수 있는 가장 짧은 자릿수로 맞춘다)
+MAX_DECIMALS = 6
+# table_mode="auto"일 때 이 행 수보다 큰 표는 가상 스크롤 표로 넣는다
+VIRTUAL_TABLE_MIN_ROWS = 20000
+# 이미지는 3의 배수 바이트 단위로 나눠서 base64로 변환한다 (중간에 패딩이 생기지 않도록)
+IMAGE_CHUNK_BYTES = 3 * 64 * 1024
+
+REPORT_HEAD = """
     <html>
-        <head>
-            <title>부동산 데이터 분석 리포트</title>
-            <style>
-                body { font-family: Arial, sans-serif; margin: 20px; }
-                h2 { color: #333; }
-                table { border-collapse: collapse; width: 100%; margin: 10px 0; }
-                th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
-                th { background-color: #f2f2f2; }
-                img { max-width: 100%; height: auto; }
-            </style>
-        </head>
-        <body>
-    """
-    
+    <head>
+        <title>부동산 데이터 분석 리포트</title>
+        <style>
+            body {
+                font-family: Arial, sans-serif;
+                margin: 20px;
+            }
+            h1 {
+                text-align: center;
+                color: #333;
+            }
+            h2 {
+                color: #555;
+            }
+            .table-container {
+                max-height: 400px; /* 원하는 높이 설정 */
+                overflow-y: auto; /* 수직 스크롤 적용 */
+                margin-bottom: 20px;
+            }
+            .table {
+                width: 100%;
+                border-collapse: collapse;
+            }
+            .table th, .table td {
+                border: 1px solid #ddd;
+                padding: 8px;
+            }
+            .table th {
+                background-color: #f2f2f2;
+                text-align: left;
+            }
+            .footer {
+                margin-top: 40px;
+                text-align: center;
+                font-size: 12px;
+                color: #777;
+            }
+            .filter {
+                margin-bottom: 10px;
+            }
+            .vt-viewport {
+                height: 400px; /* 가상 스크롤 표 높이 */
+                overflow-y: auto;
+                margin-bottom: 20px;
+            }
+            .vt-viewport thead th {
+                position: sticky;
+                top: 0;
+            }
+            .vt-viewport tbody tr {
+                height: 34px; /* VT_ROW_HEIGHT와 같아야 함 */
+            }
+            .vt-viewport td, .vt-viewport tbody th {
+                white-space: nowrap;
+                padding: 0 8px;
+            }
+        </style>
+    </head>
+    <body>
+        <h1>부동산 매매가 분석 보고서</h1>
+        <p>작성자: KH
+        <p>홈페이지: https://2days.kr
+        <p>블로그 : https://aboda.kr
+        <p>연락처: <a href="mailto:hyperkh65@gmail.com">hyperkh65@gmail.com</a></p>
+"""
+
+REPORT_SCRIPT = """
+    <script>
+        document.querySelectorAll('.graph img').forEach(item => {
+            item.addEventListener('click', event => {
+                const img = event.target.src;
+                const modal = document.createElement('div');
+                modal.style.position = 'fixed';
+                modal.style.left = '0';
+                modal.style.top = '0';
+                modal.style.width = '100%';
+                modal.style.height = '100%';
+                modal.style.backgroundColor = 'rgba(0, 0, 0, 0.8)';
+                modal.style.zIndex = '1000';
+                const imgModal = document.createElement('img');
+                imgModal.src = img;
+                imgModal.style.maxWidth = '90%';
+                imgModal.style.maxHeight = '90%';
+                imgModal.style.position = 'absolute';
+                imgModal.style.top = '50%';
+                imgModal.style.left = '50%';
+                imgModal.style.transform = 'translate(-50%, -50%)';
+                modal.appendChild(imgModal);
+                modal.addEventListener('click', () => {
+                    document.body.removeChild(modal);
+                });
+                document.body.appendChild(modal);
+            });
+        });
+
+        function filterTable(input, title) {
+            const filter = input.value.toLowerCase();
+            const table = document.getElementById(title);
+            const rows = table.getElementsByTagName("tr");
+
+            for (let i = 1; i < rows.length; i++) {
+                const cells = rows[i].getElementsByTagName("td");
+                let found = false;
+
+                for (let j = 0; j < cells.length; j++) {
+                    if (cells[j].textContent.toLowerCase().includes(filter)) {
+                        found = true;
+                        break;
+                    }
+                }
+
+                rows[i].style.display = found ? "" : "none";
+            }
+        }
+
+        // 가상 스크롤 표: 보이는 행만 그리고, 필터는 열별 고유값 목록에서 먼저 찾은 뒤 코드로 행을 고른다
+        const VT_ROW_HEIGHT = 34;
+        const virtualTables = {};
+
+        function escapeHtml(value) {
+            return String(value).replace(/[&<>"']/g, ch => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[ch]));
+        }
+
+        function initVirtualTable(root) {
+            const payload = JSON.parse(document.getElementById(root.id + '-data').textContent);
+            const state = {
+                root: root,
+                viewport: root.querySelector('.vt-viewport'),
+                tbody: root.querySelector('tbody'),
+                rowCount: payload.rows,
+                values: payload.columns.map(column => column.values),
+                codes: payload.columns.map(column => column.codes ? Int32Array.from(column.codes) : null),
+                lowered: null,
+                rows: null
+            };
+            state.viewport.addEventListener('scroll', () => window.requestAnimationFrame(() => renderVirtualTable(state)));
+            virtualTables[root.id] = state;
+            renderVirtualTable(state);
+        }
+
+        function renderVirtualTable(state) {
+            const total = state.rows ? state.rows.length : state.rowCount;
+            const first = Math.max(0, Math.floor(state.viewport.scrollTop / VT_ROW_HEIGHT) - 10);
+            const last = Math.min(total, first + Math.ceil(state.viewport.clientHeight / VT_ROW_HEIGHT) + 20);
+            const parts = [`<tr style="height:${first * VT_ROW_HEIGHT}px"></tr>`];
+            for (let i = first; i < last; i++) {
+                const row = state.rows ? state.rows[i] : i;
+                parts.push('<tr>');
+                for (let c = 0; c < state.values.length; c++) {
+                    const tag = c === 0 ? 'th' : 'td';
+                    const code = state.codes[c] ? state.codes[c][row] : row;
+                    parts.push(`<${tag}>${escapeHtml(state.values[c][code])}</${tag}>`);
+                }
+                parts.push('</tr>');
+            }
+            parts.push(`<tr style="height:${(total - last) * VT_ROW_HEIGHT}px"></tr>`);
+            state.tbody.innerHTML = parts.join('');
+        }
+
+        function filterVirtualTable(input, id) {
+            const state = virtualTables[id];
+            const filter = input.value.toLowerCase();
+            if (!filter) {
+                state.rows = null;
+            } else {
+                // 소문자 고유값 목록은 처음 필터할 때 한 번만 만든다 (인덱스 열은 기존 필터처럼 제외)
+                if (!state.lowered) {
+                    state.lowered = state.values.map(values => values.map(value => String(value).toLowerCase()));
+                }
+                const hits = [];
+                for (let c = 1; c < state.lowered.length; c++) {
+                    const hit = new Uint8Array(state.lowered[c].length);
+                    state.lowered[c].forEach((value, code) => { if (value.includes(filter)) hit[code] = 1; });
+                    hits.push([state.codes[c] || Int32Array.from({length: state.rowCount}, (_, r) => r), hit]);
+                }
+                const matched = new Int32Array(state.rowCount);
+                let count = 0;
+                for (let r = 0; r < state.rowCount; r++) {
+                    for (let h = 0; h < hits.length; h++) {
+                        if (hits[h][1][hits[h][0][r]]) {
+                            matched[count++] = r;
+                            break;
+                        }
+                    }
+                }
+                state.rows = matched.subarray(0, count);
+            }
+            state.viewport.scrollTop = 0;
+            renderVirtualTable(state);
+        }
+
+        document.querySelectorAll('.virtual-table').forEach(initVirtualTable);
+    </script>
+"""
+
+REPORT_FOOTER = """
+        <div class="footer">
+            <p>이 보고서는 투데이즈, 아보다에서만 배포가 허락되며, 이를 무단 복제 및 배포하는 행위는 엄격히 금지합니다.</p>
+        </div>
+    </body>
+    </html>
+"""
+
+
+# 리포트를 조각(str) 단위로 만들어 내보내는 생성기
+# 전체 문서를 문자열 하나로 이어 붙이지 않으므로 전국 리포트도 메모리를 적게 쓴다
+# table_mode: "html"(모든 행을 <table>로), "virtual"(JSON으로 넣고 보이는 행만 그림), "auto"(행 수로 선택)
+def iter_html_report(figures, analysis, selected_data, chunk_rows=TABLE_CHUNK_ROWS, table_mode="auto"):
+    yield REPORT_HEAD
+
+    # 오른쪽 출력 순서에 맞춰 추가
+    for number, (title, df) in enumerate(analysis.report_tables(selected_data).items()):
+        yield f"<h2>{title}</h2>"
+        if table_mode == "virtual" or (table_mode == "auto" and len(df) > VIRTUAL_TABLE_MIN_ROWS):
+            table_id = f"vt-{number}"
+            yield f"""
+        <div class="filter">
+            <input type="text" oninput="filterVirtualTable(this, '{table_id}')" placeholder="필터 입력..." />
+        </div>
+        """
+            # 계측 구간에는 조각을 받아 쓰는 쪽(파일 쓰기)의 시간도 들어간다
+            with span("table", "report", title=title, rows=len(df), mode="virtual"):
+                yield from iter_virtual_table_html(df, table_id, chunk_rows)
+            continue
+        yield f"""
+        <div class="filter">
+            <input type="text" onkeyup="filterTable(this, '{title}')" placeholder="필터 입력..." />
+        </div>
+        <div class="table-container">
+            <div class="table" id="{title}">
+                """
+        with span("table", "report", title=title, rows=len(df), mode="html"):
+            yield from iter_table_html(df, chunk_rows)
+        yield """
+            </div>
+        </div>
+        """
+
+    # figures 값은 렌더링된 이미지 바이트(figures.render_figures 결과) 또는 matplotlib Figure
     for title, fig in figures.items():
+        yield f"<h2>{title}</h2>"
+        yield f'<div class="graph"><img src="data:{_image_mime(fig)};base64,'
+        with span("base64", "report", title=title):
+            yield from iter_figure_base64(fig)
+        yield '" /></div>'
+
+    # JavaScript 추가: 이미지 클릭 시 확대 표시 및 필터 기능
+    yield REPORT_SCRIPT
+    yield REPORT_FOOTER
+
+
+# 리포트를 파일 경로 또는 열린 텍스트 파일에 바로 쓰고 쓴 글자 수를 반환
+def write_html_report(file, figures, analysis, selected_data, chunk_rows=TABLE_CHUNK_ROWS, table_mode="auto"):
+    if isinstance(file, (str, bytes)) or hasattr(file, "__fspath__"):
+        with open(file, "w", encoding="utf-8") as f:
+            return write_html_report(f, figures, analysis, selected_data, chunk_rows, table_mode)
+
+    written = 0
+    with span("write", "report", table_mode=table_mode) as write_span:
+        for part in iter_html_report(figures, analysis, selected_data, chunk_rows, table_mode):
+            file.write(part)
+            written += len(part)
+        write_span.set(chars=written)
+    return written
+
+
+def generate_html_report(figures, analysis, selected_data, table_mode="auto"):
+    return "".join(iter_html_report(figures, analysis, selected_data, table_mode=table_mode))
+
+
+# DataFrame.to_html과 같은 모양의 표를 chunk_rows 행씩 나눠서 만든다
+# 머리글만 to_html로 만들고, 본문은 컬럼마다 고유값만 한 번씩 서식/이스케이프한 뒤 코드로 펼쳐
+# 행 조각을 배열 하나에 채우고 chunk마다 한 번에 잇는다 (행/칸마다 파이썬 함수를 부르지 않는다)
+# 계층 인덱스/컬럼 표는 to_html을 그대로 쓴다
+def iter_table_html(df, chunk_rows=TABLE_CHUNK_ROWS):
+    options = {"classes": "table", "border": 0, "escape": True}
+    if isinstance(df.index, pd.MultiIndex) or isinstance(df.columns, pd.MultiIndex):
+        yield df.to_html(**options)
+        return
+    header = df.head(0).to_html(**options)
+    yield header.split("<tbody>\n", 1)[0] + "<tbody>\n"
+
+    # 칸 하나 = 고유값 목록(이스케이프한 문자열)[코드]
+    cells = [_escaped_cells(*_format_column(df.index.to_series(index=None), df.index.name, index=True))]
+    cells += [_escaped_cells(*_format_column(df.iloc[:, number], name)) for number, name in enumerate(df.columns)]
+    # 한 행: <tr><th>인덱스</th><td>값</td>...</tr> (to_html과 같은 들여쓰기)
+    separators = ["    <tr>\n      <th>", "</th>\n      <td>"]
+    separators += ["</td>\n      <td>"] * (len(df.columns) - 1) + ["</td>\n    </tr>\n"]
+    if not len(df.columns):
+        separators = ["    <tr>\n      <th>", "</th>\n    </tr>\n"]
+    for start in range(0, len(df), chunk_rows):
+        stop = min(start + chunk_rows, len(df))
+        parts = np.empty((stop - start, 2 * len(cells) + 1), dtype=object)
+        parts[:, 0::2] = separators
+        for number, column in enumerate(cells):
+            parts[:, 2 * number + 1] = column[start:stop]
+        yield "".join(parts.ravel().tolist())
+    yield "  </tbody>\n</table>"
+
+
+def _escaped_cells(codes, values):
+    escaped = np.array([html.escape(value, quote=False) for value in values] + [""], dtype=object)
+    # 결측값(-1)은 빈 칸
+    return escaped[codes]
+
+
+# 가상 스크롤 표: 데이터는 열 단위 사전 인코딩(고유값 목록 + 행별 코드) JSON으로 한 번만 넣고,
+# 브라우저에서는 스크롤 위치에 보이는 행만 그린다
+def iter_virtual_table_html(df, table_id, chunk_rows=TABLE_CHUNK_ROWS):
+    header = df.head(0).to_html(classes="table", border=0, escape=True)
+    yield f'<div class="virtual-table" id="{table_id}"><div class="vt-viewport">'
+    yield header.split("<tbody>", 1)[0] + "<tbody></tbody>\n</table>"
+    yield '</div></div>\n'
+
+    yield f'<script type="application/json" id="{table_id}-data">'
+    yield f'{{"rows": {len(df)}, "columns": ['
+    columns = [("", df.index.to_series(index=None))] + [(str(name), df.iloc[:, number])
+                                                        for number, name in enumerate(df.columns)]
+    for number, (name, series) in enumerate(columns):
+        codes, values = _format_column(series, name, index=number == 0)
+        # 결측값(-1)은 빈 문자열로 표시
+        if (codes < 0).any():
+            codes = np.where(codes < 0, len(values), codes)
+            values.append("")
+        yield "," if number else ""
+        # 고유값이 행마다 하나씩이면(인덱스 등) 코드를 넣지 않고 행 번호를 그대로 쓴다
+        if len(values) == len(codes) and np.array_equal(codes, np.arange(len(codes))):
+            yield _script_json({"name": name, "values": values, "codes": None})
+            continue
+        yield _script_json({"name": name, "values": values})[:-1] + ', "codes": ['
+        for start in range(0, len(codes), chunk_rows):
+            yield "," if start else ""
+            yield ",".join(map(str, codes[start:start + chunk_rows].tolist()))
+        yield "]}"
+    yield "]}</script>\n"
+
+
+# 컬럼 하나 → (행별 코드, 고유값 표시 문자열 목록), 결측값은 코드 -1
+# - 숫자: 천 단위 구분 기호 (PLAIN_NUMBER_COLUMNS 제외), 실수는 컬럼 전체에 같은 소수 자릿수
+#   (float32 값은 float64로 바뀌면 84.97000122처럼 보이므로 원래 정밀도로 자릿수를 고른다)
+# - 날짜: 시각이 모두 자정이면 YYYY-MM-DD
+# - categorical: 카테고리마다 한 번만 서식을 적용하고 코드를 그대로 쓴다
+# 정수 인덱스는 고유값을 찾지 않고 배열을 한 번에 문자열로 바꾼다 (to_html처럼 구분 기호 없이)
+def _format_column(series, name=None, index=False):
+    if index and series.dtype.kind in "iu":
+        return np.arange(len(series)), series.to_numpy().astype(str).tolist()
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        uniques = series.cat.categories
+    else:
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    codes = np.asarray(codes, dtype=np.intp)
+    dtype = getattr(uniques, "dtype", None)
+    plain = name in PLAIN_NUMBER_COLUMNS
+    if dtype is not None and dtype.kind == "M":
+        dates = pd.DatetimeIndex(uniques)
+        if (dates == dates.normalize()).all():
+            return codes, list(np.datetime_as_string(dates.to_numpy(dtype="datetime64[ns]"), unit="D"))
+        return codes, [str(value) for value in dates]
+    if dtype is not None and dtype.kind == "f":
+        precision = series.dtype if series.dtype.kind == "f" else dtype
+        values = np.asarray(uniques, dtype=np.float64)
+        decimals = _float_decimals(values, precision)
+        return codes, [format(value, f"{'' if plain else ','}.{decimals}f") for value in values.tolist()]
+    if dtype is not None and (dtype.kind in "iu" or pd.api.types.is_integer_dtype(dtype)) and dtype.kind != "b":
+        return codes, [str(value) if plain else f"{value:,}" for value in np.asarray(uniques, dtype=np.int64).tolist()]
+    return codes, [_format_value(value) for value in uniques]
+
+
+def _format_value(value):
+    if isinstance(value, pd.Timestamp):
+        return str(value.date()) if value == value.normalize() else str(value)
+    return str(value)
+
+
+# 모든 값을 원래 정밀도(float32/float64)로 되돌릴 수 있는 가장 짧은 소수 자릿수
+def _float_decimals(values, precision):
+    finite = values[np.isfinite(values)]
+    original = finite.astype(precision)
+    for decimals in range(MAX_DECIMALS):
+        if np.array_equal(np.round(finite, decimals).astype(precision), original):
+            return decimals
+    return MAX_DECIMALS
+
+
+# <script> 안에 넣을 JSON ("</script>"가 들어가도 태그가 끝나지 않도록 처리)
+def _script_json(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+
+
+def iter_figure_base64(fig, chunk_bytes=IMAGE_CHUNK_BYTES):
+    if isinstance(fig, (bytes, bytearray, memoryview)):
+        data = memoryview(fig)
+    else:
         img = BytesIO()
         fig.savefig(img, format='png')
-        img.seek(0)
-        img_base64 = base64.b64encode(img.getvalue()).decode()
-        html_content += f"<h2>{title}</h2>"
-        html_content += f'<img src="data:image/png;base64,{img_base64}" />'
-    
-    for title, df in dataframes.items():
-        html_content += f"<h2>{title}</h2>"
-        html_content += df.to_html(index=False, border=0)  # border를 0으로 설정하여 테두리 제거
-    
-    html_content += """
-        </body>
-    </html>
-    """
-    return html_content
+        data = img.getbuffer()
+    for start in range(0, len(data), chunk_bytes):
+        yield base64.b64encode(data[start:start + chunk_bytes]).decode()
+
 
-def get_download_link(html_content, filename="report.html"):
-    b64 = base64.b64encode(html_content.encode()).decode()
-    return f'<a href="data:text/html;base64,{b64}" download="{filename}">다운로드 HTML 리포트</a>'
+def _image_mime(fig):
+    if isinstance(fig, (bytes, bytearray, memoryview)) and bytes(fig[:64]).lstrip().startswith((b"<?xml", b"<svg")):
+        return "image/svg+xml"
+    return "image/png"
@@ -0,0 +1,432 @@
+import os
+import random
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse, urlunparse
+
+import pandas as pd
+import PublicDataReader as pdr
+import requests
+import xmltodict
+from xml.parsers.expat import ExpatError
+
+from fetcher import month_range
+from instrument import span
+
+# 요청 시간 제한(초)과 재시도/차단기 설정 (환경 변수로 조정 가능)
+DEFAULT_CONNECT_TIMEOUT = float(os.environ.get("FETCH_CONNECT_TIMEOUT", "5"))
+DEFAULT_READ_TIMEOUT = float(os.environ.get("FETCH_READ_TIMEOUT", "30"))
+DEFAULT_MAX_ATTEMPTS = int(os.environ.get("FETCH_MAX_ATTEMPTS", "5"))
+DEFAULT_BACKOFF_BASE = float(os.environ.get("FETCH_BACKOFF_BASE", "0.5"))
+DEFAULT_BACKOFF_MAX = float(os.environ.get("FETCH_BACKOFF_MAX", "30"))
+DEFAULT_FAILURE_THRESHOLD = int(os.environ.get("FETCH_BREAKER_THRESHOLD", "5"))
+DEFAULT_RESET_TIMEOUT = float(os.environ.get("FETCH_BREAKER_RESET", "10"))
+DEFAULT_MAX_RESET_TIMEOUT = float(os.environ.get("FETCH_BREAKER_MAX_RESET", "120"))
+# 일일 한도 소진 후 요청을 다시 보내 보기까지 기다리는 최대 시간(초)
+# (한도는 한국 시간 자정에 초기화되므로 그 전이라도 이 시간이 지나면 한 번 다시 보내 본다)
+DEFAULT_QUOTA_COOLDOWN = float(os.environ.get("FETCH_QUOTA_COOLDOWN", str(60 * 60)))
+# 다른 서버로 요청을 보낼 때 (예: fake_api.py로 띄운 가짜 서버 http://127.0.0.1:8080)
+DEFAULT_BASE_URL = os.environ.get("MOLIT_API_BASE_URL")
+DEFAULT_CHECKPOINT_DIR = os.environ.get("FETCH_CHECKPOINT_DIR", os.path.join(".cache", "checkpoints"))
+# 이보다 오래된 checkpoint는 최근 월 데이터가 바뀌었을 수 있으므로 쓰지 않는다
+DEFAULT_CHECKPOINT_MAX_AGE = float(os.environ.get("FETCH_CHECKPOINT_MAX_AGE", str(6 * 60 * 60)))
+
+# 공공데이터포털 오류 코드
+# 22: 서비스 요청 제한 횟수 초과 (일일 트래픽 소진 - 다시 시도해도 소용없음)
+# 01/02/04/05: 어플리케이션/DB/HTTP 오류, 서비스 연결 실패 (잠시 후 다시 시도)
+# 03: 데이터 없음
+QUOTA_CODES = {"22"}
+TRANSIENT_CODES = {"01", "02", "04", "05"}
+NO_DATA_CODES = {"03"}
+OK_CODES = {"00", "000"}
+# 일일 한도가 초기화되는 시간대
+QUOTA_TIMEZONE = timezone(timedelta(hours=9))
+
+
+class FetchError(Exception):
+    pass
+
+
+# 잠시 후 다시 시도하면 성공할 수 있는 오류 (시간 초과, 연결 실패, 5xx, 깨진 응답)
+class TransientFetchError(FetchError):
+    pass
+
+
+# 초당 요청 제한(HTTP 429) - Retry-After 동안 모든 요청을 멈췄다가 다시 시도
+class RateLimitedError(TransientFetchError):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# 일일 요청 한도 소진 - 다시 시도하지 않고 같은 API를 쓰는 모든 요청을 바로 실패시킨다
+class QuotaExceededError(FetchError):
+    pass
+
+
+# 잘못된 키/파라미터 등 다시 시도해도 실패하는 오류
+class PermanentFetchError(FetchError):
+    pass
+
+
+# 지수 백오프 + full jitter: attempt번째 재시도 전 0 ~ min(max_delay, base_delay * 2^attempt)초 대기
+class RetryPolicy:
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BACKOFF_BASE,
+                 max_delay=DEFAULT_BACKOFF_MAX, rng=None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rng = rng or random.Random()
+
+    def delay(self, attempt):
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+# 연속 실패가 failure_threshold번 쌓이면 열려서(open) reset_timeout 동안 모든 요청을 멈춘다
+# 시간이 지나면 요청 하나만 먼저 보내 보고(half-open) 성공하면 닫고, 실패하면 대기 시간을 두 배로 늘려 다시 연다
+# 일일 한도 소진은 한국 시간 다음 자정과 quota_cooldown초 뒤 중 이른 때까지 모든 요청을 바로 실패시킨다
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT,
+                 max_reset_timeout=DEFAULT_MAX_RESET_TIMEOUT, quota_cooldown=DEFAULT_QUOTA_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.quota_cooldown = quota_cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0.0
+        self.probe_started = None
+        self.fatal_error = None
+        self.fatal_until = 0.0
+        self.condition = threading.Condition()
+        # 열린 횟수와 요청이 멈춰 있던 시간 합계
+        self.opened_count = 0
+        self.paused_seconds = 0.0
+
+    # 요청을 보내도 될 때까지 기다린다 (한도 소진 후에는 초기화될 때까지 바로 예외)
+    def acquire(self):
+        started = time.monotonic()
+        with self.condition:
+            try:
+                while True:
+                    if self.fatal_error is not None:
+                        if time.time() < self.fatal_until:
+                            raise self.fatal_error
+                        self.fatal_error = None
+                    now = time.monotonic()
+                    if self.state == self.OPEN:
+                        if now < self.open_until:
+                            self.condition.wait(self.open_until - now)
+                            continue
+                        self.state = self.HALF_OPEN
+                        self.probe_started = None
+                    if self.state == self.HALF_OPEN:
+                        # 먼저 보낸 요청의 결과를 기다린다 (결과를 알리지 못한 요청이 있으면 다시 시도)
+                        if self.probe_started is not None and now - self.probe_started < self.reset_timeout:
+                            self.condition.wait(self.reset_timeout)
+                            continue
+                        self.probe_started = now
+                    return
+            finally:
+                self.paused_seconds += time.monotonic() - started
+
+    def record_success(self):
+        with self.condition:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.trips = 0
+            self.probe_started = None
+            self.condition.notify_all()
+
+    def record_failure(self):
+        with self.condition:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.trips += 1
+                self._open(min(self.max_reset_timeout, self.reset_timeout * 2 ** (self.trips - 1)))
+            self.condition.notify_all()
+
+    # 실패로 세지 않고 seconds 동안 모든 요청을 멈춘다 (429 Retry-After)
+    def pause(self, seconds):
+        with self.condition:
+            self._open(seconds)
+            self.condition.notify_all()
+
+    # 한도가 초기화될 때까지 모든 요청을 error로 바로 실패시킨다 (일일 한도 소진)
+    def fail(self, error):
+        with self.condition:
+            now = time.time()
+            self.fatal_error = error
+            self.fatal_until = min(next_quota_reset(now), now + self.quota_cooldown)
+            self.condition.notify_all()
+
+    def _open(self, seconds):
+        if self.state != self.OPEN:
+            self.opened_count += 1
+        self.state = self.OPEN
+        self.open_until = max(self.open_until, time.monotonic() + seconds)
+        self.probe_started = None
+
+
+# now(epoch 초) 이후 처음 오는 한국 시간 자정 (epoch 초)
+def next_quota_reset(now):
+    today = datetime.fromtimestamp(now, QUOTA_TIMEZONE).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (today + timedelta(days=1)).timestamp()
+
+
+# 호스트별 CircuitBreaker 공유 (같은 API 서버로 가는 모든 스레드가 같이 멈춘다)
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(host):
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker()
+            _breakers[host] = breaker
+        return breaker
+
+
+# pdr.TransactionPrice와 같은 결과를 반환하되 HTTP 요청을 직접 보내는 조회 객체
+# - 요청마다 시간 제한, 일시적 오류는 지수 백오프로 재시도
+# - 429는 Retry-After 동안 호스트 전체를 멈추고, 일일 한도 소진은 재시도 없이 모든 요청을 실패시킨다
+# - 연속 실패가 쌓이면 CircuitBreaker가 같은 호스트로 가는 모든 스레드를 잠시 멈춘다
+# 원본 get_data는 오류 응답을 빈 DataFrame으로 돌려주므로(캐시에 빈 월이 저장됨) 대신 사용한다
+# base_url(MOLIT_API_BASE_URL)을 주면 같은 경로로 다른 서버에 요청한다 (가짜 API 서버 테스트용)
+class ResilientTransactionPrice(pdr.TransactionPrice):
+    # 오류는 모두 예외로 알린다 (빈 결과는 실제로 거래가 없는 달, CachedTransactionPrice가 저장한다)
+    raises_on_error = True
+
+    def __init__(self, service_key=None, timeout=None, retry=None, breaker=None, base_url=DEFAULT_BASE_URL):
+        super().__init__(service_key)
+        self.timeout = timeout or (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT)
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker
+        if base_url:
+            base = urlparse(base_url)
+            for trade_types in self.meta_dict.values():
+                for meta in trade_types.values():
+                    meta["url"] = urlunparse(urlparse(meta["url"])._replace(scheme=base.scheme, netloc=base.netloc))
+        self.local = threading.local()
+        self.stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "timeouts": 0, "rate_limited": 0, "failures": 0}
+
+    def get_data(self, property_type, trade_type, sigungu_code, year_month=None,
+                 start_year_month=None, end_year_month=None, translate=True, verbose=False, **kwargs):
+        try:
+            url = self.meta_dict.get(property_type).get(trade_type).get("url")
+            columns = self.meta_dict.get(property_type).get(trade_type).get("columns")
+        except AttributeError:
+            raise AttributeError("부동산 이름과 거래 유형을 확인해주세요.")
+
+        if start_year_month and end_year_month:
+            months = month_range(start_year_month, end_year_month)
+        else:
+            months = [str(year_month)]
+
+        params = {
+            "serviceKey": requests.utils.unquote(self.service_key or ""),
+            "numOfRows": "99999",
+            "LAWD_CD": sigungu_code,
+        }
+        params.update(kwargs)
+
+        items = []
+        for month in months:
+            if verbose:
+                print(month)
+            items.extend(self._request(url, dict(params, DEAL_YMD=month)))
+
+        df = self._to_frame(items, columns)
+        if translate:
+            df = self.translate_columns(df)
+        return df
+
+    def _request(self, url, params):
+        breaker = self.breaker or get_circuit_breaker(urlparse(url).netloc or "default")
+        error = None
+        for attempt in range(self.retry.max_attempts):
+            if attempt:
+                self._count("retries")
+            breaker.acquire()
+            try:
+                items = self._request_once(url, params)
+            except RateLimitedError as e:
+                # 다음 acquire에서 Retry-After만큼 기다린다
+                self._count("rate_limited")
+                breaker.pause(e.retry_after if e.retry_after is not None else self.retry.delay(attempt))
+                error = e
+                continue
+            except TransientFetchError as e:
+                self._count("failures")
+                breaker.record_failure()
+                error = e
+                if attempt + 1 < self.retry.max_attempts:
+                    time.sleep(self.retry.delay(attempt))
+                continue
+            except QuotaExceededError as e:
+                breaker.fail(e)
+                raise
+            except PermanentFetchError:
+                # 서버는 정상적으로 응답했으므로 차단기에는 성공으로 알린다
+                breaker.record_success()
+                raise
+            except Exception:
+                breaker.record_failure()
+                raise
+            breaker.record_success()
+            return items
+        raise error
+
+    def _request_once(self, url, params):
+        self._count("requests")
+        description = f"{params.get('LAWD_CD')} {params.get('DEAL_YMD')}"
+        try:
+            with span("request", "http", code=params.get("LAWD_CD"), month=params.get("DEAL_YMD")) as request_span:
+                res = self._session().get(url, params=params, timeout=self.timeout)
+                request_span.set(status=res.status_code, bytes=len(res.content))
+        except requests.Timeout as e:
+            self._count("timeouts")
+            raise TransientFetchError(f"{description}: 시간 초과 ({e})") from e
+        except requests.RequestException as e:
+            raise TransientFetchError(f"{description}: 연결 실패 ({e})") from e
+
+        if res.status_code == 429:
+            raise RateLimitedError(f"{description}: 요청 제한 (HTTP 429)", _retry_after(res))
+        if res.status_code >= 500 or res.status_code == 408:
+            raise TransientFetchError(f"{description}: HTTP {res.status_code}")
+        if res.status_code != 200:
+            raise PermanentFetchError(f"{description}: HTTP {res.status_code}")
+        return parse_items(res.text, description)
+
+    # 스레드마다 Session 하나 (연결 재사용)
+    def _session(self):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = requests.Session()
+            self.local.session = session
+        return session
+
+    def _count(self, name):
+        with self.stats_lock:
+            self.stats[name] += 1
+
+    # pdr.TransactionPrice.get_data와 같은 컬럼 순서/타입으로 변환
+    def _to_frame(self, items, columns):
+        df = pd.DataFrame(items)
+        df = df.reindex(columns=list(columns) + [column for column in df.columns if column not in columns])
+        df = df.astype(str)
+        # integer_columns에는 같은 컬럼이 두 번 들어 있는 경우가 있다 (전월세의 monthlyRent)
+        for column in dict.fromkeys(self.integer_columns):
+            if column in df.columns:
+                values = df[column]
+                if values.dtype == object or pd.api.types.is_string_dtype(values):
+                    values = values.str.strip().str.replace(",", "", regex=False)
+                df[column] = pd.to_numeric(values, errors="coerce").astype("Int64")
+        for column in self.float_columns:
+            if column in df.columns:
+                df[column] = pd.to_numeric(df[column], errors="coerce")
+        return df
+
+
+# 응답 XML에서 item 목록을 꺼내고 오류 코드를 종류별 예외로 바꾼다
+def parse_items(text, description=""):
+    try:
+        document = xmltodict.parse(text)
+    except ExpatError as e:
+        raise TransientFetchError(f"{description}: 응답을 해석할 수 없습니다 ({e})") from e
+
+    if "OpenAPI_ServiceResponse" in document:
+        header = document["OpenAPI_ServiceResponse"].get("cmmMsgHeader") or {}
+        code = str(header.get("returnReasonCode", "")).strip()
+        message = f"{description}: {header.get('returnAuthMsg') or header.get('errMsg')} (code {code})"
+        _raise_for_code(code, message)
+
+    try:
+        response = document["response"]
+        code = str(response["header"]["resultCode"]).strip()
+        message = f"{description}: {response['header'].get('resultMsg')} (code {code})"
+    except (KeyError, TypeError) as e:
+        raise TransientFetchError(f"{description}: 알 수 없는 응답 형식") from e
+    if code in NO_DATA_CODES:
+        return []
+    if code not in OK_CODES:
+        _raise_for_code(code, message)
+
+    items = (response.get("body") or {}).get("items")
+    if not items:
+        return []
+    item = items.get("item")
+    if item is None:
+        return []
+    return item if isinstance(item, list) else [item]
+
+
+def _raise_for_code(code, message):
+    if code in QUOTA_CODES:
+        raise QuotaExceededError(message)
+    if code in TRANSIENT_CODES:
+        raise TransientFetchError(message)
+    raise PermanentFetchError(message)
+
+
+def _retry_after(res):
+    try:
+        return max(0.0, float(res.headers.get("Retry-After")))
+    except (TypeError, ValueError):
+        return None
+
+
+# 조회가 끝난 시군구를 파일로 남겨 두었다가 다시 실행하면 남은 시군구만 조회한다
+# 같은 (지역, 부동산 유형, 거래 유형, 기간) 조회가 끝까지 성공하면 clear()로 지운다
+class FetchCheckpoint:
+    def __init__(self, checkpoint_dir, max_age=DEFAULT_CHECKPOINT_MAX_AGE):
+        self.checkpoint_dir = checkpoint_dir
+        self.max_age = max_age
+
+    @classmethod
+    def for_run(cls, region, property_type, trade_type, start_year_month, end_year_month,
+                root=DEFAULT_CHECKPOINT_DIR):
+        return cls(os.path.join(root, property_type, trade_type, region, f"{start_year_month}_{end_year_month}"))
+
+    def _path(self, sigungu_code):
+        return os.path.join(self.checkpoint_dir, f"{sigungu_code}.parquet")
+
+    def completed(self):
+        try:
+            names = os.listdir(self.checkpoint_dir)
+        except OSError:
+            return set()
+        return {name[:-len(".parquet")] for name in names if name.endswith(".parquet")}
+
+    def load(self, sigungu_code):
+        path = self._path(sigungu_code)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                return None
+            return pd.read_parquet(path)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, sigungu_code, df):
+        path = self._path(sigungu_code)
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+        except (OSError, ValueError, ImportError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def clear(self):
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from cache import is_recent_month
+
+# 프로세스 전체에서 공유하는 조회 결과 캐시 크기와 최근 월이 들어간 결과의 유효 시간 (환경 변수로 조정 가능)
+DEFAULT_RESULT_CACHE_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", str(1024 ** 3)))
+DEFAULT_RESULT_RECENT_TTL = float(os.environ.get("RESULT_CACHE_RECENT_TTL", str(30 * 60)))
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+# 같은 조회인지 판단하는 키 (입력값의 공백/숫자 표기 차이를 없앤다)
+# property_type/trade_type은 이름 하나 또는 목록 (목록은 순서와 상관없이 같은 키)
+def normalize_query(si_do_name, start_year_month, end_year_month, property_type="아파트", trade_type="매매"):
+    return (
+        str(si_do_name).strip(),
+        str(start_year_month).strip(),
+        str(end_year_month).strip(),
+        _normalize_names(property_type),
+        _normalize_names(trade_type),
+    )
+
+
+def _normalize_names(value):
+    if isinstance(value, str):
+        return value.strip()
+    return ",".join(sorted({str(name).strip() for name in value}))
+
+
+class _Entry:
+    def __init__(self, value, size, expires_at):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+
+
+class _Pending:
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+        self.completed = False
+
+
+# 조회 결과(타입 정리된 DataFrame, 분석 결과, 그래프)를 조회 키별로 보관하는 LRU 캐시
+# - 전체 크기(sizeof로 계산)가 max_bytes를 넘으면 가장 오래 쓰지 않은 결과부터 버린다
+# - 같은 키를 여러 세션이 동시에 요청하면 처음 요청한 스레드만 계산하고 나머지는 그 결과를 기다린다
+# - 최근 월(이번 달/지난 달)이 들어간 결과는 recent_ttl이 지나면 다시 계산한다
+# 반환한 값은 여러 세션이 같이 쓰므로 호출한 쪽에서 수정하면 안 된다
+class QueryResultCache:
+    def __init__(self, max_bytes=DEFAULT_RESULT_CACHE_BYTES, recent_ttl=DEFAULT_RESULT_RECENT_TTL, sizeof=None):
+        self.max_bytes = max_bytes
+        self.recent_ttl = recent_ttl
+        self.sizeof = sizeof or (lambda value: int(getattr(value, "nbytes", 0)))
+        self.entries = OrderedDict()
+        self.pending = {}
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    # (값, 상태) 반환. 상태는 "hit"(캐시), "coalesced"(진행 중인 같은 조회를 기다림), "miss"(직접 계산)
+    # refresh=True이면 저장된 값을 쓰지 않고 다시 계산한다 (진행 중인 같은 조회는 기다린다)
+    def get_or_compute(self, key, compute, refresh=False):
+        while True:
+            owner = False
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None and (refresh or entry.expires_at < time.monotonic()):
+                    self._remove(key)
+                    entry = None
+                if entry is not None:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry.value, "hit"
+                pending = self.pending.get(key)
+                if pending is not None:
+                    self.coalesced += 1
+                else:
+                    pending = _Pending()
+                    self.pending[key] = pending
+                    self.misses += 1
+                    owner = True
+
+            if owner:
+                return self._compute(key, compute, pending), "miss"
+
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            if pending.completed:
+                return pending.value, "coalesced"
+            # 계산하던 세션이 중단된 경우(Streamlit 재실행 등) 기다리던 쪽에서 다시 시도한다
+            refresh = False
+
+    # 저장된 값 (없거나 만료되었으면 None, 적중/새로 조회 횟수에는 넣지 않는다)
+    def peek(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.expires_at < time.monotonic():
+                return None
+            self.entries.move_to_end(key)
+            return entry.value
+
+    def _compute(self, key, compute, pending):
+        try:
+            value = compute()
+            pending.value = value
+            pending.completed = True
+            self._store(key, value)
+            return value
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            # 저장한 뒤에 pending을 지우므로 그사이에 들어온 요청도 같은 결과를 받는다
+            with self.lock:
+                self.pending.pop(key, None)
+            pending.event.set()
+
+    def _store(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        expires_at = float("inf")
+        if _is_recent_query(key):
+            expires_at = time.monotonic() + self.recent_ttl
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = _Entry(value, size, expires_at)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.total_bytes -= entry.size
+
+    def invalidate(self, key=None):
+        with self.lock:
+            if key is None:
+                self.entries.clear()
+                self.total_bytes = 0
+            elif key in self.entries:
+                self._remove(key)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# 종료 년월이 이번 달/지난 달이면 늦은 신고로 결과가 바뀔 수 있다
+def _is_recent_query(key):
+    try:
+        return is_recent_month(key[2])
+    except (IndexError, ValueError):
+        return False
+
+
+# 프로세스 하나에 캐시 하나 (Streamlit 세션들이 같이 사용)
+def get_result_cache():
+    global _cache
+    if _cache is not None:
+        return _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = QueryResultCache()
+    return _cache
@@ -0,0 +1,211 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from aggregate import AREA_LABELS, area_codes, build_analysis
+from district import DistrictConverter
+
+# 데이터셋 파티션마다 옆에 두는 (시군구, 월, 면적 범위, 거래유형) 거래량 파일
+# {root}/_rollup/property_type=아파트/trade_type=매매/si_do_code=11/dealYear=2024/rollup-v1.parquet
+ROLLUP_DIR_NAME = "_rollup"
+# 거래량 파일을 만드는 방식이 바뀌면 올린다 (파일 이름이 바뀌므로 다음에 읽을 때 다시 만든다)
+ROLLUP_VERSION = 1
+ROLLUP_FILE_NAME = f"rollup-v{ROLLUP_VERSION}.parquet"
+# 면적범위 -1: 전용면적 결측 (분석에서는 뺀다)
+ROLLUP_COLUMNS = ["시군구코드", "시군구", "거래년월", "면적범위", "거래유형", "거래량"]
+# 읽을 때 디렉터리 이름에서 붙이는 컬럼과 메모리에서 categorical로 두는 컬럼
+_PARTITION_COLUMNS = ["부동산유형", "거래구분", "시도코드"]
+_LABEL_COLUMNS = ["시군구코드", "시군구", "거래유형"] + _PARTITION_COLUMNS
+# 읽은 거래량 파일을 프로세스 안에 남겨 두는 개수 (파일이 바뀌면 다시 읽는다)
+ROLLUP_MEMORY_FILES = int(os.environ.get("ROLLUP_MEMORY_FILES", "4096"))
+
+# 파일 경로 → (파일 상태, DataFrame), 마지막으로 합친 파일 목록과 결과
+_memory = {}
+_combined = [None, None]
+_memory_lock = threading.Lock()
+
+
+# 데이터 파일 경로 → 같은 파티션의 거래량 파일 경로
+def rollup_path(root, data_path):
+    partition = os.path.relpath(os.path.dirname(data_path), root)
+    return os.path.join(root, ROLLUP_DIR_NAME, partition, ROLLUP_FILE_NAME)
+
+
+# 파티션 하나(같은 시도)의 거래 행 → 칸별 거래량 (행이 없는 칸은 없다)
+# frame: 시도, 시군구, 거래일자, 전용면적, 거래유형 컬럼 (거래일자가 없는 행은 데이터셋에 저장되지 않는다)
+def compute_rollup(frame):
+    if frame.empty:
+        return _empty_rollup()[ROLLUP_COLUMNS]
+    dates = frame["거래일자"].to_numpy(dtype="datetime64[ns]")
+    months = dates.astype("datetime64[M]").astype(np.int64)
+    cells = pd.DataFrame({
+        "시도": frame["시도"].astype("object").to_numpy(),
+        "시군구": frame["시군구"].astype("object").to_numpy(),
+        "거래년월": (1970 + months // 12) * 100 + months % 12 + 1,
+        "면적범위": area_codes(frame["전용면적"]),
+        "거래유형": frame["거래유형"].astype("object").to_numpy(),
+    })
+    rollup = cells.groupby(list(cells.columns), dropna=False, sort=True).size().rename("거래량").reset_index()
+    converter = DistrictConverter()
+    rollup.insert(0, "시군구코드", [converter.get_sigungu_code(str(si_do), str(sigungu))
+                                for si_do, sigungu in zip(rollup["시도"], rollup["시군구"])])
+    return rollup[ROLLUP_COLUMNS].astype({"거래년월": np.int32, "면적범위": np.int8, "거래량": np.int64})
+
+
+# 데이터 파일(Arrow 테이블)을 쓴 뒤 같은 파티션의 거래량 파일을 다시 만든다 (테이블이 비었으면 지운다)
+def write_rollup(root, data_path, table):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = rollup_path(root, data_path)
+    if table is None or table.num_rows == 0:
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+    frame = table.select(["시도", "시군구", "거래일자", "전용면적", "거래유형"]).to_pandas()
+    rollup = pa.Table.from_pandas(compute_rollup(frame), preserve_index=False)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = os.path.join(os.path.dirname(path), f".{ROLLUP_FILE_NAME}.{os.getpid()}.{threading.get_ident()}.tmp")
+    pq.write_table(rollup, tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+# 거래량 파일이 없거나 데이터 파일보다 오래된 파티션을 데이터 파일에서 다시 만들고 만든 파일 수를 반환
+# (이 기능 전에 저장한 데이터, 버전이 바뀐 경우, 다른 프로세스가 바꾼 데이터)
+# lock: 데이터 파일을 쓰는 쪽과 같이 쓰는 잠금 (다시 만들 파티션이 있을 때만 잡는다)
+def refresh_rollups(root, data_paths, lock=None):
+    import pyarrow.parquet as pq
+
+    stale = [data_path for data_path in data_paths if not _is_fresh(rollup_path(root, data_path), data_path)]
+    if not stale:
+        return 0
+    refreshed = 0
+    with lock or threading.Lock():
+        for data_path in stale:
+            if _is_fresh(rollup_path(root, data_path), data_path) or not os.path.exists(data_path):
+                continue
+            table = pq.read_table(data_path, columns=["시도", "시군구", "거래일자", "전용면적", "거래유형"],
+                                  memory_map=True)
+            write_rollup(root, data_path, table)
+            refreshed += 1
+    return refreshed
+
+
+def _is_fresh(path, data_path):
+    try:
+        return os.stat(path).st_mtime_ns >= os.stat(data_path).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+# 거래량 파일 여러 개를 하나의 DataFrame으로 (같은 파일은 바뀌지 않았으면 메모리에서)
+# 파일마다 부동산유형/거래구분/시도코드 컬럼을 붙인다 (디렉터리 이름에서)
+# 문자열 컬럼은 이름순 카테고리의 categorical로 합친다 (거래량 배열을 만들 때 코드를 그대로 쓴다)
+# 반환한 DataFrame은 여러 세션이 같이 쓰므로 호출한 쪽에서 수정하면 안 된다
+def load_rollups(paths):
+    signatures = tuple((path, _signature(path)) for path in paths)
+    with _memory_lock:
+        if _combined[0] == signatures:
+            return _combined[1]
+    frames = [_load_rollup(path, signature) for path, signature in signatures if signature is not None]
+    if not frames:
+        return _empty_rollup()
+    columns = {}
+    for column in frames[0].columns:
+        if column in _LABEL_COLUMNS:
+            columns[column] = pd.api.types.union_categoricals(
+                [frame[column] for frame in frames], sort_categories=True, ignore_order=True)
+        else:
+            columns[column] = np.concatenate([frame[column].to_numpy() for frame in frames])
+    combined = pd.DataFrame(columns)
+    with _memory_lock:
+        _combined[:] = [signatures, combined]
+    return combined
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _load_rollup(path, signature):
+    import pyarrow.parquet as pq
+
+    with _memory_lock:
+        cached = _memory.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    frame = pq.read_table(path, read_dictionary=["시군구코드", "시군구", "거래유형"]).to_pandas()
+    partition = dict(part.split("=", 1) for part in os.path.dirname(path).split(os.sep) if "=" in part)
+    codes = np.zeros(len(frame), dtype=np.int8)
+    for column, key in zip(_PARTITION_COLUMNS, ("property_type", "trade_type", "si_do_code")):
+        frame[column] = pd.Categorical.from_codes(codes, categories=[partition.get(key)])
+    with _memory_lock:
+        if len(_memory) >= ROLLUP_MEMORY_FILES:
+            _memory.pop(next(iter(_memory)))
+        _memory[path] = (signature, frame)
+    return frame
+
+
+def _empty_rollup():
+    frame = pd.DataFrame({column: pd.Series(dtype="category") for column in ROLLUP_COLUMNS + _PARTITION_COLUMNS})
+    return frame.astype({"거래년월": np.int32, "면적범위": np.int8, "거래량": np.int64})
+
+
+# 거래량 파일 → compute_analysis와 같은 (월, 시군구, 면적 범위, 거래유형) 거래량 배열
+# 전용면적이 없는 거래는 뺀다 (TransactionDataset.analyze와 같다), 시군구 축은 이름순 시군구명
+def rollup_cube(rollup, start_year_month=None, end_year_month=None, sigungu_names=None):
+    year_months = rollup["거래년월"].to_numpy(dtype=np.int64)
+    keep = rollup["면적범위"].to_numpy() >= 0
+    if start_year_month:
+        keep &= year_months >= int(str(start_year_month)[:6])
+    if end_year_month:
+        keep &= year_months <= int(str(end_year_month)[:6])
+    if sigungu_names is not None:
+        keep &= rollup["시군구"].isin(list(sigungu_names)).to_numpy()
+
+    month_keys = (year_months[keep] // 100) * 12 + year_months[keep] % 100 - 1
+    months = []
+    month_codes = np.zeros(len(month_keys), dtype=np.int64)
+    if len(month_keys):
+        first, last = int(month_keys.min()), int(month_keys.max())
+        months = [(value // 12, value % 12 + 1) for value in range(first, last + 1)]
+        month_codes = month_keys - first
+    sigungu_codes, sigungu_names = _label_codes(rollup["시군구"], keep)
+    type_codes, type_names = _label_codes(rollup["거래유형"], keep)
+
+    shape = (len(months) + 1, len(sigungu_names) + 1, len(AREA_LABELS) + 1, len(type_names) + 1)
+    flat = np.ravel_multi_index(
+        (month_codes, sigungu_codes, rollup["면적범위"].to_numpy(dtype=np.int64)[keep], type_codes), shape)
+    counts = np.bincount(flat, weights=rollup["거래량"].to_numpy(dtype=np.int64)[keep],
+                         minlength=int(np.prod(shape))).astype(np.int64).reshape(shape)
+    return {"counts": counts, "months": months, "sigungu": sigungu_names, "area": AREA_LABELS, "types": type_names}
+
+
+# 남길 행의 라벨 → 이름순 위치 (남은 행에 있는 라벨만, 결측은 마지막 칸)
+def _label_codes(values, keep):
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype("category")
+    categories = values.cat.categories
+    order = np.argsort(categories.astype(str).to_numpy(), kind="stable")
+    codes = values.cat.codes.to_numpy()[keep]
+    used = np.zeros(len(categories) + 1, dtype=bool)
+    used[codes] = True
+    used = used[:-1][order]
+    # 카테고리 코드 → 이름순으로 남은 라벨 안의 위치 (결측 -1은 마지막 칸)
+    positions = np.full(len(categories) + 1, used.sum(), dtype=np.int64)
+    positions[order[used]] = np.arange(used.sum())
+    return positions[codes], [str(label) for label in categories[order[used]]]
+
+
+# 거래량 파일만으로 만든 분석 결과 (거래 행을 읽지 않으므로 법정동별 최다 거래 아파트 표는 비어 있다)
+def analyze_rollups(rollup, start_year_month=None, end_year_month=None, sigungu_names=None):
+    top_apartments = pd.DataFrame({'법정동': [], '아파트': [], '거래량': []})
+    return build_analysis(rollup_cube(rollup, start_year_month, end_year_month, sigungu_names), top_apartments)
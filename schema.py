@@ -0,0 +1,102 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+# 모든 부동산 유형/거래 유형이 같이 쓰는 공통 컬럼 (select_columns 결과의 컬럼 순서)
+# - 아파트: 아파트 이름 컬럼에 단지/건물 이름 (오피스텔 이름, 연립다세대 이름)이 들어간다
+# - 전용면적: 단독다가구는 연면적
+# - 거래금액: 매매 금액, 전월세는 보증금/월세에 넣고 거래금액은 비운다
+COMMON_COLUMNS = [
+    "시도", "시군구", "법정동", "도로명", "지번", "아파트", "건축년도", "전용면적", "층",
+    "거래년도", "거래월", "거래일", "거래금액", "일련번호", "거래유형", "중개사소재지", "해제여부", "해제사유발생일",
+    "보증금", "월세", "부동산유형", "거래구분",
+]
+# 조회 결과를 합칠 때 FrameCollector가 붙이는 원본 컬럼
+TYPE_COLUMNS = ["property_type", "trade_type"]
+
+# 유형과 상관없이 이름이 같은 API 필드
+_SHARED_FIELDS = {
+    "si_do_name": "시도",
+    "sigungu_name": "시군구",
+    "umdNm": "법정동",
+    "jibun": "지번",
+    "buildYear": "건축년도",
+    "excluUseAr": "전용면적",
+    "floor": "층",
+    "dealYear": "거래년도",
+    "dealMonth": "거래월",
+    "dealDay": "거래일",
+    "dealAmount": "거래금액",
+    "deposit": "보증금",
+    "monthlyRent": "월세",
+    "dealingGbn": "거래유형",
+    "estateAgentSggNm": "중개사소재지",
+    "cdealType": "해제여부",
+    "cdealDay": "해제사유발생일",
+}
+
+
+# 부동산 유형/거래 유형 하나의 API 필드 → 공통 컬럼 변환
+# fields: 유형별로 이름이 다른 필드만 적는다 (같은 공통 컬럼으로 가는 _SHARED_FIELDS 필드 대신 쓴다)
+# 여러 유형을 합친 원본에는 다른 유형의 필드도 있으므로 공통 컬럼마다 원본 필드는 하나만 둔다
+class SchemaAdapter:
+    def __init__(self, property_type, trade_type, fields=None):
+        self.property_type = property_type
+        self.trade_type = trade_type
+        fields = fields or {}
+        self.fields = {field: column for field, column in _SHARED_FIELDS.items() if column not in fields.values()}
+        self.fields.update(fields)
+
+    # 원본 조회 결과 → 공통 컬럼 (없는 컬럼은 결측치, 부동산유형/거래구분은 이 유형으로 채운다)
+    def select(self, all_data):
+        fields = {field: column for field, column in self.fields.items() if field in all_data.columns}
+        selected = all_data[list(fields)].rename(columns=fields).reindex(columns=COMMON_COLUMNS)
+        codes = np.zeros(len(selected), dtype=np.int8)
+        selected["부동산유형"] = pd.Categorical.from_codes(codes, categories=[self.property_type])
+        selected["거래구분"] = pd.Categorical.from_codes(codes, categories=[self.trade_type])
+        return selected
+
+
+SCHEMA_ADAPTERS = {
+    ("아파트", "매매"): SchemaAdapter("아파트", "매매", {
+        "bonbun": "지번", "roadNm": "도로명", "aptNm": "아파트", "aptSeq": "일련번호",
+    }),
+    ("아파트", "전월세"): SchemaAdapter("아파트", "전월세", {"aptNm": "아파트"}),
+    ("오피스텔", "매매"): SchemaAdapter("오피스텔", "매매", {"offiNm": "아파트"}),
+    ("오피스텔", "전월세"): SchemaAdapter("오피스텔", "전월세", {"offiNm": "아파트"}),
+    ("연립다세대", "매매"): SchemaAdapter("연립다세대", "매매", {"mhouseNm": "아파트"}),
+    ("연립다세대", "전월세"): SchemaAdapter("연립다세대", "전월세", {"mhouseNm": "아파트"}),
+    ("단독다가구", "매매"): SchemaAdapter("단독다가구", "매매", {"totalFloorAr": "전용면적"}),
+    ("단독다가구", "전월세"): SchemaAdapter("단독다가구", "전월세", {"totalFloorAr": "전용면적"}),
+}
+PROPERTY_TYPES = list(dict.fromkeys(property_type for property_type, _ in SCHEMA_ADAPTERS))
+TRADE_TYPES = list(dict.fromkeys(trade_type for _, trade_type in SCHEMA_ADAPTERS))
+
+
+def get_schema_adapter(property_type, trade_type):
+    adapter = SCHEMA_ADAPTERS.get((property_type, trade_type))
+    if adapter is None:
+        raise ValueError(f"지원하지 않는 부동산/거래 유형입니다: {property_type} {trade_type} "
+                         f"(부동산 유형: {', '.join(PROPERTY_TYPES)} / 거래 유형: {', '.join(TRADE_TYPES)})")
+    return adapter
+
+
+# 부동산 유형/거래 유형 (이름 하나 또는 목록, None은 전체)의 모든 조합 [(부동산 유형, 거래 유형), ...]
+# 지원하지 않는 조합이 있으면 ValueError
+def transaction_types(property_type="아파트", trade_type="매매"):
+    property_types = PROPERTY_TYPES if property_type is None else _names(property_type)
+    trade_types = TRADE_TYPES if trade_type is None else _names(trade_type)
+    types = list(itertools.product(property_types, trade_types))
+    for pair in types:
+        get_schema_adapter(*pair)
+    return types
+
+
+def _names(value):
+    return [value] if isinstance(value, str) else list(dict.fromkeys(value))
+
+
+# 파일/캐시 경로에 쓰는 유형 이름 (목록은 쉼표로 잇는다)
+def type_label(value):
+    return ",".join(_names(value))
@@ -1,193 +1,41 @@
+import json
+import os
+import threading
 import streamlit as st
+import numpy as np
 import pandas as pd
-import PublicDataReader as pdr
 from datetime import datetime
-import json
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as fm
-import os
-import base64
-from io import BytesIO
-from report import generate_html_report, get_download_link
+from report import write_html_report
+from incremental import DEFAULT_LOOKBACK_MONTHS
+from pipeline import create_api, estimate_requests, run_pipeline
+from result_cache import get_result_cache, normalize_query
+from cache import last_settled_month
+from dataset import TransactionDataset, region_codes
+from query_engine import ANALYSIS_ENGINE, duckdb_available, get_analysis_engine
+from price import apartment_repeat_sales, repeat_sale_pairs, rolling_price_bands, unit_prices
+from repeat_index import get_repeat_index, repeat_index_path
+from schema import PROPERTY_TYPES, TRADE_TYPES
+from figures import start_pool
+from instrument import INSTRUMENT_ENABLED, Trace, activate, phase, span
+from jobs import DONE, FAILED, JOB_HEAVY_REQUESTS, JOB_POLL_SECONDS, QUEUED, get_scheduler
+from region_map import MAP_METRICS, region_map, region_metrics
+from resilient import FetchError, QuotaExceededError
 
 # 페이지 설정을 코드 상단에 위치시킴
 st.set_page_config(layout="wide")  # 여기를 추가합니다.
 
-# Streamlit secrets에서 API 키 및 파일 경로 가져오기
+# Streamlit secrets에서 API 키 가져오기
 service_key = st.secrets["general"]["SERVICE_KEY"]
-json_file_path = "district.json"
-
-# PublicDataReader API 서비스 키 사용
-api = pdr.TransactionPrice(service_key)
-
-# DistrictConverter 클래스 정의
-class DistrictConverter:
-    def __init__(self):
-        self.districts = self.__read_district_file()
-
-    def __read_district_file(self):
-        with open(json_file_path, 'r') as f:
-            return json.loads(f.read())
-
-    def get_si_do_code(self, si_do_name):
-        for district in self.districts:
-            if si_do_name == district["si_do_name"]:
-                return district["si_do_code"]
-
-    def get_sigungu(self, si_do_code):
-        for district in self.districts:
-            if si_do_code == district["si_do_code"]:
-                return district["sigungu"]
-
-import base64
-from io import BytesIO
-
-import base64
-from io import BytesIO
-
-def generate_html_report(figures, dataframes):
-    html_content = """
-    <html>
-    <head>
-        <title>부동산 데이터 분석 리포트</title>
-        <style>
-            body {
-                font-family: Arial, sans-serif;
-                margin: 20px;
-            }
-            h1 {
-                text-align: center;
-                color: #333;
-            }
-            h2 {
-                color: #555;
-            }
-            .table-container {
-                max-height: 400px; /* 원하는 높이 설정 */
-                overflow-y: auto; /* 수직 스크롤 적용 */
-                margin-bottom: 20px;
-            }
-            .table {
-                width: 100%;
-                border-collapse: collapse;
-            }
-            .table th, .table td {
-                border: 1px solid #ddd;
-                padding: 8px;
-            }
-            .table th {
-                background-color: #f2f2f2;
-                text-align: left;
-            }
-            .footer {
-                margin-top: 40px;
-                text-align: center;
-                font-size: 12px;
-                color: #777;
-            }
-            .filter {
-                margin-bottom: 10px;
-            }
-        </style>
-    </head>
-    <body>
-        <h1>부동산 매매가 분석 보고서</h1>
-        <p>작성자: KH
-        <p>홈페이지: https://2days.kr
-        <p>블로그 : https://aboda.kr
-        <p>연락처: <a href="mailto:hyperkh65@gmail.com">hyperkh65@gmail.com</a></p>
-    """
-
-    # 오른쪽 출력 순서에 맞춰 추가
-    for title, df in dataframes.items():
-        html_content += f"<h2>{title}</h2>"
-        html_content += f"""
-        <div class="filter">
-            <input type="text" onkeyup="filterTable(this, '{title}')" placeholder="필터 입력..." />
-        </div>
-        <div class="table-container">
-            <div class="table" id="{title}">
-                {df.to_html(classes="table", border=0, escape=False)}
-            </div>
-        </div>
-        """
-    
-    for title, fig in figures.items():
-        img = BytesIO()
-        fig.savefig(img, format='png')
-        img.seek(0)
-        img_base64 = base64.b64encode(img.getvalue()).decode()
-        html_content += f"<h2>{title}</h2>"
-        html_content += f'<div class="graph"><img src="data:image/png;base64,{img_base64}" /></div>'
-    
-    # JavaScript 추가: 이미지 클릭 시 확대 표시 및 필터 기능
-    html_content += """
-    <script>
-        document.querySelectorAll('.graph img').forEach(item => {
-            item.addEventListener('click', event => {
-                const img = event.target.src;
-                const modal = document.createElement('div');
-                modal.style.position = 'fixed';
-                modal.style.left = '0';
-                modal.style.top = '0';
-                modal.style.width = '100%';
-                modal.style.height = '100%';
-                modal.style.backgroundColor = 'rgba(0, 0, 0, 0.8)';
-                modal.style.zIndex = '1000';
-                const imgModal = document.createElement('img');
-                imgModal.src = img;
-                imgModal.style.maxWidth = '90%';
-                imgModal.style.maxHeight = '90%';
-                imgModal.style.position = 'absolute';
-                imgModal.style.top = '50%';
-                imgModal.style.left = '50%';
-                imgModal.style.transform = 'translate(-50%, -50%)';
-                modal.appendChild(imgModal);
-                modal.addEventListener('click', () => {
-                    document.body.removeChild(modal);
-                });
-                document.body.appendChild(modal);
-            });
-        });
-
-        function filterTable(input, title) {
-            const filter = input.value.toLowerCase();
-            const table = document.getElementById(title);
-            const rows = table.getElementsByTagName("tr");
-
-            for (let i = 1; i < rows.length; i++) {
-                const cells = rows[i].getElementsByTagName("td");
-                let found = false;
-
-                for (let j = 0; j < cells.length; j++) {
-                    if (cells[j].textContent.toLowerCase().includes(filter)) {
-                        found = true;
-                        break;
-                    }
-                }
-
-                rows[i].style.display = found ? "" : "none";
-            }
-        }
-    </script>
-    """
-
-    html_content += """
-        <div class="footer">
-            <p>이 보고서는 투데이즈, 아보다에서만 배포가 허락되며, 이를 무단 복제 및 배포하는 행위는 엄격히 금지합니다.</p>
-        </div>
-    </body>
-    </html>
-    """
-    
-    return html_content
 
+# PublicDataReader API 서비스 키 사용 (월 단위 디스크 캐시를 거쳐 조회)
+api = create_api(service_key)
 
-# 다운로드 링크 생성 함수
-def get_download_link(html_content, filename="report.html"):
-    b64 = base64.b64encode(html_content.encode()).decode()
-    return f'<a href="data:text/html;base64,{b64}" download="{filename}">다운로드 HTML 리포트</a>'
-      
+# 조회한 거래를 유형·시/도·연도별 Parquet으로 쌓아 두고 장기 추세를 여기서 읽는다
+# (반복 거래 지수는 아파트 매매만)
+apartment_dataset = TransactionDataset()
+
+# 그래프 렌더링용 프로세스 풀을 미리 띄워 둔다 (한 번만)
+start_pool()
 
 # 사용자 입력 받기
 st.title("🏡 공공데이터정보 부동산실거래가 분석하기 😃")
@@ -195,15 +43,23 @@ st.sidebar.markdown("### 📋 부동산실거래가보고서")  # 맨 위에 추
 si_do_name = st.sidebar.text_input("시/도를 입력하세요 (예: 서울특별시) 또는 '전국' 입력", "서울특별시")
 start_year_month = st.sidebar.text_input("조회 시작 년월 (YYYYMM 형식, 예: 202301)", "202407")
 end_year_month = st.sidebar.text_input("조회 종료 년월 (YYYYMM 형식, 예: 202312)", "202408")
+property_types = st.sidebar.multiselect("부동산 유형 (여러 개면 같이 조회)", PROPERTY_TYPES, default=["아파트"])
+trade_types = st.sidebar.multiselect("거래 유형 (여러 개면 같이 조회)", TRADE_TYPES, default=["매매"])
+incremental_mode = st.sidebar.checkbox("증분 조회 (저장된 데이터에 최근 월만 새로 받아 합치기)", value=False)
+lookback_months = st.sidebar.number_input("증분 조회 시 다시 받을 지난 월 수", min_value=0, max_value=12,
+                                          value=DEFAULT_LOOKBACK_MONTHS, disabled=not incremental_mode)
+region_view = st.sidebar.selectbox("지역별 거래량 보기", ["막대그래프", "지도"])
+map_metric = st.sidebar.selectbox("지도 색상 기준", MAP_METRICS, disabled=region_view != "지도")
+report_table_modes = {"자동 (큰 표는 가상 스크롤)": "auto", "전체 표 (HTML)": "html", "가상 스크롤 (대용량)": "virtual"}
+report_table_mode = st.sidebar.selectbox("리포트 표 형식", list(report_table_modes))
+# 요약표 계산 엔진 (DuckDB는 설치되어 있을 때만 선택 가능, 결과는 같다)
+engine_names = ["pandas", "duckdb"] if duckdb_available() else ["pandas"]
+analysis_engine = st.sidebar.selectbox("분석 엔진", engine_names,
+                                       index=engine_names.index(ANALYSIS_ENGINE) if ANALYSIS_ENGINE in engine_names else 0)
+instrument_mode = st.sidebar.checkbox("실행 계측 (단계별 시간·받은 바이트·메모리)", value=INSTRUMENT_ENABLED)
 data_query_button = st.sidebar.button("데이터 조회")
 st.sidebar.markdown("### ⚙️ Made by Kimhyun ㅣ Version : 1.0")  # 맨 아래에 추가
 
-# 폰트 파일 경로 설정
-current_dir = os.getcwd()
-font_path = os.path.join(current_dir, 'NanumGothicCoding.ttf')
-fm.fontManager.addfont(font_path)
-plt.rcParams['font.family'] = 'NanumGothicCoding'  # 사용자 선택한 폰트 적용
-
 # 현재 날짜를 기준으로 기간 설정
 now = datetime.now()
 if not start_year_month:
@@ -213,238 +69,317 @@ if not end_year_month:
 
 # 진행 상황 표시
 progress_text = st.sidebar.empty()
-status_text = st.sidebar.empty()
 
-if data_query_button:
-    if si_do_name and start_year_month and end_year_month:
-        # DistrictConverter 인스턴스 생성
-        converter = DistrictConverter()
-
-        # 데이터 수집 및 처리
-        all_data = pd.DataFrame()
-
-        if si_do_name == "전국":
-            total_count = sum(len(district["sigungu"]) for district in converter.districts)
-            processed_count = 0
-
-            for district in converter.districts:
-                si_do_code = district["si_do_code"]
-                sigungu_list = district["sigungu"]
-
-                for sigungu in sigungu_list:
-                    sigungu_code = sigungu["sigungu_code"]
-                    sigungu_name = sigungu["sigungu_name"]
-
-                    # 현재 진행 상황 업데이트
-                    processed_count += 1
-                    progress_text.text(f"진행율: {100 * processed_count / total_count:.2f}% ({processed_count}/{total_count})")
-                    status_text.text(f"현재 처리 중: {sigungu_name} ({sigungu_code})")
-
-                    df = api.get_data(
-                        property_type="아파트",
-                        trade_type="매매",
-                        sigungu_code=sigungu_code,
-                        start_year_month=start_year_month,
-                        end_year_month=end_year_month
-                    )
+# 결과 화면에 보여 줄 가격 분석, 저장된 기간 추세, 반복 거래 지수, 지역 지표를 작업 스레드에서 한 번만 계산한다
+# (작업이 끝난 뒤에는 위젯을 바꿔 스크립트가 다시 실행되어도 계산하지 않고 그리기만 한다)
+def summarize_result(result, si_do_name, dataset):
+    summary = {"price": None, "history": None, "index": None}
+
+    # 가격 분석 (거래금액 / 전용면적, 취소된 거래 제외)
+    with span("가격 분석", "app"):
+        prices = unit_prices(result.analysis_data)
+        if prices['㎡당 가격'].notna().any():
+            # 시군구별 최근 3개월 이동 중앙값 (거래가 많은 시군구 10개)
+            bands = rolling_price_bands(result.analysis_data, '시군구')
+            busiest = np.argsort(-bands.counts.sum(axis=1), kind='stable')[:10]
+            # 마지막 달 기준 시군구별 가격 구간과 전년 대비 변화
+            band_table = bands.to_frame()
+            last_year, last_month = bands.months[-1]
+            summary["price"] = {
+                "unit_median": prices['㎡당 가격'].median(),
+                "pyeong_median": prices['평당 가격'].median(),
+                "bands": pd.DataFrame(
+                    bands.median[busiest].T,
+                    index=[f"{year}-{month:02d}" for year, month in bands.months],
+                    columns=[bands.labels[index] for index in busiest]
+                ),
+                "last_bands": band_table[(band_table['거래년도'] == last_year) & (band_table['거래월'] == last_month)],
+                # 같은 세대가 다시 거래된 단지의 연환산 상승률
+                "repeat_sales": apartment_repeat_sales(repeat_sale_pairs(result.analysis_data)).head(50),
+            }
 
-                    df["sigungu_name"] = sigungu_name
-                    df["si_do_name"] = district["si_do_name"]
+    # 지금까지 저장된 모든 기간의 거래량 추이 (월별 거래량과 면적 범위만 필요하므로
+    # 거래 행을 읽지 않고 데이터셋 파티션마다 미리 집계해 둔 거래량 파일에서 계산한다)
+    with span("저장된 기간 추세", "app"):
+        history = dataset.analyze_rollup(region_codes(si_do_name))
+    if history.total_volume:
+        summary["history"] = history
+
+        # 저장된 거래로 만든 시군구별 반복 거래 지수 (신고가 다 들어온 달까지, 새로 저장된 달만 더한다)
+        # 지난달은 아직 늦은 신고가 들어오므로 넣지 않는다 (반영한 달의 거래량이 바뀐 시/도는 다시 만든다)
+        with span("반복 거래 지수", "app"):
+            repeat_index = get_repeat_index()
+            if repeat_index.update_from_dataset(apartment_dataset, through_year_month=last_settled_month()):
+                repeat_index.save(repeat_index_path())
+            index_table = repeat_index.fit()
+            if si_do_name != "전국":
+                index_table = index_table[index_table['시도'] == si_do_name]
+            if not index_table.empty:
+                index_table = index_table.assign(월=[f"{year}-{month:02d}" for year, month in
+                                                    zip(index_table['거래년도'], index_table['거래월'])])
+                busiest_sigungu = index_table.groupby('시군구')['거래 쌍 수'].sum().nlargest(10).index
+                summary["index"] = (index_table[index_table['시군구'].isin(busiest_sigungu)]
+                                    .pivot_table(index='월', columns='시군구', values='지수'))
+
+    # 지도에 칠할 시군구별 지표 (색상 기준은 화면에서 고른다)
+    with span("지역 지표", "app"):
+        summary["region_metrics"] = region_metrics(result.analysis_data)
+    return summary
+
+
+# 조회는 프로세스 전체가 같이 쓰는 백그라운드 작업으로 실행한다
+# (위젯을 바꾸거나 브라우저 연결이 끊겨 스크립트가 다시 실행되어도 조회는 계속되고, 같은 조회는 한 번만 실행)
+scheduler = get_scheduler()
+query = normalize_query(si_do_name, start_year_month, end_year_month, property_types, trade_types)
+job_key = (query, incremental_mode, int(lookback_months) if incremental_mode else None)
+
+if data_query_button and si_do_name and start_year_month and end_year_month and property_types and trade_types:
+    dataset = TransactionDataset(property_type=property_types, trade_type=trade_types)
+    engine = get_analysis_engine(analysis_engine)
+    query_options = {
+        "si_do_name": si_do_name, "start_year_month": start_year_month, "end_year_month": end_year_month,
+        "property_type": property_types, "trade_type": trade_types,
+        "incremental": incremental_mode, "lookback_months": int(lookback_months),
+    }
+
+    # 조회 → 타입 정리 → 분석 → 그래프 (CLI와 같은 파이프라인)
+    # 그래프는 한 번만 PNG로 렌더링해서 화면과 리포트에 같이 사용 (같은 집계 결과면 캐시 사용)
+    # 같은 조회 결과는 프로세스 전체에서 공유 (결과 캐시에 있으면 바로 끝난다)
+    # 증분 조회는 새 월을 받아야 하므로 저장된 결과를 쓰지 않고 다시 계산한다
+    # 화면에 보여 줄 나머지 분석도 작업 안에서 계산해 둔다 (summarize_result)
+    # 조회 결과는 크기 제한이 있는 결과 캐시에서 꺼내 보여 주고 작업에는 남기지 않는다
+    # (캐시에 들어가지 못한 큰 결과만 작업에 두었다가 처음 보여 줄 때 버린다)
+    def run_query(job, options=query_options, dataset=dataset, engine=engine):
+        result_cache = get_result_cache()
+        result, cache_status = result_cache.get_or_compute(
+            job.key[0],
+            lambda: run_pipeline(api, on_progress=job.update_progress, dataset=dataset, engine=engine, **options),
+            refresh=options["incremental"]
+        )
+        summary = summarize_result(result, options["si_do_name"], dataset)
+        retained = None if result_cache.peek(job.key[0]) is result else result
+        return retained, cache_status, summary
+
+    # 예상 요청 수가 적은 조회부터 실행 (시/도 하나짜리 조회가 전국 조회 뒤에서 기다리지 않도록)
+    requests = estimate_requests(si_do_name, start_year_month, end_year_month, property_types, trade_types)
+    job, _ = scheduler.submit(job_key, run_query, priority=requests, heavy=requests >= JOB_HEAVY_REQUESTS,
+                              trace=Trace("job") if instrument_mode else None, params=query_options)
+    st.session_state["job_id"] = job.id
+
+# 이 세션이 시작한 작업 (다시 실행되어도 id로 찾는다)
+# 지금 입력값과 같은 조회가 진행 중이면 (다른 세션이 시작한 작업이어도) 그 작업에 붙는다
+job = scheduler.get(st.session_state.get("job_id"))
+running_job = scheduler.find(job_key)
+if running_job is not None and (job is None or job.done):
+    job = running_job
+    st.session_state["job_id"] = job.id
+
+
+# 작업이 끝날 때까지 진행 상황만 주기적으로 다시 그리고, 끝나면 화면 전체를 다시 실행해서 결과를 보여 준다
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def show_job_progress(job):
+    if job.done:
+        st.rerun()
+    stats = scheduler.stats()
+    if job.status == QUEUED:
+        st.info(f"조회 대기 중... (실행 중 {stats['running']}개 · 대기 {stats['queued']}개)")
+    else:
+        fraction = job.processed / job.total if job.total else 0.0
+        current = f" · 최근 완료: {job.current['sigungu_name']} ({job.current['sigungu_code']})" if job.current else ""
+        st.progress(fraction, text=f"진행율: {100 * fraction:.2f}% ({job.processed}/{job.total}) · "
+                                   f"{job.elapsed:.0f}초{current}")
+    st.caption("다른 화면으로 이동하거나 입력값을 바꿔도 조회는 계속됩니다.")
+
+
+if job is not None and not job.done:
+    show_job_progress(job)
+
+if job is not None and job.status == FAILED:
+    if isinstance(job.error, QuotaExceededError):
+        st.error(f"API 일일 요청 한도를 초과했습니다. 내일 다시 조회하면 끝난 시군구부터 이어서 조회합니다. ({job.error})")
+        st.stop()
+    if isinstance(job.error, FetchError):
+        st.error(f"데이터 조회에 실패했습니다. 다시 조회하면 끝난 시군구부터 이어서 조회합니다. ({job.error})")
+        st.stop()
+    raise job.error
+
+# 이번 실행의 계측 (작업 결과를 이 세션에서 처음 보여 줄 때만, 꺼져 있으면 구간 기록 함수가 바로 돌아온다)
+# 조회·분석 구간은 작업 스레드에서 작업의 계측에 기록되므로 보여 줄 때 합친다
+first_view = job is not None and job.status == DONE and st.session_state.get("shown_job_id") != job.id
+trace = activate(Trace("streamlit") if instrument_mode and first_view else None)
+if trace is not None and job.trace is not None:
+    trace.merge(job.trace.events)
+
+if job is not None and job.status == DONE:
+    st.session_state["shown_job_id"] = job.id
+    # 결과는 지금 입력값이 아니라 작업을 만든 조회 조건으로 보여 준다
+    si_do_name = job.params["si_do_name"]
+    retained, cache_status, summary = job.result
+    if retained is not None:
+        job.result = (None, cache_status, summary)
+        result = retained
+    else:
+        result = get_result_cache().peek(job.key[0])
+    if result is None:
+        st.warning("조회 결과가 결과 캐시에서 정리되었습니다. 다시 조회해 주세요.")
+        st.stop()
+    cache_stats = get_result_cache().stats()
+    job_stats = scheduler.stats()
+    cache_labels = {"hit": "캐시된 결과", "coalesced": "다른 세션의 조회 결과", "miss": "새로 조회"}
+    progress_text.text(f"조회 결과: {cache_labels[cache_status]} ({job.elapsed:.1f}초)")
+    st.sidebar.caption(
+        f"결과 캐시: 적중 {cache_stats['hits']} · 새로 조회 {cache_stats['misses']} · 공유 {cache_stats['coalesced']} · "
+        f"{cache_stats['entries']}개 {cache_stats['bytes'] / 2**20:.1f}MB / {cache_stats['max_bytes'] / 2**20:.0f}MB"
+    )
+    st.sidebar.caption(
+        f"조회 작업: 실행 중 {job_stats['running']} · 대기 {job_stats['queued']} · "
+        f"요청 {job_stats['submitted']}건 중 같은 작업 공유 {job_stats['deduplicated']}건"
+    )
+    selected_data = result.selected_data
+    analysis = result.analysis
+    figures = result.figures
+
+    # 데이터 표로 표시
+    phase("표·그래프 표시")
+    st.write("### 조회 결과")
+    st.dataframe(selected_data)
+
+    # 분석 자료
+    st.write("### 분석 자료")
+    total_transactions = selected_data.shape[0]
+    st.write(f"총 거래량: {total_transactions}")
+    st.write(f"메모리 사용량: {result.memory_before / 2**20:.1f}MB → {result.memory_after / 2**20:.1f}MB (타입 정리 후)")
+
+    # 매월 거래량
+    monthly_transactions = analysis.monthly_transactions
+    
+    # 매월 거래량 시각화
+    st.header("매월 거래량 📅")
+    st.image(figures["매월 거래량"])
+    
+    # 매월 거래량 표 추가
+    st.dataframe(monthly_transactions)
 
-                    all_data = pd.concat([all_data, df], ignore_index=True)
-        else:
-            si_do_code = converter.get_si_do_code(si_do_name)
-            sigungu_list = converter.get_sigungu(si_do_code)
-
-            total_count = len(sigungu_list)
-            processed_count = 0
-
-            for sigungu in sigungu_list:
-                sigungu_code = sigungu["sigungu_code"]
-                sigungu_name = sigungu["sigungu_name"]
-
-                # 현재 진행 상황 업데이트
-                processed_count += 1
-                progress_text.text(f"진행율: {100 * processed_count / total_count:.2f}% ({processed_count}/{total_count})")
-                status_text.text(f"현재 처리 중: {sigungu_name} ({sigungu_code})")
-
-                df = api.get_data(
-                    property_type="아파트",
-                    trade_type="매매",
-                    sigungu_code=sigungu_code,
-                    start_year_month=start_year_month,
-                    end_year_month=end_year_month
-                )
-
-                df["sigungu_name"] = sigungu_name
-                df["si_do_name"] = si_do_name
-
-                all_data = pd.concat([all_data, df], ignore_index=True)
-
-        # 컬럼 이름 변환
-        columns_to_select = {
-            "si_do_name": "시도",
-            "sigungu_name": "시군구",
-            "umdNm": "법정동",
-            "roadNm": "도로명",
-            "bonbun": "지번",
-            "aptNm": "아파트",
-            "buildYear": "건축년도",
-            "excluUseAr": "전용면적",
-            "floor": "층",
-            "dealYear": "거래년도",
-            "dealMonth": "거래월",
-            "dealDay": "거래일",
-            "dealAmount": "거래금액",
-            "aptSeq": "일련번호",
-            "dealingGbn": "거래유형",
-            "estateAgentSggNm": "중개사소재지",
-            "cdealType": "해제여부",
-            "cdealDay": "해제사유발생일"
-        }
-
-        selected_data = all_data.rename(columns=columns_to_select)[list(columns_to_select.values())]
-
-        # 데이터 표로 표시
-        st.write("### 조회 결과")
-        st.dataframe(selected_data)
-
-        # 분석 자료
-        st.write("### 분석 자료")
-        total_transactions = selected_data.shape[0]
-        st.write(f"총 거래량: {total_transactions}")
-
-        # 전용면적 데이터 타입 변환 및 결측치 처리
-        selected_data['전용면적'] = pd.to_numeric(selected_data['전용면적'], errors='coerce')
-        selected_data.dropna(subset=['전용면적'], inplace=True)  # 결측치 삭제
-
-        # 매월 거래량
-        monthly_transactions = selected_data.groupby(['거래년도', '거래월']).size().reset_index(name='거래량')
-        
-        # 매월 거래량 시각화
-        st.header("매월 거래량 📅")
-        fig_monthly = plt.figure(figsize=(10, 6))
-        plt.bar(monthly_transactions['거래년도'].astype(str) + '-' + monthly_transactions['거래월'].astype(str), monthly_transactions['거래량'], color='skyblue')
-        plt.xlabel('연도-월', fontsize=14)
-        plt.ylabel('거래량', fontsize=14)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        st.pyplot(fig_monthly)
-        
-        # 매월 거래량 표 추가
-        monthly_summary = monthly_transactions.groupby('거래년도')['거래량'].sum().reset_index()
-        monthly_summary.columns = ['거래년도', '월별 거래량']
-        st.dataframe(monthly_transactions)
-        
-        # 지역별 거래량
-        regional_summary = selected_data.groupby('시군구').size().reset_index(name='거래량')
-        regional_summary['총계'] = regional_summary['거래량'].sum()  # 총계 열 추가
+    # 전용면적 범위별 거래량 시각화
+    st.header("전용면적 범위별 거래량 📏")
+    st.image(figures["전용면적 범위별 거래량"])
     
-        # 전용면적 범위별 거래량
-        bins = [0, 80, 100, 120, 140, float('inf')]
-        labels = ['0~80', '80~100', '100~120', '120~140', '140 이상']
-        selected_data['면적 범위'] = pd.cut(selected_data['전용면적'], bins=bins, labels=labels, right=False)
-        area_counts = selected_data['면적 범위'].value_counts().sort_index()
-        
-        # 전용면적 범위별 거래량 시각화
-        st.header("전용면적 범위별 거래량 📏")
-        fig_area = plt.figure(figsize=(10, 6))
-        plt.bar(area_counts.index, area_counts.values, color='#2196F3', edgecolor='none')  # 색상 변경 및 아웃라인 제거
-        plt.xlabel('면적 범위', fontsize=14)
-        plt.ylabel('거래량', fontsize=14)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        st.pyplot(fig_area)
-        
-        # 전용면적 범위별 거래량 표 추가
-        area_summary = area_counts.reset_index()
-        area_summary.columns = ['면적 범위', '거래량']
-        area_summary['총계'] = area_summary['거래량'].sum()  # 총계 열 추가
-        st.dataframe(area_summary)
-        
-        # 지역별 면적 대비 거래량
-        regional_area_counts = selected_data.groupby(['시군구']).size()
-        
-        # 데이터가 비어 있는 경우 처리
-        if regional_area_counts.empty:
-            st.write("지역별 거래량 데이터가 없습니다.")
-        else:
-            # 지역별 면적 대비 거래량 시각화
-            st.header("지역별 면적 대비 거래량 🌍")
-            fig_regional = plt.figure(figsize=(10, 6))
-            plt.bar(regional_area_counts.index, regional_area_counts.values, color='#FFC107', edgecolor='none')  # 색상 변경 및 아웃라인 제거
-            plt.xlabel('시군구', fontsize=14)
-            plt.ylabel('거래량', fontsize=14)
-            plt.xticks(rotation=45)
-            plt.tight_layout()
-            st.pyplot(fig_regional)
-        
-            # 지역별 면적 대비 거래량 표 추가
-            regional_summary = regional_area_counts.reset_index()
-            regional_summary.columns = ['시군구', '거래량']
-            regional_summary['총계'] = regional_summary['거래량'].sum()  # 총계 열 추가
-            st.dataframe(regional_summary)
-        
-        # 거래유형 분석
-        transaction_types = selected_data['거래유형'].value_counts()
-        
-        # 데이터가 비어 있는 경우 처리
-        if transaction_types.empty:
-            st.write("거래유형 데이터가 없습니다.")
+    # 전용면적 범위별 거래량 표 추가
+    st.dataframe(analysis.area_summary)
+    
+    # 지역별 면적 대비 거래량
+    regional_area_counts = analysis.regional_counts
+    
+    # 데이터가 비어 있는 경우 처리
+    if regional_area_counts.empty:
+        st.write("지역별 거래량 데이터가 없습니다.")
+    else:
+        # 지역별 면적 대비 거래량 시각화
+        st.header("지역별 면적 대비 거래량 🌍")
+        if region_view == "지도":
+            # 시군구코드로 경계와 지표를 이어 색칠 (경계는 줌 레벨별로 단순화해 캐시한 것을 쓴다)
+            # 그린 지도는 (작업, 색상 기준)이 같으면 세션에 남겨 둔 HTML을 다시 쓴다
+            try:
+                map_key = (job.id, map_metric)
+                if st.session_state.get("region_map", (None, None))[0] != map_key:
+                    folium_map = region_map(summary["region_metrics"], map_metric, region_codes(si_do_name))
+                    st.session_state["region_map"] = (map_key, folium_map.get_root().render())
+                st.iframe(st.session_state["region_map"][1], height=600)
+            except FileNotFoundError as e:
+                st.info(f"지도를 그릴 수 없어 막대그래프로 표시합니다. ({e})")
+                st.image(figures["지역별 면적 대비 거래량"])
         else:
-            # 거래유형 분석 시각화
-            st.header("거래유형 분석 🏠")
-            fig_types = plt.figure(figsize=(10, 6))
-            plt.pie(transaction_types, labels=transaction_types.index, autopct='%1.1f%%', startangle=140, colors=['#FF5733', '#33FF57'])  # 색상 변경
-            plt.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-            st.pyplot(fig_types)
-        
-        # 거래유형 분석 표
-        st.dataframe(transaction_types.reset_index().rename(columns={'index': '거래유형', 0: '거래량'}))
-
-        # 거래량 합계
-        total_volume = monthly_transactions['거래량'].sum()
-        st.write(f"거래량 합계: {total_volume} 🏆")
-        
-        popular_apartments = selected_data.groupby(['법정동', '아파트']).size().reset_index(name='거래량')
-        
-        # 각 법정동별 거래량이 가장 높은 아파트 찾기
-        top_apartments = popular_apartments.loc[popular_apartments.groupby('법정동')['거래량'].idxmax()]
-        
-        # 결과를 표로 표시
-        st.header("법정동별 거래 빈도가 높은 아파트 🌍")
-        st.dataframe(top_apartments)
-
-        # 모든 그림과 데이터프레임 저장
-        figures = {
-            "매월 거래량": fig_monthly,
-            "전용면적 범위별 거래량": fig_area,
-            "지역별 면적 대비 거래량": fig_regional,
-            "거래유형 분석": fig_types
-        }
-        
-        dataframes = {
-            "조회 결과": selected_data,
-            "매월 거래량": monthly_transactions,
-            "전용면적 범위별 거래량": area_summary,
-            "지역별 면적 대비 거래량": regional_summary,
-            "거래유형 분석": transaction_types.reset_index().rename(columns={'index': '거래유형', 0: '거래량'}),
-            "법정동별 거래 빈도가 높은 아파트": top_apartments
-        }
-
-      # HTML 리포트 생성
-        html_report = generate_html_report(figures, dataframes)
-        
-        # HTML 리포트를 파일로 저장
-        with open("report.html", "w", encoding="utf-8") as f:
-            f.write(html_report)
-        
-        # 다운로드 링크 생성
-        def get_download_link(filename="report.html"):
-            with open(filename, "rb") as f:
-                b64 = base64.b64encode(f.read()).decode()
-            return f'<a href="data:file/html;base64,{b64}" download="{filename}">무료보고서 다운받으세요</a>'
-        
-        # 다운로드 링크 표시
-        st.sidebar.markdown(get_download_link("report.html"), unsafe_allow_html=True)
+            st.image(figures["지역별 면적 대비 거래량"])
+    
+        # 지역별 면적 대비 거래량 표 추가
+        st.dataframe(analysis.regional_summary)
+    
+    # 거래유형 분석
+    transaction_types = analysis.transaction_types
+    
+    # 데이터가 비어 있는 경우 처리
+    if transaction_types.empty:
+        st.write("거래유형 데이터가 없습니다.")
+    else:
+        # 거래유형 분석 시각화
+        st.header("거래유형 분석 🏠")
+        st.image(figures["거래유형 분석"])
+    
+    # 거래유형 분석 표
+    st.dataframe(analysis.transaction_type_summary)
 
+    # 거래량 합계
+    st.write(f"거래량 합계: {analysis.total_volume} 🏆")
+    
+    # 각 법정동별 거래량이 가장 높은 아파트를 표로 표시
+    st.header("법정동별 거래 빈도가 높은 아파트 🌍")
+    st.dataframe(analysis.top_apartments)
+
+    # 가격 분석 (거래금액 / 전용면적, 취소된 거래 제외)
+    st.header("가격 분석 💰")
+    price = summary["price"]
+    if price is not None:
+        st.write(f"㎡당 가격 중앙값: {price['unit_median']:,.0f}만원 · "
+                 f"평당 가격 중앙값: {price['pyeong_median']:,.0f}만원")
+
+        # 시군구별 최근 3개월 이동 중앙값 (거래가 많은 시군구 10개)
+        st.line_chart(price["bands"])
+
+        # 마지막 달 기준 시군구별 가격 구간과 전년 대비 변화
+        st.dataframe(price["last_bands"])
+
+        # 같은 세대가 다시 거래된 단지의 연환산 상승률
+        if not price["repeat_sales"].empty:
+            st.write("반복 거래 단지 (같은 단지·층·면적)")
+            st.dataframe(price["repeat_sales"])
+    else:
+        st.write("가격 데이터가 없습니다.")
+
+    # 지금까지 저장된 모든 기간의 거래량 추이 (거래량 파일에서 계산)
+    history = summary["history"]
+    if history is not None:
+        st.header("저장된 전체 기간 거래량 추이 📈")
+        history_monthly = history.monthly_transactions
+        st.line_chart(pd.Series(
+            history_monthly['거래량'].to_numpy(),
+            index=[f"{year}-{month:02d}" for year, month in zip(history_monthly['거래년도'], history_monthly['거래월'])],
+            name='거래량'
+        ))
+        st.dataframe(history.area_summary)
+
+        # 시군구별 반복 거래 지수 (신고가 다 들어온 달까지)
+        if summary["index"] is not None:
+            st.header("시군구별 반복 거래 지수 📊")
+            st.line_chart(summary["index"])
+
+    # HTML 리포트는 다운로드 버튼을 누를 때 작업의 결과 파일로 스트리밍해서 만든다
+    # (작업과 표 형식마다 한 번만 만들고, 작업이 정리될 때 같이 지워진다. 스크립트 실행도 막지 않는다)
+    # 다른 세션이 같은 파일을 만드는 중일 수 있으므로 임시 파일에 쓴 뒤 교체한다
+    def build_report(job=job, figures=figures, analysis=analysis, analysis_data=result.analysis_data,
+                     table_mode=report_table_modes[report_table_mode]):
+        path = job.file_path(f"report-{table_mode}.html")
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                write_html_report(f, figures, analysis, analysis_data, table_mode=table_mode)
+            os.replace(tmp_path, path)
+        with open(path, "rb") as f:
+            return f.read()
+
+    st.sidebar.download_button("무료보고서 다운받으세요", data=build_report, file_name="report.html", mime="text/html")
+
+    # 실행 계측: 단계별 시간, 시군구별 행 수/받은 바이트, 최대 메모리 (JSON은 TRACE_DIR에 저장)
+    if trace is not None:
+        phase(None)
+        with st.expander(f"실행 계측 ⏱️ (총 {trace.duration:.2f}초, 최대 메모리 {trace.peak_memory / 2**20:.0f}MB)"):
+            st.caption(f"조회 결과: {cache_labels[cache_status]} (저장된 결과를 쓰면 조회·분석 단계 구간이 없다)")
+            st.dataframe(trace.stage_summary())
+            sigungu_table = trace.sigungu_summary()
+            if not sigungu_table.empty:
+                st.write("시군구별 조회")
+                st.dataframe(sigungu_table)
+            st.caption(f"계측 파일: {trace.save()}")
+            st.download_button("Chrome trace 다운로드 (chrome://tracing, Perfetto에서 열기)",
+                               data=json.dumps(trace.to_chrome_trace(), ensure_ascii=False, default=str),
+                               file_name="trace.json", mime="application/json")
@@ -0,0 +1,205 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from district import load_index
+from fetcher import month_range
+
+# 국토교통부 아파트 매매 API 원본 컬럼 (PublicDataReader translate=False 결과와 같은 순서)
+TRADE_COLUMNS = [
+    "sggCd", "umdCd", "landCd", "bonbun", "bubun", "roadNm", "roadNmSggCd", "roadNmCd", "roadNmSeq", "roadNmbCd",
+    "roadNmBonbun", "roadNmBubun", "umdNm", "aptNm", "jibun", "excluUseAr", "dealYear", "dealMonth", "dealDay",
+    "dealAmount", "floor", "buildYear", "aptSeq", "cdealType", "cdealDay", "dealingGbn", "estateAgentSggNm",
+    "rgstDate", "aptDong", "slerGbn", "buyerGbn", "landLeaseholdGbn",
+]
+# ResilientTransactionPrice/PublicDataReader가 숫자로 바꾸는 컬럼 (나머지는 문자열)
+INTEGER_COLUMNS = ["dealYear", "dealMonth", "dealDay", "dealAmount", "floor", "buildYear"]
+FLOAT_COLUMNS = ["excluUseAr"]
+
+# 단지 이름에 쓰는 브랜드와 전용면적 평형 (㎡)
+APARTMENT_BRANDS = ["래미안", "자이", "푸르지오", "아이파크", "e편한세상", "힐스테이트", "롯데캐슬", "더샵", "현대", "삼성",
+                    "주공", "한신", "우성", "벽산", "두산위브", "한양", "대림", "쌍용", "극동", "신동아"]
+UNIT_AREAS = np.array([39.6, 49.9, 59.97, 74.91, 84.95, 101.93, 114.82, 134.97, 164.59])
+# 법정동 하나에 있는 평균 단지 수, 단지 하나의 평균 평형 수
+APARTMENTS_PER_DONG = 2
+# 거래 비율: 직거래, 계약 해제, 법인 매도/매수
+DIRECT_DEAL_RATE = 0.12
+CANCEL_RATE = 0.02
+CORPORATE_RATE = 0.04
+
+
+# district.json의 시군구/법정동 목록으로 만든 합성 아파트 단지 목록
+# 시군구마다 법정동 수에 비례해서 단지를 만들고, 단지마다 위치/이름/건축년도/평형/가격 수준을 고정한다
+# (같은 seed면 같은 단지 목록, 시군구 거래량은 단지 수에 비례)
+class SyntheticMarket:
+    def __init__(self, seed=0, apartments_per_dong=APARTMENTS_PER_DONG):
+        rng = np.random.default_rng(seed)
+        index = load_index()
+        dongs = {}
+        for code, name in index["dong_names"].items():
+            dongs.setdefault(code[:5], []).append((code, name))
+
+        self.sigungu = []
+        columns = {name: [] for name in ("sigungu", "dong_code", "dong_name", "name", "build_year", "max_floor",
+                                         "price_level", "areas", "bonbun", "road")}
+        for district in index["districts"]:
+            # 시군구 단위 가격 수준 (만원/㎡): 시도마다 다르고 시군구마다 흩어진다
+            si_do_level = rng.lognormal(np.log(600), 0.35)
+            for sigungu in district["sigungu"]:
+                sigungu_dongs = sorted(dongs.get(sigungu["sigungu_code"], []))
+                if not sigungu_dongs:
+                    continue
+                number = len(self.sigungu)
+                self.sigungu.append({
+                    "si_do_name": district["si_do_name"],
+                    "sigungu_code": sigungu["sigungu_code"],
+                    "sigungu_name": sigungu["sigungu_name"],
+                })
+                sigungu_level = si_do_level * rng.lognormal(0, 0.3)
+                count = max(1, rng.poisson(apartments_per_dong * len(sigungu_dongs)))
+                dong_picks = rng.integers(0, len(sigungu_dongs), count)
+                for apartment, dong in enumerate(dong_picks):
+                    dong_code, dong_name = sigungu_dongs[dong]
+                    brand = APARTMENT_BRANDS[rng.integers(0, len(APARTMENT_BRANDS))]
+                    columns["sigungu"].append(number)
+                    columns["dong_code"].append(dong_code[5:])
+                    columns["dong_name"].append(dong_name.split()[-1])
+                    columns["name"].append(f"{dong_name.split()[-1][:-1]}{brand}" +
+                                           (f"{rng.integers(1, 10)}단지" if rng.random() < 0.3 else ""))
+                    columns["build_year"].append(int(rng.integers(1978, 2025)))
+                    columns["max_floor"].append(int(rng.integers(5, 36)))
+                    columns["price_level"].append(sigungu_level * rng.lognormal(0, 0.2))
+                    columns["areas"].append(np.sort(rng.choice(UNIT_AREAS, rng.integers(1, 5), replace=False)))
+                    columns["bonbun"].append(int(rng.integers(1, 2000)))
+                    columns["road"].append(f"{dong_name.split()[-1][:-1]}로{rng.integers(1, 80)}길")
+        self.apartments = {name: np.array(values, dtype=object) if name in ("dong_code", "dong_name", "name", "road",
+                                                                             "areas") else np.array(values)
+                           for name, values in columns.items()}
+        self.apartment_count = len(columns["sigungu"])
+        self.sigungu_codes = np.array([sigungu["sigungu_code"] for sigungu in self.sigungu], dtype=object)
+
+    # 합성 거래 rows건 (월은 start~end에 고르게, 거래는 단지마다 같은 확률)
+    # - 숫자 컬럼은 PublicDataReader처럼 Int64/float64, 나머지는 문자열
+    # - categorical=True면 문자열 컬럼을 categorical로 만든다 (수천만 건을 메모리에 올릴 때)
+    # 결과는 시군구, 거래월 순으로 정렬되어 있다 (시군구 조회 결과를 이어 붙인 모양)
+    def trades(self, rows, start_year_month="202401", end_year_month="202412", seed=0, categorical=False):
+        rng = np.random.default_rng(seed)
+        apartments = self.apartments
+        months = month_range(start_year_month, end_year_month)
+        apartment = rng.integers(0, self.apartment_count, rows)
+        month = rng.integers(0, len(months), rows)
+        order = np.lexsort((month, apartments["sigungu"][apartment]))
+        apartment, month = apartment[order], month[order]
+        sigungu = apartments["sigungu"][apartment]
+
+        years = np.array([int(value[:4]) for value in months])
+        month_numbers = np.array([int(value[4:]) for value in months])
+        # 단지별 평형(1~4개) 중 하나를 고른다 (평형 목록을 4칸으로 늘려 두고 평형 수 안에서 고른다)
+        counts = np.array([len(unit_areas) for unit_areas in apartments["areas"]])
+        padded = np.array([np.resize(unit_areas, 4) for unit_areas in apartments["areas"]])
+        areas = padded[apartment, (rng.random(rows) * counts[apartment]).astype(np.int64)]
+        # 가격: 단지 가격 수준 × 면적 × 연 3% 상승 × 잡음 (만원, 정수)
+        elapsed_years = (years[month] - years[0]) + (month_numbers[month] - 1) / 12
+        amount = (apartments["price_level"][apartment] * areas * 1.03 ** elapsed_years *
+                  rng.lognormal(0, 0.08, rows)).round().astype(np.int64)
+        floor = 1 + (rng.random(rows) * apartments["max_floor"][apartment]).astype(np.int64)
+        direct = rng.random(rows) < DIRECT_DEAL_RATE
+        cancelled = rng.random(rows) < CANCEL_RATE
+        day = rng.integers(1, 29, rows)
+
+        def text(values, codes):
+            # 같은 값은 같은 문자열 객체를 가리키게 만든다 (행마다 새 문자열을 만들지 않음)
+            values = np.asarray(values, dtype=object)
+            if categorical:
+                uniques, inverse = np.unique(values.astype(str), return_inverse=True)
+                return pd.Categorical.from_codes(inverse[codes], categories=uniques)
+            return values[codes]
+
+        sigungu_names = [f"{entry['si_do_name'][:2]} {entry['sigungu_name']}" for entry in self.sigungu]
+        day_text = np.array([f"{value:02d}" for value in range(32)], dtype=object)
+        cancel_day = np.where(cancelled, month * 32 + day, len(months) * 32)
+        cancel_days = [f"{years[index // 32] % 100:02d}.{month_numbers[index // 32]:02d}.{day_text[index % 32]}"
+                       for index in range(len(months) * 32)] + [""]
+        registered = np.where(direct | cancelled, len(months) * 32, month * 32 + np.minimum(day + 10, 31))
+
+        columns = {
+            "sggCd": text(self.sigungu_codes, sigungu),
+            "umdCd": text(apartments["dong_code"], apartment),
+            "landCd": text(["1"], np.zeros(rows, dtype=np.int64)),
+            "bonbun": text([f"{value:04d}" for value in apartments["bonbun"]], apartment),
+            "bubun": text(["0000"], np.zeros(rows, dtype=np.int64)),
+            "roadNm": text(apartments["road"], apartment),
+            "roadNmSggCd": text(self.sigungu_codes, sigungu),
+            "roadNmCd": text([f"{4000000 + index:07d}" for index in range(self.apartment_count)], apartment),
+            "roadNmSeq": text(["01"], np.zeros(rows, dtype=np.int64)),
+            "roadNmbCd": text(["0"], np.zeros(rows, dtype=np.int64)),
+            "roadNmBonbun": text([f"{value:05d}" for value in apartments["bonbun"] % 300], apartment),
+            "roadNmBubun": text(["00000"], np.zeros(rows, dtype=np.int64)),
+            "umdNm": text(apartments["dong_name"], apartment),
+            "aptNm": text(apartments["name"], apartment),
+            "jibun": text([str(value) for value in apartments["bonbun"]], apartment),
+            "excluUseAr": areas,
+            "dealYear": pd.array(years[month], dtype="Int64"),
+            "dealMonth": pd.array(month_numbers[month], dtype="Int64"),
+            "dealDay": pd.array(day, dtype="Int64"),
+            "dealAmount": pd.array(amount, dtype="Int64"),
+            "floor": pd.array(floor, dtype="Int64"),
+            "buildYear": pd.array(apartments["build_year"][apartment], dtype="Int64"),
+            "aptSeq": text([f"{self.sigungu_codes[number]}-{index}"
+                            for index, number in enumerate(apartments["sigungu"])], apartment),
+            "cdealType": text(["", "O"], cancelled.astype(np.int64)),
+            "cdealDay": text(cancel_days, cancel_day),
+            "dealingGbn": text(["중개거래", "직거래"], direct.astype(np.int64)),
+            "estateAgentSggNm": text(sigungu_names + [""], np.where(direct, len(sigungu_names), sigungu)),
+            "rgstDate": text(cancel_days, registered),
+            "aptDong": text([""], np.zeros(rows, dtype=np.int64)),
+            "slerGbn": text(["개인", "법인"], (rng.random(rows) < CORPORATE_RATE).astype(np.int64)),
+            "buyerGbn": text(["개인", "법인"], (rng.random(rows) < CORPORATE_RATE).astype(np.int64)),
+            "landLeaseholdGbn": text(["N"], np.zeros(rows, dtype=np.int64)),
+        }
+        return pd.DataFrame(columns, columns=TRADE_COLUMNS)
+
+
+# 합성 거래를 미리 만들어 두고 시군구/월 단위로 잘라 돌려주는 TransactionPrice 대체 객체
+# latency: 월 요청 하나마다 기다리는 시간(초) (실제 API 응답 시간 흉내)
+class SyntheticTransactionPrice:
+    def __init__(self, rows, start_year_month="202401", end_year_month="202412", latency=0.0, seed=0,
+                 categorical=False, market=None):
+        self.latency = latency
+        self.market = market or SyntheticMarket(seed)
+        self.meta_dict = {
+            "아파트": {"매매": {"url": "http://synthetic.local/getRTMSDataSvcAptTradeDev", "columns": TRADE_COLUMNS}}
+        }
+        data = self.market.trades(rows, start_year_month, end_year_month, seed=seed, categorical=categorical)
+        # 시군구별 구간과 그 안의 월 경계 (data는 시군구, 거래월 순으로 정렬되어 있다)
+        sigungu_codes = data["sggCd"].to_numpy(dtype=object)
+        year_months = (data["dealYear"].to_numpy(dtype=np.int64) * 100 + data["dealMonth"].to_numpy(dtype=np.int64))
+        self.data = data
+        self.year_months = year_months
+        self.slices = {}
+        boundaries = np.flatnonzero(sigungu_codes[1:] != sigungu_codes[:-1]) + 1
+        for start, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(data)]):
+            if end > start:
+                self.slices[sigungu_codes[start]] = (start, end)
+        self.tasks = [
+            {"si_do_name": entry["si_do_name"], "sigungu_code": entry["sigungu_code"],
+             "sigungu_name": entry["sigungu_name"]}
+            for entry in self.market.sigungu
+        ]
+
+    def get_data(self, property_type, trade_type, sigungu_code, year_month=None,
+                 start_year_month=None, end_year_month=None, **kwargs):
+        if year_month:
+            start_year_month = end_year_month = year_month
+        months = month_range(start_year_month, end_year_month)
+        time.sleep(self.latency * len(months))
+        start, end = self.slices.get(str(sigungu_code), (0, 0))
+        year_months = self.year_months[start:end]
+        first = start + np.searchsorted(year_months, int(months[0]), side="left")
+        last = start + np.searchsorted(year_months, int(months[-1]), side="right")
+        return self.data.iloc[first:last].reset_index(drop=True)
+
+    def translate_columns(self, df):
+        return df
+
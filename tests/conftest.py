@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+# 저장소 최상위 모듈을 그대로 import 한다 (district.json 등 상대 경로도 최상위 기준)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    monkeypatch.chdir(ROOT)
+    return ROOT
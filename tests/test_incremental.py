@@ -0,0 +1,78 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+from benchmark import StubTransactionPrice, load_tasks
+from cache import CachedTransactionPrice
+from incremental import IncrementalStore
+
+START, END = "202401", "202405"
+NOW = datetime(2024, 6, 15)
+
+
+# 실제로 API에 보낸 (시군구, 월) 요청을 기록하는 조회 객체
+class RecordingTransactionPrice(StubTransactionPrice):
+    def __init__(self):
+        super().__init__(latency=0, rows_per_month=5)
+        self.requests = []
+
+    def get_data(self, property_type, trade_type, sigungu_code, year_month=None, **kwargs):
+        self.requests.append((sigungu_code, str(year_month)))
+        return super().get_data(property_type, trade_type, sigungu_code, year_month=year_month, **kwargs)
+
+
+@pytest.fixture
+def api(tmp_path):
+    recording = RecordingTransactionPrice()
+    return recording, CachedTransactionPrice(recording, cache_dir=str(tmp_path / "molit"))
+
+
+# lookback 구간은 월 단위 캐시에 있는 지난 월이어도 다시 조회하고, 그 이전 월은 다시 받지 않는다
+def test_lookback_months_bypass_cache(api, tmp_path):
+    recording, cached = api
+    tasks = load_tasks(limit=2)
+    store = IncrementalStore(store_dir=str(tmp_path / "incremental"))
+    store.refresh(cached, tasks, START, END, lookback_months=3, now=NOW)
+    assert len(recording.requests) == 2 * 5
+
+    recording.requests.clear()
+    frames = store.refresh(cached, tasks, START, END, lookback_months=3, now=NOW)
+    assert sorted(month for _, month in recording.requests) == sorted(["202403", "202404", "202405"] * 2)
+    assert [len(df) for df in frames] == [5 * 5, 5 * 5]
+    assert store.state[tasks[0]["sigungu_code"]]["last_complete_month"] == "202402"
+
+
+# 같은 저장소를 쓰는 두 작업이 겹쳐 실행되어도 서로의 조회 구간을 지우지 않는다
+def test_overlapping_refreshes_keep_both_coverages(api, tmp_path):
+    _, cached = api
+    tasks = load_tasks(limit=4)
+    store_dir = str(tmp_path / "incremental")
+    first, second = IncrementalStore(store_dir=store_dir), IncrementalStore(store_dir=store_dir)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(store.refresh, cached, group, START, END, lookback_months=1, now=NOW)
+                   for store, group in ((first, tasks[:2]), (second, tasks[2:]))]
+        for future in futures:
+            future.result()
+
+    state = IncrementalStore(store_dir=store_dir).state
+    assert sorted(state) == sorted(task["sigungu_code"] for task in tasks)
+    assert not [name for name in os.listdir(os.path.join(store_dir, "아파트", "매매")) if name.endswith(".tmp")]
+
+
+# 빈 결과는 아래 조회 객체가 오류를 예외로 알리는 경우(raises_on_error)에만 캐시에 저장한다
+def test_empty_months_are_cached_only_when_confirmed(tmp_path):
+    recording = RecordingTransactionPrice()
+    recording.rows_per_month = 0
+    cached = CachedTransactionPrice(recording, cache_dir=str(tmp_path / "molit"))
+    for _ in range(2):
+        cached.get_data("아파트", "매매", "11110", start_year_month=START, end_year_month=END)
+    assert len(recording.requests) == 2 * 5
+
+    recording.requests.clear()
+    recording.raises_on_error = True
+    for _ in range(2):
+        cached.get_data("아파트", "매매", "11110", start_year_month=START, end_year_month=END)
+    assert len(recording.requests) == 5
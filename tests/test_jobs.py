@@ -0,0 +1,38 @@
+import os
+
+import jobs
+from instrument import Trace
+from jobs import DONE, JobScheduler
+
+
+def fail_save(self, trace_dir=None):
+    raise OSError("No space left on device")
+
+
+# 계측 파일을 저장하지 못해도 작업은 끝나고 같은 키로 다시 실행할 수 있다
+def test_trace_save_failure_finishes_job(monkeypatch):
+    monkeypatch.setattr(Trace, "save", fail_save)
+    scheduler = JobScheduler(workers=1, heavy_workers=1)
+
+    job, created = scheduler.submit("key", lambda job: 1, heavy=True, trace=Trace("job"))
+    assert created and job.wait(5)
+    assert job.status == DONE and job.result == 1 and job.trace_path is None
+
+    again, created = scheduler.submit("key", lambda job: 2, heavy=True, trace=Trace("job"))
+    assert created and again.wait(5)
+    assert again.result == 2 and scheduler.running_heavy == 0
+
+
+# retention이 지나 정리한 작업은 결과 파일도 지운다
+def test_prune_removes_job_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_FILE_DIR", str(tmp_path))
+    scheduler = JobScheduler(workers=1, retention=0)
+    job, _ = scheduler.submit("key", lambda job: 1)
+    assert job.wait(5)
+    os.makedirs(job.file_dir)
+    with open(job.file_path("report-auto.html"), "w") as f:
+        f.write("<html></html>")
+
+    scheduler.submit("other", lambda job: 2)
+    assert scheduler.get(job.id) is None
+    assert not os.path.exists(job.file_dir)
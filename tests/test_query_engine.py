@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("duckdb")
+
+from collector import FrameCollector
+from dataset import TransactionDataset, region_codes
+from normalize import normalize_transactions, select_columns
+from query_engine import DuckDBEngine, PandasEngine, compare_analyses
+from synthetic import SyntheticTransactionPrice
+
+START, END = "202301", "202412"
+LABEL_COLUMNS = ["시군구", "법정동", "아파트", "거래유형"]
+
+
+# 합성 API로 전국 시군구를 조회한 것과 같은 조회 결과 (파이프라인과 같은 타입 정리)
+@pytest.fixture(scope="module")
+def selected_data():
+    api = SyntheticTransactionPrice(20_000, START, END, seed=0, categorical=True)
+    collector = FrameCollector()
+    for task in api.tasks:
+        collector.add(api.get_data("아파트", "매매", task["sigungu_code"], start_year_month=START,
+                                   end_year_month=END), task["sigungu_name"], task["si_do_name"])
+    return normalize_transactions(select_columns(collector.build()))
+
+
+@pytest.fixture(scope="module")
+def engines():
+    return PandasEngine(), DuckDBEngine(threads=2)
+
+
+def assert_same(engines, frame):
+    pandas_engine, duckdb_engine = engines
+    expected = pandas_engine.analyze(frame)
+    assert compare_analyses(expected, duckdb_engine.analyze(frame)) == []
+    return expected
+
+
+def test_synthetic_data(engines, selected_data):
+    analysis = assert_same(engines, selected_data)
+    assert analysis.total_volume > 0
+    assert not analysis.top_apartments.empty
+
+
+# categorical이 아닌 문자열 컬럼 (DuckDB에 코드가 아니라 값으로 넘어간다)
+def test_string_columns(engines, selected_data):
+    assert_same(engines, selected_data.astype({column: "object" for column in LABEL_COLUMNS}))
+
+
+# 전용면적/거래일자/라벨 결측 행 (전용면적이 없는 행은 면적 범위 집계에서 빠진다)
+def test_missing_values(engines, selected_data):
+    frame = selected_data.copy()
+    for column, step in (("전용면적", 7), ("거래일자", 11), ("거래유형", 13), ("시군구", 17), ("법정동", 19)):
+        frame.loc[frame.index[::step], column] = None
+    assert_same(engines, frame)
+    assert_same(engines, frame.astype({column: "object" for column in LABEL_COLUMNS}))
+
+
+def test_all_area_missing(engines, selected_data):
+    frame = selected_data.iloc[:500].copy()
+    frame["전용면적"] = np.nan
+    assert_same(engines, frame)
+
+
+def test_empty(engines, selected_data):
+    analysis = assert_same(engines, selected_data.iloc[:0])
+    assert analysis.total_volume == 0
+
+
+# 같은 법정동에서 거래량이 같은 아파트가 여러 개면 두 엔진 모두 같은 아파트를 고른다
+def test_top_apartment_ties(engines, selected_data):
+    frame = selected_data.iloc[:1000].copy()
+    frame["법정동"] = pd.Categorical(["동1"] * len(frame))
+    frame["아파트"] = pd.Categorical.from_codes(np.arange(len(frame)) % 4, categories=["나", "가", "라", "다"])
+    analysis = assert_same(engines, frame)
+    assert len(analysis.top_apartments) == 1
+    assert_same(engines, frame.astype({"법정동": "object", "아파트": "object"}))
+
+
+# 데이터셋(Parquet 파티션)을 읽는 경로도 같은 결과 (시/도, 기간, 시군구 조건)
+def test_dataset(engines, selected_data, tmp_path):
+    pandas_engine, duckdb_engine = engines
+    dataset = TransactionDataset(str(tmp_path))
+    dataset.write(selected_data, region_codes("전국"), START, END)
+    seoul = region_codes("서울특별시")
+    sigungu_names = list(selected_data["시군구"].dropna().unique()[:5])
+    for options in ({}, {"si_do_codes": seoul}, {"start_year_month": "202306", "end_year_month": "202402"},
+                    {"sigungu_names": sigungu_names}):
+        expected = pandas_engine.analyze_dataset(dataset, **options)
+        assert compare_analyses(expected, duckdb_engine.analyze_dataset(dataset, **options)) == []
@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+
+from benchmark import make_index_frame
+from dataset import TransactionDataset
+from district import DistrictConverter
+from repeat_index import RepeatSalesIndex
+
+SI_DO_NAMES = ["서울특별시", "경기도"]
+THROUGH = "202412"
+
+
+@pytest.fixture(scope="module")
+def selected_data():
+    frame, _ = make_index_frame(50000)
+    return frame[frame["시도"].isin(SI_DO_NAMES)].reset_index(drop=True)
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    return TransactionDataset(root=str(tmp_path / "dataset"))
+
+
+def write(dataset, selected_data, si_do_names, start_year_month, end_year_month):
+    codes = DistrictConverter().si_do_codes
+    rows = selected_data[selected_data["시도"].isin(si_do_names)]
+    dataset.write(rows, [codes[name] for name in si_do_names], start_year_month, end_year_month)
+
+
+# 지역 번호는 반영한 순서에 따라 다르므로 (시도, 시군구, 월) 순으로 비교한다
+def fitted(index):
+    return (index.fit().sort_values(["시도", "시군구", "거래년도", "거래월"])
+            .reset_index(drop=True)[["시도", "시군구", "거래년도", "거래월", "지수", "거래 쌍 수"]])
+
+
+def full_index(selected_data):
+    index = RepeatSalesIndex()
+    index.update(selected_data, through_year_month=THROUGH)
+    return index
+
+
+# 나중에 저장한 시/도와 이전 연도도 지수에 들어가서 한 번에 만든 지수와 같아진다
+def test_later_region_and_earlier_year(dataset, selected_data):
+    index = RepeatSalesIndex()
+    write(dataset, selected_data, ["서울특별시"], "201701", "202412")
+    assert index.update_from_dataset(dataset, through_year_month=THROUGH) == 1
+    write(dataset, selected_data, ["경기도"], "201701", "202412")
+    assert index.update_from_dataset(dataset, through_year_month=THROUGH) == 1
+    write(dataset, selected_data, SI_DO_NAMES, "201501", "201612")
+    assert index.update_from_dataset(dataset, through_year_month=THROUGH) == 2
+    assert index.update_from_dataset(dataset, through_year_month=THROUGH) == 0
+
+    expected = full_index(selected_data)
+    assert index.pair_count == expected.pair_count
+    pd.testing.assert_frame_equal(fitted(index), fitted(expected))
+
+
+# 이미 반영한 달에 늦게 신고된 거래가 들어오면 그 시/도를 다시 만든다
+def test_late_report_rebuilds_region(dataset, selected_data):
+    index = RepeatSalesIndex()
+    write(dataset, selected_data, SI_DO_NAMES, "201501", "202412")
+    index.update_from_dataset(dataset, through_year_month=THROUGH)
+
+    # 2016년 6월 거래가 있는 세대의 같은 달 다른 날 거래를 늦게 신고된 거래로 더한다
+    june = selected_data[(selected_data["시도"] == "서울특별시")
+                         & (selected_data["거래일자"].dt.strftime("%Y%m") == "201606")]
+    late = june.head(20).assign(거래일자=pd.Timestamp("2016-06-30"))
+    updated = pd.concat([selected_data, late], ignore_index=True)
+    for column in ("시군구", "법정동", "아파트", "거래유형", "시도"):
+        updated[column] = updated[column].astype("category")
+    write(dataset, updated, ["서울특별시"], "201606", "201606")
+    assert index.update_from_dataset(dataset, through_year_month=THROUGH) == 1
+
+    expected = full_index(updated)
+    assert index.pair_count == expected.pair_count
+    pd.testing.assert_frame_equal(fitted(index), fitted(expected))
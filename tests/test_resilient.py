@@ -0,0 +1,157 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from benchmark import StubTransactionPrice, load_tasks
+from cache import CachedTransactionPrice
+from fake_api import FakeMolitServer
+from fetcher import fetch_all, month_range
+from resilient import (QUOTA_TIMEZONE, CircuitBreaker, FetchCheckpoint, QuotaExceededError,
+                       ResilientTransactionPrice, RetryPolicy, TransientFetchError, next_quota_reset)
+
+START, END = "202401", "202403"
+MONTHS = len(month_range(START, END))
+
+
+def make_api(server, breaker=None, max_attempts=8):
+    return ResilientTransactionPrice(
+        "test-key", base_url=server.url, timeout=(1, 2),
+        retry=RetryPolicy(max_attempts=max_attempts, base_delay=0.01, max_delay=0.05),
+        breaker=breaker or CircuitBreaker(failure_threshold=3, reset_timeout=0.1, max_reset_timeout=0.5)
+    )
+
+
+def get_data(api, sigungu_code="11110", property_type="아파트", trade_type="매매"):
+    return api.get_data(property_type, trade_type, sigungu_code, start_year_month=START, end_year_month=END,
+                        translate=False)
+
+
+# 가짜 서버와 같은 시드의 기대 결과 (아파트 이름 순서로 비교)
+def expected_names(sigungu_code="11110"):
+    return list(StubTransactionPrice(latency=0).get_data("아파트", "매매", sigungu_code, start_year_month=START,
+                                                         end_year_month=END)["aptNm"])
+
+
+@pytest.fixture
+def server():
+    with FakeMolitServer(retry_after=0) as fake:
+        yield fake
+
+
+# 5xx와 공공데이터포털 일시 오류(code 01)는 다시 시도해서 빠짐없이 받는다
+def test_transient_errors_are_retried(server):
+    server.reset(error_rate=0.3, api_error_rate=0.2)
+    api = make_api(server)
+    df = get_data(api)
+    assert list(df["aptNm"]) == expected_names()
+    assert api.stats["retries"] > 0
+    assert server.stats.get("error", 0) + server.stats.get("api_error", 0) == api.stats["failures"]
+
+
+# 전월세도 기본 조회 구성(월 단위 캐시 + 재시도 조회)으로 받아서 정수 컬럼을 변환한다
+# (integer_columns에 monthlyRent가 두 번 들어 있다)
+@pytest.mark.parametrize("property_type", ["아파트", "오피스텔"])
+def test_rent_round_trip(server, tmp_path, property_type):
+    api = CachedTransactionPrice(make_api(server), cache_dir=str(tmp_path / "molit"))
+    df = get_data(api, property_type=property_type, trade_type="전월세")
+    assert list(df["aptNm"]) == expected_names()
+    assert df["monthlyRent"].dtype == "Int64" and df["deposit"].dtype == "Int64"
+
+    cached = get_data(api, property_type=property_type, trade_type="전월세")
+    assert list(cached["aptNm"]) == expected_names()
+    assert server.stats["ok"] == MONTHS
+
+
+# 429는 실패로 세지 않고 Retry-After만큼 멈췄다가 다시 보낸다
+def test_rate_limit_waits_for_retry_after(server):
+    server.reset(rate_limit_rate=0.5, retry_after=1)
+    breaker = CircuitBreaker(failure_threshold=1)
+    api = make_api(server, breaker)
+    started = time.monotonic()
+    df = get_data(api)
+    assert list(df["aptNm"]) == expected_names()
+    assert api.stats["rate_limited"] == server.stats["rate_limit"] > 0
+    assert api.stats["failures"] == 0
+    assert time.monotonic() - started >= 1
+    assert breaker.paused_seconds >= 1
+    assert breaker.opened_count > 0 and breaker.trips == 0
+
+
+# 일일 한도 초과(code 22)는 다시 시도하지 않고, 같은 차단기를 쓰는 다음 요청은 보내지도 않는다
+def test_quota_error_is_not_retried(server):
+    server.reset(quota_after=0)
+    api = make_api(server)
+    with pytest.raises(QuotaExceededError):
+        get_data(api)
+    assert server.stats["requests"] == 1
+    with pytest.raises(QuotaExceededError):
+        get_data(api, "11140")
+    assert server.stats["requests"] == 1
+
+
+# 한도 소진 상태는 quota_cooldown이 지나면 풀려서 다시 조회할 수 있다 (프로세스 전체 차단기가 계속 막히지 않는다)
+def test_quota_state_expires(server):
+    server.reset(quota_after=0)
+    breaker = CircuitBreaker(quota_cooldown=0.2)
+    api = make_api(server, breaker)
+    with pytest.raises(QuotaExceededError):
+        get_data(api)
+    server.reset(quota_after=None)
+    with pytest.raises(QuotaExceededError):
+        get_data(api)
+    time.sleep(0.3)
+    assert list(get_data(api)["aptNm"]) == expected_names()
+    assert breaker.fatal_error is None
+
+
+# 한도 소진 상태는 길어도 한국 시간 다음 자정까지만 유지된다
+def test_quota_resets_at_kst_midnight():
+    now = datetime(2024, 1, 1, 23, 30, tzinfo=QUOTA_TIMEZONE).timestamp()
+    assert next_quota_reset(now) == datetime(2024, 1, 2, tzinfo=QUOTA_TIMEZONE).timestamp()
+    midnight = datetime(2024, 1, 2, tzinfo=QUOTA_TIMEZONE).timestamp()
+    assert next_quota_reset(midnight) == datetime(2024, 1, 3, tzinfo=QUOTA_TIMEZONE).timestamp()
+
+    breaker = CircuitBreaker(quota_cooldown=24 * 60 * 60)
+    breaker.fail(QuotaExceededError("quota"))
+    assert breaker.fatal_until == next_quota_reset(time.time())
+
+
+# 서버가 계속 503을 주면 연속 실패 후 차단기가 열리고, 다시 시도할 횟수를 다 쓰면 실패한다
+def test_breaker_opens_on_consecutive_failures(server):
+    server.reset(outage=(0, 60))
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.1, max_reset_timeout=0.2)
+    api = make_api(server, breaker, max_attempts=3)
+    with pytest.raises(TransientFetchError):
+        get_data(api)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened_count == 1
+    assert server.stats["outage"] == 3
+
+
+# 일시 장애 동안 열렸던 차단기는 장애가 끝난 뒤 먼저 보낸 요청이 성공하면 닫힌다
+def test_breaker_closes_after_outage(server):
+    server.reset(outage=(0, 0.5))
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.1, max_reset_timeout=0.2)
+    api = make_api(server, breaker, max_attempts=20)
+    assert list(get_data(api)["aptNm"]) == expected_names()
+    assert breaker.opened_count >= 1
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.paused_seconds > 0
+
+
+# 한도가 중간에 소진되면 끝난 시군구만 checkpoint에 남고, 다시 실행하면 남은 시군구만 요청한다
+def test_checkpoint_resumes_after_quota(server, tmp_path):
+    tasks = load_tasks(6)
+    checkpoint = FetchCheckpoint(str(tmp_path))
+    server.reset(quota_after=3 * MONTHS)
+    with pytest.raises(QuotaExceededError):
+        fetch_all(make_api(server), tasks, START, END, max_workers=1, rate_per_sec=0, checkpoint=checkpoint)
+    completed = checkpoint.completed()
+    assert len(completed) == 3
+
+    server.reset(quota_after=None)
+    frames = fetch_all(make_api(server), tasks, START, END, max_workers=1, rate_per_sec=0, checkpoint=checkpoint)
+    assert server.stats["requests"] == (len(tasks) - len(completed)) * MONTHS
+    for task, df in zip(tasks, frames):
+        assert list(df["aptNm"]) == expected_names(task["sigungu_code"])